@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sliding-window tellers (ring van buckets) tegenover de oude deque met
+een timestamp per pakket. Simuleert een flood met synthetische tijden, dus er is
+geen netwerk, root of Scapy nodig.
+
+Gebruik:
+    python3 bench_counters.py [--rate PPS] [--seconds S] [--sources N] [--window W]
+"""
+
+import argparse
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+from window_counters import SlidingWindowCounter
+
+
+class DequeWindow:
+    """De oude aanpak: één float per pakket, opruimen bij elke check."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self.times = deque()
+
+    def add(self, now: float) -> int:
+        times = self.times
+        times.append(now)
+        while times and (now - times[0]) > self.window:
+            times.popleft()
+        return len(times)
+
+
+def run(factory, rate: int, seconds: int, sources: int, trace: bool = False):
+    """
+    Verwerk rate * seconds pakketten; geeft (seconden, piekgeheugen in bytes, laatste telling).
+    Geheugen wordt alleen gemeten met `trace` (tracemalloc vertraagt de run zelf).
+    """
+    counters = defaultdict(factory)
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(sources)]
+    step = 1.0 / rate
+    now = 1_000_000.0
+    count = 0
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(rate * seconds):
+        now += step
+        counter = counters[ips[i % sources]]
+        count = counter.add(now)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sliding-window tellers")
+    parser.add_argument("--rate", type=int, default=200_000, help="Pakketten per seconde (standaard: 200000)")
+    parser.add_argument("--seconds", type=int, default=15, help="Gesimuleerde duur in seconden (standaard: 15)")
+    parser.add_argument("--sources", type=int, default=1, help="Aantal bron-IP's (standaard: 1)")
+    parser.add_argument("--window", type=float, default=10, help="Tijdvenster in seconden (standaard: 10)")
+    args = parser.parse_args()
+
+    packets = args.rate * args.seconds
+    print(f"{packets} pakketten, {args.rate} pps, {args.sources} bron(nen), venster {args.window:g} s")
+    for name, factory in (
+        ("deque", lambda: DequeWindow(args.window)),
+        ("ring", lambda: SlidingWindowCounter(args.window)),
+    ):
+        elapsed, _, count = run(factory, args.rate, args.seconds, args.sources)
+        _, peak, _ = run(factory, args.rate, args.seconds, args.sources, trace=True)
+        print(
+            f"{name:<6} {elapsed:7.2f} s  {packets / elapsed / 1000:8.1f} k pakketten/s  "
+            f"piekgeheugen {peak / (1024 * 1024):8.2f} MB  laatste telling {count}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Vergelijking van de twee classificatiepaden: Scapy-dissectie (process_packet) en de
+raw-bytes fast path (process_frame). Elk frame wordt door beide geclassificeerd;
+verschillen worden gemeld en daarna moeten ook de tellers van twee detectoren gelijk
+zijn. Daarnaast de snelheid van beide paden. Er is geen netwerk of root nodig.
+
+Gebruik:
+    python3 bench_parser.py [--packets N] [--pcap BESTAND]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from scapy.all import Dot1Q, Ether, ICMP, IP, IPv6, TCP, UDP, rdpcap
+from scapy.layers.inet6 import (
+    ICMPv6EchoRequest, ICMPv6ND_NS, IPv6ExtHdrFragment, IPv6ExtHdrHopByHop, IPv6ExtHdrRouting,
+)
+
+from dos_detector import DoSDetector
+from packet_parser import classify_frame
+
+
+def sample_frames(rng: random.Random, count: int):
+    """Gemengd verkeer inclusief randgevallen (VLAN, IP-opties, fragmenten, padding, IPv6-extensies)."""
+    sources = [f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}" for _ in range(50)]
+    sources6 = [f"2001:db8::{rng.randrange(1, 0xFFFF):x}" for _ in range(20)]
+    makers = [
+        lambda s, s6: Ether() / IP(src=s) / TCP(flags="S", dport=80),
+        lambda s, s6: Ether() / IP(src=s) / TCP(flags="SA"),
+        lambda s, s6: Ether() / IP(src=s) / TCP(flags="SE"),
+        lambda s, s6: Ether() / IP(src=s) / TCP(flags="PA", dport=80) / b"GET /index.html HTTP/1.1\r\nHost: x\r\n\r\n",
+        lambda s, s6: Ether() / IP(src=s) / TCP(flags="PA", dport=8080) / b"POST /api HTTP/1.1\r\n\r\n",
+        lambda s, s6: Ether() / IP(src=s) / TCP(flags="PA", dport=443) / b"\x16\x03\x01 GET / in TLS",
+        lambda s, s6: Ether() / IP(src=s) / TCP(flags="S", options=[("MSS", 1460), ("NOP", None), ("WScale", 7)]),
+        lambda s, s6: Ether() / IP(src=s, options=[b"\x94\x04\x00\x00"]) / TCP(flags="S"),
+        lambda s, s6: Ether() / IP(src=s) / UDP(dport=53) / (b"X" * 64),
+        lambda s, s6: Ether() / IP(src=s) / UDP(dport=123),
+        lambda s, s6: Ether() / IP(src=s) / ICMP(),
+        lambda s, s6: Ether() / IP(src=s) / ICMP(type=3, code=1) / IP(src="9.9.9.9") / TCP(flags="S"),
+        lambda s, s6: Ether() / IP(src=s, flags="MF") / UDP() / (b"Y" * 32),
+        lambda s, s6: Ether() / IP(src=s, frag=185) / (b"Z" * 40),
+        lambda s, s6: Ether() / Dot1Q(vlan=12) / IP(src=s) / TCP(flags="S"),
+        lambda s, s6: Ether() / Dot1Q(vlan=3) / Dot1Q(vlan=4) / IP(src=s) / UDP(),
+        lambda s, s6: Ether() / IP(src=s, proto=47) / (b"\x00" * 20),
+        lambda s, s6: Ether() / IP(src=s) / IPv6(src=s6) / TCP(flags="S"),
+        lambda s, s6: Ether() / IPv6(src=s6) / TCP(flags="S"),
+        lambda s, s6: Ether() / IPv6(src=s6) / TCP(flags="PA") / b"HEAD / HTTP/1.0\r\n\r\n",
+        lambda s, s6: Ether() / IPv6(src=s6) / UDP(),
+        lambda s, s6: Ether() / IPv6(src=s6) / ICMPv6EchoRequest(),
+        lambda s, s6: Ether() / IPv6(src=s6) / ICMPv6ND_NS(tgt="fe80::1"),
+        lambda s, s6: Ether() / IPv6(src=s6) / IPv6ExtHdrHopByHop() / IPv6ExtHdrRouting() / TCP(flags="S"),
+        lambda s, s6: Ether() / IPv6(src=s6) / IPv6ExtHdrFragment(offset=0, m=1) / UDP(),
+        lambda s, s6: Ether() / IPv6(src=s6) / IPv6ExtHdrFragment(offset=20) / (b"W" * 24),
+        lambda s, s6: Ether(type=0x0806) / (b"\x00" * 28),
+    ]
+    for _ in range(count):
+        yield bytes(rng.choice(makers)(rng.choice(sources), rng.choice(sources6)))
+
+
+def cross_check(frames) -> int:
+    """Aantal frames waarvoor beide paden iets anders opleveren; tellers moeten gelijk zijn."""
+    mismatches = 0
+    now = time.time()
+    scapy_detector = DoSDetector(alert_callback=lambda *a: None)
+    raw_detector = DoSDetector(alert_callback=lambda *a: None)
+    for frame in frames:
+        expected = DoSDetector.classify_packet(Ether(frame))
+        found = classify_frame(frame)
+        if expected != found:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"VERSCHIL {Ether(frame).summary()}: scapy {expected}, raw {found}")
+        if expected:
+            scapy_detector.count_packet(expected[0], expected[1], now)
+        if found:
+            raw_detector.count_packet(found[0], found[1], now)
+    for name in ("syn_packets", "udp_packets", "icmp_packets", "http_requests"):
+        a, b = getattr(scapy_detector, name), getattr(raw_detector, name)
+        if a.total(now) != b.total(now) or a.top(50) != b.top(50):
+            mismatches += 1
+            print(f"VERSCHIL in tellers {name}: scapy {a.total(now)} {a.top(3)}, raw {b.total(now)} {b.top(3)}")
+    return mismatches
+
+
+def bench(frames):
+    """Pakketten per seconde: Scapy-dissectie + classify_packet tegenover classify_frame."""
+    start = time.perf_counter()
+    for frame in frames:
+        DoSDetector.classify_packet(Ether(frame))
+    scapy_pps = len(frames) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for frame in frames:
+        classify_frame(frame)
+    raw_pps = len(frames) / (time.perf_counter() - start)
+    return scapy_pps, raw_pps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergelijk Scapy- en raw-classificatie van de DoS-detector")
+    parser.add_argument("--packets", type=int, default=20000, help="Aantal synthetische frames (standaard: 20000)")
+    parser.add_argument("--pcap", help="Gebruik de frames uit een pcap-bestand (Ethernet) in plaats van synthetische")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (standaard: 1)")
+    args = parser.parse_args()
+
+    if args.pcap:
+        frames = [bytes(p) for p in rdpcap(args.pcap)]
+    else:
+        frames = list(sample_frames(random.Random(args.seed), args.packets))
+    print(f"{len(frames)} frames")
+
+    mismatches = cross_check(frames)
+    print("Classificatie en tellers gelijk" if not mismatches else f"{mismatches} verschil(len)")
+
+    scapy_pps, raw_pps = bench(frames)
+    print(f"scapy {scapy_pps / 1000:8.1f} k pakketten/s")
+    print(f"raw   {raw_pps / 1000:8.1f} k pakketten/s  ({raw_pps / scapy_pps:.0f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
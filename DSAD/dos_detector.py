@@ -11,7 +11,6 @@ import time
 import signal
 import sys
 import warnings
-from collections import defaultdict, deque
 from datetime import datetime
 
 # Onderdruk Scapy socket-close warning bij stop van sniff
@@ -20,11 +19,30 @@ logging.getLogger("scapy.runtime").setLevel(logging.ERROR)
 warnings.filterwarnings("ignore", message=".*Socket.*closed.*")
 warnings.filterwarnings("ignore", message=".*unterminated subpattern.*")
 
-from scapy.all import sniff, IP, TCP, UDP, ICMP, Raw
-from scapy.layers.http import HTTPRequest
+from scapy.all import conf, sniff, Dot1Q, Ether, IP, IPv6, TCP, UDP, ICMP
+from scapy.error import Scapy_Exception
+from scapy.layers.inet6 import (
+    IPv6ExtHdrDestOpt, IPv6ExtHdrFragment, IPv6ExtHdrHopByHop, IPv6ExtHdrRouting, _ICMPv6,
+)
 import argparse
+import multiprocessing
+import os
+import queue
 import threading
-from typing import Dict, Deque
+from typing import Dict, Iterable, Optional, Tuple
+
+from fanout import ShardMerger, fanout_group, run_worker
+from packet_parser import (
+    ARPHRD_ETHER, CAPTURE_FANOUT, CAPTURE_MODES, CAPTURE_RAW, CAPTURE_SCAPY, DETECTORS, HTTP_PORTS,
+    KIND_HTTP, KIND_ICMP, KIND_SYN, KIND_UDP,
+    CaptureStatistics, RawCapture, bpf_filter_error, build_bpf_filter, classify_frame, is_http_request,
+)
+from sketches import EXPECTED_RATE, MAX_SOURCES, LRUTable, SourceTracker
+
+_IPV6_EXTENSIONS = (IPv6ExtHdrHopByHop, IPv6ExtHdrRouting, IPv6ExtHdrDestOpt, IPv6ExtHdrFragment)
+
+_DETECTOR_KINDS = {"syn": KIND_SYN, "udp": KIND_UDP, "icmp": KIND_ICMP, "http": KIND_HTTP}
+_ALERT_NAMES = {KIND_SYN: "SYN Flood", KIND_UDP: "UDP Flood", KIND_ICMP: "ICMP Flood", KIND_HTTP: "HTTP Flood"}
 
 
 class DoSDetector:
@@ -38,7 +56,14 @@ class DoSDetector:
                  time_window: int = 10,
                  interface: str = None,
                  stats_callback=None,
-                 alert_callback=None):
+                 alert_callback=None,
+                 max_sources: int = MAX_SOURCES,
+                 capture: str = CAPTURE_SCAPY,
+                 detectors: Optional[Iterable[str]] = None,
+                 http_ports: Iterable[int] = HTTP_PORTS,
+                 use_bpf: bool = True,
+                 workers: int = 0,
+                 expected_rate: int = EXPECTED_RATE):
         """
         Initialize the DoS detector with configurable thresholds.
         
@@ -51,7 +76,21 @@ class DoSDetector:
             interface: Network interface to monitor (None = all interfaces)
             stats_callback: Callback function for statistics updates (stats_dict)
             alert_callback: Callback function for alerts (attack_type, src_ip, count, threshold, rate)
+            max_sources: Maximum source IPs counted exactly per attack type (memory bound)
+            capture: "scapy" (sniff() and dissection) or "raw" (AF_PACKET socket, struct parsing)
+            detectors: Enabled detectors out of "syn", "udp", "icmp", "http" (None = all)
+            http_ports: TCP ports on which the capture filter passes HTTP requests
+            use_bpf: Attach a kernel BPF filter built from the enabled detectors (only
+                when `interface` is an Ethernet interface)
+            workers: Capture processes in "fanout" mode (0 = one per CPU)
+            expected_rate: Expected packets/s per attack type; sizes the per-source sketches
         """
+        if capture not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode: {capture} (choose from {', '.join(CAPTURE_MODES)})")
+        detectors = DETECTORS if detectors is None else tuple(detectors)
+        unknown = [d for d in detectors if d not in DETECTORS]
+        if unknown:
+            raise ValueError(f"Unknown detector(s): {', '.join(unknown)} (choose from {', '.join(DETECTORS)})")
         self.syn_threshold = syn_threshold
         self.udp_threshold = udp_threshold
         self.icmp_threshold = icmp_threshold
@@ -60,12 +99,26 @@ class DoSDetector:
         self.interface = interface
         self.stats_callback = stats_callback
         self.alert_callback = alert_callback
+        self.capture = capture
+        self.detectors = tuple(d for d in DETECTORS if d in detectors)
+        self.enabled_kinds = sum(_DETECTOR_KINDS[d] for d in self.detectors)
+        self.http_ports = tuple(http_ports)
+        # Kernel-side filter: frames no enabled detector counts never reach userspace
+        self.bpf_filter = build_bpf_filter(self.detectors, self.http_ports) if use_bpf else None
+        self.filter_error = None
+        self._capture_stats = None  # returns kernel capture statistics while capturing
+        self.workers = workers or os.cpu_count() or 1
+        self._merger = None  # ShardMerger while capturing in fanout mode
         
-        # Packet counters per source IP
-        self.syn_packets: Dict[str, Deque] = defaultdict(lambda: deque())
-        self.udp_packets: Dict[str, Deque] = defaultdict(lambda: deque())
-        self.icmp_packets: Dict[str, Deque] = defaultdict(lambda: deque())
-        self.http_requests: Dict[str, Deque] = defaultdict(lambda: deque())
+        # Packet counters per source IP: Count-Min Sketch for every source, exact
+        # counters (LRU/TTL bounded) for sources near the threshold; fixed memory
+        # however many (spoofed) sources appear
+        self.max_sources = max_sources
+        self.expected_rate = expected_rate
+        self.syn_packets = SourceTracker(time_window, syn_threshold, max_sources, expected_rate)
+        self.udp_packets = SourceTracker(time_window, udp_threshold, max_sources, expected_rate)
+        self.icmp_packets = SourceTracker(time_window, icmp_threshold, max_sources, expected_rate)
+        self.http_requests = SourceTracker(time_window, http_threshold, max_sources, expected_rate)
         
         # Overall packet counters for time window
         self.total_syn_count = 0
@@ -77,63 +130,30 @@ class DoSDetector:
         self.window_start_time = time.time()
         self.running = True
         
-        # Alert history to prevent spam
-        self.last_alert_time: Dict[str, float] = {}
+        # Alert history to prevent spam (entries expire after the cooldown)
         self.alert_cooldown = 5  # seconds between alerts for same attack type
+        self.last_alert_time = LRUTable(max_sources, ttl=self.alert_cooldown)
         
-    def cleanup_old_packets(self, packet_times: Deque, current_time: float):
-        """Remove packets older than the time window."""
-        while packet_times and (current_time - packet_times[0]) > self.time_window:
-            packet_times.popleft()
-    
+    def cleanup_old_packets(self, tracker: SourceTracker, current_time: float) -> int:
+        """Total packets of one type in the time window (per-source state expires by itself)."""
+        return tracker.total(current_time)
+
     def check_syn_flood(self, src_ip: str, current_time: float):
         """Detect SYN flood attacks (half-open connections)."""
-        if src_ip not in self.syn_packets:
-            return False
-            
-        self.cleanup_old_packets(self.syn_packets[src_ip], current_time)
-        syn_count = len(self.syn_packets[src_ip])
-        
-        if syn_count > self.syn_threshold:
-            return True
-        return False
-    
+        return self.syn_packets.count(src_ip, current_time) > self.syn_threshold
+
     def check_udp_flood(self, src_ip: str, current_time: float):
         """Detect UDP flood attacks."""
-        if src_ip not in self.udp_packets:
-            return False
-            
-        self.cleanup_old_packets(self.udp_packets[src_ip], current_time)
-        udp_count = len(self.udp_packets[src_ip])
-        
-        if udp_count > self.udp_threshold:
-            return True
-        return False
-    
+        return self.udp_packets.count(src_ip, current_time) > self.udp_threshold
+
     def check_icmp_flood(self, src_ip: str, current_time: float):
         """Detect ICMP flood attacks (ping flood)."""
-        if src_ip not in self.icmp_packets:
-            return False
-            
-        self.cleanup_old_packets(self.icmp_packets[src_ip], current_time)
-        icmp_count = len(self.icmp_packets[src_ip])
-        
-        if icmp_count > self.icmp_threshold:
-            return True
-        return False
-    
+        return self.icmp_packets.count(src_ip, current_time) > self.icmp_threshold
+
     def check_http_flood(self, src_ip: str, current_time: float):
         """Detect HTTP flood attacks (application layer DoS)."""
-        if src_ip not in self.http_requests:
-            return False
-            
-        self.cleanup_old_packets(self.http_requests[src_ip], current_time)
-        http_count = len(self.http_requests[src_ip])
-        
-        if http_count > self.http_threshold:
-            return True
-        return False
-    
+        return self.http_requests.count(src_ip, current_time) > self.http_threshold
+
     def alert(self, attack_type: str, src_ip: str, count: int, threshold: int):
         """Generate alert for detected attack."""
         current_time = time.time()
@@ -164,12 +184,53 @@ class DoSDetector:
             print(f"Attack Rate: {rate:.2f} packets/second")
             print(f"{'='*70}\n")
     
+    @staticmethod
+    def classify_packet(packet) -> Optional[Tuple[str, int]]:
+        """
+        (source IP, KIND_* flags) of a Scapy packet, or None if it counts for nothing.
+        Same rules as packet_parser.classify_frame() on the raw frame.
+        """
+        layer = packet
+        while isinstance(layer, (Ether, Dot1Q)):
+            layer = layer.payload
+        if not isinstance(layer, (IP, IPv6)):
+            return None
+        src_ip = layer.src
+        transport = layer.payload
+        while isinstance(transport, _IPV6_EXTENSIONS):
+            transport = transport.payload
+        if isinstance(transport, TCP):
+            kind = KIND_SYN if transport.flags == 2 else 0  # SYN flag only (SYN packet)
+            if is_http_request(bytes(transport.payload)):
+                kind |= KIND_HTTP
+            return (src_ip, kind) if kind else None
+        if isinstance(transport, UDP):
+            return src_ip, KIND_UDP
+        if isinstance(transport, (ICMP, _ICMPv6)):
+            return src_ip, KIND_ICMP
+        return None
+
     def process_packet(self, packet):
-        """Process captured packet and check for attack patterns."""
+        """Process captured Scapy packet and check for attack patterns."""
         if not self.running:
             return
-        
-        current_time = time.time()
+        classified = self.classify_packet(packet)
+        if classified:
+            self.count_packet(classified[0], classified[1], time.time())
+
+    def process_frame(self, frame: bytes, hatype: int = ARPHRD_ETHER):
+        """Process raw captured frame (fast path, no Scapy dissection)."""
+        if not self.running:
+            return
+        classified = classify_frame(frame, hatype)
+        if classified:
+            self.count_packet(classified[0], classified[1], time.time())
+
+    def count_packet(self, src_ip: str, kind: int, current_time: float):
+        """Count a classified packet and alert when its source exceeds a threshold."""
+        kind &= self.enabled_kinds
+        if not kind:
+            return
         
         # Reset counters if time window has passed
         if current_time - self.window_start_time >= self.time_window:
@@ -179,60 +240,37 @@ class DoSDetector:
             self.total_icmp_count = 0
             self.total_http_count = 0
         
-        # Process IP packets
-        if IP in packet:
-            src_ip = packet[IP].src
+        # TCP SYN packets (SYN flood)
+        if kind & KIND_SYN:
+            count = self.syn_packets.add(src_ip, current_time)
+            self.total_syn_count += 1
             
-            # Check for TCP packets
-            if TCP in packet:
-                # Check for TCP SYN packets (SYN flood)
-                if packet[TCP].flags == 2:  # SYN flag only (SYN packet)
-                    self.syn_packets[src_ip].append(current_time)
-                    self.total_syn_count += 1
-                    
-                    if self.check_syn_flood(src_ip, current_time):
-                        count = len(self.syn_packets[src_ip])
-                        self.alert("SYN Flood", src_ip, count, self.syn_threshold)
-                
-                # Check for HTTP requests (HTTP flood)
-                # Check both HTTPRequest layer and raw payload for HTTP methods
-                is_http = False
-                if packet.haslayer(HTTPRequest):
-                    is_http = True
-                elif Raw in packet:
-                    try:
-                        payload = packet[Raw].load.decode('utf-8', errors='ignore')
-                        # Check for common HTTP methods
-                        if any(method in payload for method in ['GET ', 'POST ', 'PUT ', 'DELETE ', 'HEAD ', 'OPTIONS ']):
-                            is_http = True
-                    except:
-                        pass
-                
-                if is_http:
-                    self.http_requests[src_ip].append(current_time)
-                    self.total_http_count += 1
-                    
-                    if self.check_http_flood(src_ip, current_time):
-                        count = len(self.http_requests[src_ip])
-                        self.alert("HTTP Flood", src_ip, count, self.http_threshold)
+            if count > self.syn_threshold:
+                self.alert("SYN Flood", src_ip, count, self.syn_threshold)
+        
+        # HTTP requests (HTTP flood)
+        if kind & KIND_HTTP:
+            count = self.http_requests.add(src_ip, current_time)
+            self.total_http_count += 1
             
-            # Check for UDP packets (UDP flood)
-            elif UDP in packet:
-                self.udp_packets[src_ip].append(current_time)
-                self.total_udp_count += 1
-                
-                if self.check_udp_flood(src_ip, current_time):
-                    count = len(self.udp_packets[src_ip])
-                    self.alert("UDP Flood", src_ip, count, self.udp_threshold)
+            if count > self.http_threshold:
+                self.alert("HTTP Flood", src_ip, count, self.http_threshold)
+        
+        # UDP packets (UDP flood)
+        if kind & KIND_UDP:
+            count = self.udp_packets.add(src_ip, current_time)
+            self.total_udp_count += 1
             
-            # Check for ICMP packets (ICMP flood/ping flood)
-            elif ICMP in packet:
-                self.icmp_packets[src_ip].append(current_time)
-                self.total_icmp_count += 1
-                
-                if self.check_icmp_flood(src_ip, current_time):
-                    count = len(self.icmp_packets[src_ip])
-                    self.alert("ICMP Flood", src_ip, count, self.icmp_threshold)
+            if count > self.udp_threshold:
+                self.alert("UDP Flood", src_ip, count, self.udp_threshold)
+        
+        # ICMP packets (ICMP flood/ping flood)
+        if kind & KIND_ICMP:
+            count = self.icmp_packets.add(src_ip, current_time)
+            self.total_icmp_count += 1
+            
+            if count > self.icmp_threshold:
+                self.alert("ICMP Flood", src_ip, count, self.icmp_threshold)
     
     def print_stats(self):
         """Print current statistics periodically."""
@@ -243,38 +281,128 @@ class DoSDetector:
                 
             current_time = time.time()
             
-            # Clean up old packets for all IPs
-            for ip in list(self.syn_packets.keys()):
-                self.cleanup_old_packets(self.syn_packets[ip], current_time)
-            for ip in list(self.udp_packets.keys()):
-                self.cleanup_old_packets(self.udp_packets[ip], current_time)
-            for ip in list(self.icmp_packets.keys()):
-                self.cleanup_old_packets(self.icmp_packets[ip], current_time)
-            for ip in list(self.http_requests.keys()):
-                self.cleanup_old_packets(self.http_requests[ip], current_time)
-            
-            # Calculate current rates
-            syn_rate = sum(len(packets) for packets in self.syn_packets.values())
-            udp_rate = sum(len(packets) for packets in self.udp_packets.values())
-            icmp_rate = sum(len(packets) for packets in self.icmp_packets.values())
-            http_rate = sum(len(packets) for packets in self.http_requests.values())
+            # Drop idle IPs and calculate current rates
+            window = self.window_stats(current_time)
+            syn_rate = window['syn'][0]
+            udp_rate = window['udp'][0]
+            icmp_rate = window['icmp'][0]
+            http_rate = window['http'][0]
             
             # Call GUI callback if available
             if self.stats_callback:
                 stats_dict = {
-                    'syn': {'current': syn_rate, 'threshold': self.syn_threshold},
-                    'udp': {'current': udp_rate, 'threshold': self.udp_threshold},
-                    'icmp': {'current': icmp_rate, 'threshold': self.icmp_threshold},
-                    'http': {'current': http_rate, 'threshold': self.http_threshold}
+                    'syn': {'current': syn_rate, 'threshold': self.syn_threshold, 'top': window['syn'][1]},
+                    'udp': {'current': udp_rate, 'threshold': self.udp_threshold, 'top': window['udp'][1]},
+                    'icmp': {'current': icmp_rate, 'threshold': self.icmp_threshold, 'top': window['icmp'][1]},
+                    'http': {'current': http_rate, 'threshold': self.http_threshold, 'top': window['http'][1]}
                 }
                 self.stats_callback(stats_dict)
             
+            capture_stats = self.capture_statistics()
+            
             # Also print to console if no GUI
             if not self.stats_callback:
+                drops = f" | Drops: {capture_stats['dropped']}/{capture_stats['received']}" if capture_stats else ""
                 print(f"\r[STATS] SYN: {syn_rate}/{self.syn_threshold} | "
                       f"UDP: {udp_rate}/{self.udp_threshold} | "
                       f"ICMP: {icmp_rate}/{self.icmp_threshold} | "
-                      f"HTTP: {http_rate}/{self.http_threshold}", end="", flush=True)
+                      f"HTTP: {http_rate}/{self.http_threshold}{drops}", end="", flush=True)
+    
+    def window_stats(self, current_time: float) -> Dict[str, Tuple[int, list]]:
+        """(packets in the time window, top sources) per attack type; summed over the workers in fanout mode."""
+        merger = self._merger
+        stats = {}
+        for name, kind, tracker in (("syn", KIND_SYN, self.syn_packets), ("udp", KIND_UDP, self.udp_packets),
+                                    ("icmp", KIND_ICMP, self.icmp_packets), ("http", KIND_HTTP, self.http_requests)):
+            if merger:
+                stats[name] = (merger.total(kind), merger.top(kind, current_time))
+            else:
+                stats[name] = (self.cleanup_old_packets(tracker, current_time), tracker.top())
+        return stats
+    
+    def capture_statistics(self) -> Optional[Dict[str, int]]:
+        """
+        Kernel capture totals since monitoring started: {"received": ..., "dropped": ...}.
+        Frames are dropped when the detector cannot keep up. None if not capturing or the
+        capture socket has no statistics (PACKET_STATISTICS is Linux only).
+        """
+        return self._capture_stats() if self._capture_stats else None
+    
+    def _open_capture(self, open_socket, gui_mode: bool):
+        """
+        open_socket(bpf_filter); without filter if the filter does not fit the capture
+        (see bpf_filter_error()) or cannot be compiled.
+        """
+        if self.bpf_filter:
+            error = bpf_filter_error(self.interface)
+            if error is None:
+                try:
+                    return open_socket(self.bpf_filter)
+                except (Scapy_Exception, ImportError) as e:
+                    # Compiling needs libpcap or tcpdump; capture everything instead
+                    error = str(e)
+            self.filter_error = error
+            if not gui_mode:
+                print(f"Warning: BPF filter not attached ({error}); capturing all traffic")
+        return open_socket(None)
+    
+    def _compiled_filter(self, bpf_filter: Optional[str]) -> Optional[str]:
+        """`bpf_filter` once it is known to compile (workers attach it themselves)."""
+        if bpf_filter:
+            from scapy.arch.common import compile_filter, free_filter
+            free_filter(compile_filter(bpf_filter, self.interface))
+        return bpf_filter
+    
+    def _monitor_fanout(self, gui_mode: bool):
+        """
+        Capture with `workers` processes in a PACKET_FANOUT group; this process merges
+        their per-source counts and applies the thresholds and alert cooldowns.
+        """
+        config = {
+            "interface": self.interface,
+            "bpf_filter": self._open_capture(self._compiled_filter, gui_mode),
+            "group": fanout_group(),
+            "window": self.time_window,
+            "thresholds": {kind: self._threshold(kind) for kind in _ALERT_NAMES},
+            "workers": self.workers,
+            "enabled_kinds": self.enabled_kinds,
+            "max_sources": self.max_sources,
+            "expected_rate": self.expected_rate,
+        }
+        ctx = multiprocessing.get_context("spawn")
+        reports = ctx.Queue()
+        stop = ctx.Event()
+        processes = [ctx.Process(target=run_worker, args=(i, config, reports, stop), daemon=True)
+                     for i in range(self.workers)]
+        self._merger = merger = ShardMerger(self.workers, self.time_window, self.max_sources)
+        self._capture_stats = merger.kernel_statistics
+        for process in processes:
+            process.start()
+        try:
+            while self.running:
+                try:
+                    report = reports.get(timeout=0.5)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        raise RuntimeError("All capture workers exited")
+                    continue
+                if report[0] == "error":
+                    raise OSError(f"Capture worker {report[1]}: {report[2]}")
+                _, worker, reported_at, counts, totals, kernel = report
+                for kind, src_ip, count in merger.merge(worker, reported_at, counts, totals, kernel):
+                    threshold = self._threshold(kind)
+                    if count > threshold:
+                        self.alert(_ALERT_NAMES[kind], src_ip, count, threshold)
+        finally:
+            stop.set()
+            for process in processes:
+                process.join(timeout=2)
+                if process.is_alive():
+                    process.terminate()
+    
+    def _threshold(self, kind: int) -> int:
+        return {KIND_SYN: self.syn_threshold, KIND_UDP: self.udp_threshold,
+                KIND_ICMP: self.icmp_threshold, KIND_HTTP: self.http_threshold}[kind]
     
     def start_monitoring(self, gui_mode=False):
         """Start monitoring network traffic."""
@@ -283,6 +411,9 @@ class DoSDetector:
             print("DoS Attack Detector - Starting Monitoring")
             print("="*70)
             print(f"Interface: {self.interface or 'All interfaces'}")
+            workers = f", {self.workers} workers" if self.capture == CAPTURE_FANOUT else ""
+            print(f"Capture: {self.capture}{workers} (BPF filter: {'on' if self.bpf_filter else 'off'})")
+            print(f"Detectors: {', '.join(self.detectors)}")
             print(f"Time Window: {self.time_window} seconds")
             print(f"Thresholds:")
             print(f"  - SYN Flood: {self.syn_threshold} packets/{self.time_window}s")
@@ -298,10 +429,25 @@ class DoSDetector:
         
         # Start packet capture
         try:
-            sniff(iface=self.interface, 
-                  prn=self.process_packet, 
-                  stop_filter=lambda x: not self.running,
-                  store=False)
+            if self.capture == CAPTURE_FANOUT:
+                self._monitor_fanout(gui_mode)
+            elif self.capture == CAPTURE_RAW:
+                with self._open_capture(lambda bpf: RawCapture(self.interface, bpf_filter=bpf), gui_mode) as capture:
+                    self._capture_stats = capture.statistics
+                    for frame, hatype in capture.frames(lambda: self.running):
+                        self.process_frame(frame, hatype)
+            else:
+                sock = self._open_capture(lambda bpf: conf.L2listen(iface=self.interface, filter=bpf), gui_mode)
+                stats = CaptureStatistics()
+                # Linux L2ListenSocket keeps its AF_PACKET socket in .ins
+                self._capture_stats = lambda: stats.update(getattr(sock, "ins", None))
+                try:
+                    sniff(opened_socket=sock,
+                          prn=self.process_packet, 
+                          stop_filter=lambda x: not self.running,
+                          store=False)
+                finally:
+                    sock.close()
         except KeyboardInterrupt:
             if not gui_mode:
                 print("\n\nStopping detector...")
@@ -373,16 +519,74 @@ def main():
         default=10,
         help="Time window in seconds for rate calculation (default: 10)"
     )
+    parser.add_argument(
+        "--max-sources",
+        type=int,
+        default=MAX_SOURCES,
+        help=f"Source IPs counted exactly per attack type (default: {MAX_SOURCES})"
+    )
+    parser.add_argument(
+        "--expected-rate",
+        type=int,
+        default=EXPECTED_RATE,
+        help=f"Expected packets/s per attack type, sizes the per-source sketches (default: {EXPECTED_RATE})"
+    )
+    parser.add_argument(
+        "--capture",
+        choices=CAPTURE_MODES,
+        default=CAPTURE_SCAPY,
+        help="Capture back-end: scapy (sniff), raw (AF_PACKET socket with struct parsing) or "
+             "fanout (raw in several processes, PACKET_FANOUT); raw and fanout are Linux only (default: scapy)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Capture processes for --capture fanout (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--detectors",
+        type=str,
+        default=",".join(DETECTORS),
+        help=f"Comma-separated detectors to enable (default: {','.join(DETECTORS)})"
+    )
+    parser.add_argument(
+        "--http-ports",
+        type=str,
+        default=",".join(str(p) for p in HTTP_PORTS),
+        help=f"Comma-separated TCP ports the capture filter passes for HTTP (default: {','.join(str(p) for p in HTTP_PORTS)})"
+    )
+    parser.add_argument(
+        "--no-bpf",
+        action="store_true",
+        help="Do not attach the kernel BPF capture filter (it is only attached with -i on an Ethernet interface)"
+    )
     
     args = parser.parse_args()
     
+    detectors = [d.strip() for d in args.detectors.split(",") if d.strip()]
+    unknown = [d for d in detectors if d not in DETECTORS]
+    if unknown:
+        parser.error(f"Unknown detector(s): {', '.join(unknown)}")
+    try:
+        http_ports = [int(p) for p in args.http_ports.split(",") if p.strip()]
+    except ValueError:
+        parser.error(f"Invalid --http-ports: {args.http_ports}")
+    
     detector = DoSDetector(
         syn_threshold=args.syn_threshold,
         udp_threshold=args.udp_threshold,
         icmp_threshold=args.icmp_threshold,
         http_threshold=args.http_threshold,
         time_window=args.time_window,
-        interface=args.interface
+        interface=args.interface,
+        max_sources=args.max_sources,
+        expected_rate=args.expected_rate,
+        capture=args.capture,
+        detectors=detectors,
+        http_ports=http_ports,
+        use_bpf=not args.no_bpf,
+        workers=args.workers
     )
     
     detector.start_monitoring()
@@ -0,0 +1,207 @@
+"""
+Multi-process capture for the DoS detector (Linux).
+
+N worker processes each open an AF_PACKET socket in one PACKET_FANOUT group, so the
+kernel spreads the frames over them by flow hash and every core parses its own share.
+A worker classifies and counts with its own SourceTrackers (at threshold / N, so a
+source spread over all workers is still tracked exactly in each) and every
+REPORT_INTERVAL sends the coordinator its window totals and the current window counts
+of the sources it tracks exactly (at most REPORT_TOP_K per packet kind, the largest).
+A reported source is reported again every interval, also without new packets, until
+its count has decayed to 0, so the coordinator never sums a stale larger share.
+Sketch estimates are never reported: they only decide which sources a worker
+counts exactly. ShardMerger adds those up per source over the workers;
+the coordinator applies thresholds and alert cooldowns to the sums.
+
+Traffic is sent as window counts, not per packet, so the coordinator's work grows
+with the number of heavy sources, not with the packet rate.
+"""
+
+import heapq
+import math
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from packet_parser import (
+    KIND_HTTP, KIND_ICMP, KIND_SYN, KIND_UDP, RawCapture, SOL_PACKET, classify_frame,
+)
+from sketches import MAX_SOURCES, TOP_K, LRUTable, SourceTracker
+
+PACKET_FANOUT = 18
+PACKET_FANOUT_HASH = 0
+
+# Seconds between worker reports (also the extra alert latency of this mode)
+REPORT_INTERVAL = 0.25
+
+# Sources per packet kind in one worker report (the largest exact counts)
+REPORT_TOP_K = TOP_K
+
+KINDS = (KIND_SYN, KIND_HTTP, KIND_UDP, KIND_ICMP)
+
+
+def join_fanout(sock: socket.socket, group: int, mode: int = PACKET_FANOUT_HASH) -> None:
+    """Add an AF_PACKET socket to fanout `group` (16 bits); all members must use the same mode."""
+    sock.setsockopt(SOL_PACKET, PACKET_FANOUT, (group & 0xFFFF) | (mode << 16))
+
+
+def worker_thresholds(thresholds: Dict[int, int], workers: int) -> Dict[int, int]:
+    """Per-worker share of each threshold, used for promotion to exact counting."""
+    return {kind: max(1, math.ceil(threshold / workers)) for kind, threshold in thresholds.items()}
+
+
+def top_counts(pending: Dict[Tuple[int, str], int], k: int = REPORT_TOP_K) -> Dict[Tuple[int, str], int]:
+    """The `k` largest counts of each packet kind in `pending`."""
+    by_kind: Dict[int, List[Tuple[int, str]]] = {}
+    for key, count in pending.items():
+        by_kind.setdefault(key[0], []).append((count, key[1]))
+    top = {}
+    for kind, counts in by_kind.items():
+        if len(counts) > k:
+            counts = heapq.nlargest(k, counts)
+        top.update(((kind, src), count) for count, src in counts)
+    return top
+
+
+def report_counts(trackers: Dict[int, SourceTracker], pending: Set[Tuple[int, str]],
+                  reported: Set[Tuple[int, str]], now: float) -> Dict[Tuple[int, str], int]:
+    """
+    Counts for one worker report: the current exact count of every source counted since
+    the last report (`pending`) or in it (`reported`), the top REPORT_TOP_K per kind.
+    Previously reported sources that decayed or dropped out of the top are sent as 0.
+    Replaces `reported` with the sources sent with a count.
+    """
+    current = {}
+    for key in reported | pending:
+        count = trackers[key[0]].count(key[1], now)
+        if count:
+            current[key] = count
+    counts = dict.fromkeys(reported, 0)
+    top = top_counts(current)
+    counts.update(top)
+    reported.clear()
+    reported.update(top)
+    return counts
+
+
+def run_worker(index: int, config: Dict, reports, stop) -> None:
+    """
+    Worker process: capture one fanout share, count it and report to the coordinator.
+    Reports are ("report", index, time, {(kind, src): count}, {kind: total}, kernel stats)
+    or ("error", index, message) if the capture cannot be opened.
+    """
+    capture = None
+    try:
+        capture = RawCapture(config["interface"], timeout=REPORT_INTERVAL, bpf_filter=config["bpf_filter"])
+        join_fanout(capture.sock, config["group"])
+    except Exception as e:
+        if capture:
+            capture.close()
+        reports.put(("error", index, f"{type(e).__name__}: {e}"))
+        return
+
+    window = config["window"]
+    enabled = config["enabled_kinds"]
+    shares = worker_thresholds(config["thresholds"], config["workers"])
+    rate = config["expected_rate"] / config["workers"]
+    trackers = {kind: SourceTracker(window, shares[kind], config["max_sources"], rate) for kind in KINDS}
+
+    # Sources counted exactly since the last report / in it; others are not reported
+    pending: Set[Tuple[int, str]] = set()
+    reported: Set[Tuple[int, str]] = set()
+    recvfrom = capture.sock.recvfrom
+    snaplen = capture.snaplen
+    next_report = time.time() + REPORT_INTERVAL
+    with capture:
+        while True:
+            try:
+                frame, address = recvfrom(snaplen)
+            except socket.timeout:
+                frame = None
+            now = time.time()
+            if frame is not None:
+                classified = classify_frame(frame, address[3])
+                if classified:
+                    src, kind = classified
+                    kind &= enabled
+                    for bit in KINDS:
+                        if kind & bit:
+                            if trackers[bit].add(src, now):
+                                pending.add((bit, src))
+            if now >= next_report:
+                # Checked here, not per frame: is_set() takes a lock
+                if stop.is_set():
+                    break
+                totals = {kind: tracker.total(now) for kind, tracker in trackers.items()}
+                counts = report_counts(trackers, pending, reported, now)
+                reports.put(("report", index, now, counts, totals, capture.statistics()))
+                pending = set()
+                next_report = now + REPORT_INTERVAL
+
+
+class ShardMerger:
+    """
+    Coordinator side: the latest window counts reported by each worker, summed per
+    source and per packet kind. A worker's count no longer counts once it is older
+    than the window. Thread-safe (the statistics thread reads while reports are merged).
+    """
+
+    def __init__(self, workers: int, window: float, max_sources: int = MAX_SOURCES):
+        self.workers = workers
+        self.window = window
+        # kind -> src -> {worker: (count, reported_at)}
+        self.sources = {kind: LRUTable(max_sources, ttl=window) for kind in KINDS}
+        self.totals: Dict[int, Dict[int, int]] = {}  # worker -> {kind: window total}
+        self.kernel: Dict[int, Dict[str, int]] = {}  # worker -> kernel statistics
+        self._lock = threading.Lock()
+
+    def merge(self, worker: int, reported_at: float, counts: Dict[Tuple[int, str], int],
+              totals: Dict[int, int], kernel: Optional[Dict[str, int]]) -> List[Tuple[int, str, int]]:
+        """Add one worker report; returns (kind, src, summed count) for every source it updated."""
+        updated = []
+        with self._lock:
+            self.totals[worker] = totals
+            if kernel is not None:
+                self.kernel[worker] = kernel
+            for (kind, src), count in counts.items():
+                table = self.sources[kind]
+                shares = table.touch(src, reported_at)
+                if shares is None:
+                    shares = {}
+                    table.set(src, shares, reported_at)
+                shares[worker] = (count, reported_at)
+                updated.append((kind, src, self._sum(shares, reported_at)))
+        return updated
+
+    def _sum(self, shares: Dict[int, Tuple[int, float]], now: float) -> int:
+        cutoff = now - self.window
+        return sum(count for count, reported_at in shares.values() if reported_at > cutoff)
+
+    def total(self, kind: int) -> int:
+        """Packets of `kind` from all sources in the window, over all workers."""
+        with self._lock:
+            return sum(totals.get(kind, 0) for totals in self.totals.values())
+
+    def top(self, kind: int, now: float, n: int = 5) -> List[Tuple[str, int]]:
+        with self._lock:
+            table = self.sources[kind]
+            table.expire(now)
+            counts = [(src, self._sum(shares, now)) for src, shares in table.items()]
+        return sorted((item for item in counts if item[1] > 0), key=lambda item: item[1], reverse=True)[:n]
+
+    def kernel_statistics(self) -> Optional[Dict[str, int]]:
+        with self._lock:
+            if not self.kernel:
+                return None
+            return {
+                "received": sum(stats["received"] for stats in self.kernel.values()),
+                "dropped": sum(stats["dropped"] for stats in self.kernel.values()),
+            }
+
+
+def fanout_group() -> int:
+    """A fanout group id unlikely to collide with another capture on the host."""
+    return os.getpid() & 0xFFFF
+
@@ -0,0 +1,300 @@
+"""
+Raw-frame packet classification for the DoS detector.
+
+Reads only the fields the detector counts (source address, transport protocol,
+TCP flags and the first payload bytes) at fixed struct offsets, without building
+Scapy packets. classify_frame() follows the same rules as
+DoSDetector.classify_packet() on the dissected frame:
+
+- the network header is the first IPv4/IPv6 header after Ethernet (and VLAN tags);
+- the transport header follows it directly, or after IPv6 hop-by-hop, routing,
+  destination-options and fragment headers; non-first fragments count for nothing;
+- a TCP packet is a SYN when only the SYN flag is set, and an HTTP request when
+  its payload starts with an HTTP method.
+
+RawCapture reads frames from an AF_PACKET socket (Linux, root or CAP_NET_RAW).
+build_bpf_filter() turns the enabled detectors into a kernel-side capture filter,
+so frames no detector counts are never copied to userspace. The filter reads
+Ethernet offsets, so it is only attached to a capture bound to one Ethernet
+interface (see bpf_filter_error()).
+"""
+
+import socket
+import struct
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# Packet kinds (bit flags: a SYN that carries an HTTP request is both)
+KIND_SYN = 1
+KIND_HTTP = 2
+KIND_UDP = 4
+KIND_ICMP = 8
+
+# Detectors that can be enabled, and the TCP ports on which the capture filter
+# passes HTTP requests (the classification itself does not look at ports)
+DETECTORS = ("syn", "udp", "icmp", "http")
+HTTP_PORTS = (80, 8000, 8008, 8080, 8888)
+
+HTTP_METHODS = (b"GET ", b"POST ", b"PUT ", b"DELETE ", b"HEAD ", b"OPTIONS ", b"PATCH ", b"CONNECT ", b"TRACE ")
+_HTTP_PREFIX = max(len(method) for method in HTTP_METHODS)
+
+# Capture back-ends of DoSDetector
+CAPTURE_SCAPY = "scapy"
+CAPTURE_RAW = "raw"
+CAPTURE_FANOUT = "fanout"
+CAPTURE_MODES = (CAPTURE_SCAPY, CAPTURE_RAW, CAPTURE_FANOUT)
+
+# Bytes read per frame: enough for link, IP (with extension headers), TCP
+# headers and the payload prefix; the rest of the frame is never looked at
+SNAPLEN = 512
+
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+_PACKET_STATS = struct.Struct("II")  # struct tpacket_stats: packets, drops
+
+# Link-layer types (hatype of an AF_PACKET address)
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772  # Linux lo: Ethernet header with zero addresses
+ARPHRD_NONE = 0xFFFE  # tun devices: frame starts with the IP header
+_ETHERNET_LINKS = (ARPHRD_ETHER, ARPHRD_LOOPBACK)
+
+_ETH_IPV4 = 0x0800
+_ETH_IPV6 = 0x86DD
+_VLAN_TAGS = (0x8100, 0x88A8, 0x9100)
+
+_PROTO_ICMP = 1
+_PROTO_TCP = 6
+_PROTO_UDP = 17
+_PROTO_ICMPV6 = 58
+_IPV6_FRAGMENT = 44
+_IPV6_EXTENSIONS = (0, 43, 60)  # hop-by-hop, routing, destination options
+
+_IPV4_FIELDS = struct.Struct("!H2xHxB")  # total length, flags/fragment offset, protocol
+_IPV6_FIELDS = struct.Struct("!HB")  # payload length, next header
+_U16 = struct.Struct("!H")
+
+_inet_ntoa = socket.inet_ntoa
+_inet_ntop = socket.inet_ntop
+_AF_INET6 = socket.AF_INET6
+
+
+def is_http_request(payload: bytes) -> bool:
+    """Whether a TCP payload starts with an HTTP request method."""
+    return payload[:_HTTP_PREFIX].startswith(HTTP_METHODS)
+
+
+def _classify_transport(frame: bytes, start: int, end: int, proto: int, icmp_proto: int,
+                        src: str) -> Optional[Tuple[str, int]]:
+    if proto == _PROTO_TCP:
+        if end - start < 20:
+            return None
+        offset_byte = frame[start + 12]
+        flags = ((offset_byte & 0x01) << 8) | frame[start + 13]
+        kind = KIND_SYN if flags == 0x02 else 0
+        payload = start + (offset_byte >> 4) * 4
+        if payload < end and frame[payload:min(end, payload + _HTTP_PREFIX)].startswith(HTTP_METHODS):
+            kind |= KIND_HTTP
+        return (src, kind) if kind else None
+    if proto == _PROTO_UDP:
+        return (src, KIND_UDP) if end - start >= 8 else None
+    if proto == icmp_proto:
+        return (src, KIND_ICMP) if end - start >= 4 else None
+    return None
+
+
+def _classify_ipv4(frame: bytes, offset: int) -> Optional[Tuple[str, int]]:
+    if len(frame) < offset + 20 or frame[offset] >> 4 != 4:
+        return None
+    total_length, fragment, proto = _IPV4_FIELDS.unpack_from(frame, offset + 2)
+    if fragment & 0x1FFF:
+        return None
+    start = offset + (frame[offset] & 0x0F) * 4
+    # Ethernet padding after the IP packet is not payload
+    end = min(len(frame), offset + total_length)
+    return _classify_transport(frame, start, end, proto, _PROTO_ICMP, _inet_ntoa(frame[offset + 12:offset + 16]))
+
+
+def _classify_ipv6(frame: bytes, offset: int) -> Optional[Tuple[str, int]]:
+    if len(frame) < offset + 40 or frame[offset] >> 4 != 6:
+        return None
+    payload_length, proto = _IPV6_FIELDS.unpack_from(frame, offset + 4)
+    start = offset + 40
+    end = min(len(frame), start + payload_length)
+    while proto in _IPV6_EXTENSIONS or proto == _IPV6_FRAGMENT:
+        if start + 8 > end:
+            return None
+        if proto == _IPV6_FRAGMENT:
+            if _U16.unpack_from(frame, start + 2)[0] & 0xFFF8:
+                return None
+            proto = frame[start]
+            start += 8
+        else:
+            proto = frame[start]
+            start += (frame[start + 1] + 1) * 8
+    return _classify_transport(frame, start, end, proto, _PROTO_ICMPV6,
+                               _inet_ntop(_AF_INET6, frame[offset + 8:offset + 24]))
+
+
+def classify_frame(frame: bytes, hatype: int = ARPHRD_ETHER) -> Optional[Tuple[str, int]]:
+    """
+    (source IP, KIND_* flags) of a captured frame, or None when the detector does not
+    count it. `hatype` is the link-layer type the frame was captured on.
+    """
+    if hatype in _ETHERNET_LINKS:
+        if len(frame) < 14:
+            return None
+        ethertype = (frame[12] << 8) | frame[13]
+        offset = 14
+        while ethertype in _VLAN_TAGS and len(frame) >= offset + 4:
+            ethertype = (frame[offset + 2] << 8) | frame[offset + 3]
+            offset += 4
+        if ethertype == _ETH_IPV4:
+            return _classify_ipv4(frame, offset)
+        if ethertype == _ETH_IPV6:
+            return _classify_ipv6(frame, offset)
+        return None
+    if hatype == ARPHRD_NONE and frame:
+        version = frame[0] >> 4
+        if version == 4:
+            return _classify_ipv4(frame, 0)
+        if version == 6:
+            return _classify_ipv6(frame, 0)
+    return None
+
+
+def build_bpf_filter(detectors: Iterable[str] = DETECTORS, http_ports: Iterable[int] = HTTP_PORTS) -> Optional[str]:
+    """
+    BPF expression (pcap-filter syntax) passing only frames the enabled detectors can
+    count: SYN-only TCP, UDP, ICMP and TCP with payload to an HTTP port. None if no
+    detector is enabled. IPv6 offsets assume the transport header follows the fixed
+    header; IPv6 packets with extension headers are passed as they are.
+    """
+    detectors = set(detectors)
+    ports = " or ".join(f"tcp dst port {port}" for port in http_ports)
+    ipv4 = []
+    ipv6 = []
+    if "syn" in detectors:
+        ipv4.append("(tcp[13] == 2 and tcp[12] & 1 == 0)")
+        ipv6.append("(ip6[6] == 6 and ip6[53] == 2 and ip6[52] & 1 == 0)")
+    if "http" in detectors and ports:
+        ipv4.append(f"(({ports}) and ip[2:2] - ((ip[0] & 0xf) << 2) - ((tcp[12] & 0xf0) >> 2) > 0)")
+        ipv6.append(f"(ip6[6] == 6 and ({ports}) and ip6[4:2] - ((ip6[52] & 0xf0) >> 2) > 0)")
+    if "udp" in detectors:
+        ipv4.append("udp")
+        ipv6.append("ip6[6] == 17")
+    if "icmp" in detectors:
+        ipv4.append("icmp")
+        ipv6.append("ip6[6] == 58")
+    if not ipv4:
+        return None
+    ipv6.extend(f"ip6[6] == {header}" for header in _IPV6_EXTENSIONS + (_IPV6_FRAGMENT,))
+    expression = f"(ip and ({' or '.join(ipv4)})) or (ip6 and ({' or '.join(ipv6)}))"
+    # Each vlan keyword shifts the offsets of what follows by one tag (up to QinQ)
+    return f"{expression} or (vlan and ({expression} or (vlan and ({expression}))))"
+
+
+def link_type(interface: str) -> Optional[int]:
+    """ARPHRD_* link-layer type of `interface` (Linux sysfs), or None if unknown."""
+    try:
+        with open(f"/sys/class/net/{interface}/type") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def bpf_filter_error(interface: Optional[str]) -> Optional[str]:
+    """
+    Why the capture filter cannot be attached to a capture on `interface`, or None if
+    it can. The filter is compiled for one link type, but a capture on all interfaces
+    also sees frames of other link types (a tun device's frames start with the IP
+    header), which it would read at Ethernet offsets.
+    """
+    if not interface:
+        return "capturing on all interfaces, which can have different link types"
+    hatype = link_type(interface)
+    if hatype is not None and hatype not in _ETHERNET_LINKS:
+        return f"{interface} is not an Ethernet interface"
+    return None
+
+
+def read_packet_statistics(sock: socket.socket) -> Optional[Tuple[int, int]]:
+    """
+    (packets, drops) counted by the kernel for an AF_PACKET socket since the previous
+    call (reading resets them), or None when the socket does not support it.
+    """
+    try:
+        return _PACKET_STATS.unpack(sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _PACKET_STATS.size))
+    except (OSError, AttributeError, struct.error):
+        return None
+
+
+class CaptureStatistics:
+    """Kernel packet and drop totals of a capture socket, accumulated over reads."""
+
+    def __init__(self):
+        self.received = 0
+        self.dropped = 0
+
+    def update(self, sock) -> Optional[Dict[str, int]]:
+        """Add the counts since the last read; None if `sock` has no statistics."""
+        counts = read_packet_statistics(sock)
+        if counts is None:
+            return None
+        self.received += counts[0]
+        self.dropped += counts[1]
+        return self.as_dict()
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"received": self.received, "dropped": self.dropped}
+
+
+class RawCapture:
+    """
+    Frames from an AF_PACKET socket on `interface` (all interfaces if None), truncated
+    to `snaplen` bytes, optionally behind a BPF filter. Linux only; needs root or
+    CAP_NET_RAW.
+    """
+
+    def __init__(self, interface: Optional[str] = None, snaplen: int = SNAPLEN, timeout: float = 0.5,
+                 bpf_filter: Optional[str] = None):
+        self.interface = interface
+        self.snaplen = snaplen
+        self.bpf_filter = bpf_filter
+        self.stats = CaptureStatistics()
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            if bpf_filter:
+                # Attached before bind, so no unfiltered frame gets queued
+                from scapy.arch.linux import attach_filter
+                attach_filter(self.sock, bpf_filter, interface)
+            if interface:
+                self.sock.bind((interface, ETH_P_ALL))
+            # Time out now and then so a stopped detector is noticed without traffic
+            self.sock.settimeout(timeout)
+        except Exception:
+            self.sock.close()
+            raise
+
+    def frames(self, running: Callable[[], bool] = lambda: True) -> Iterator[Tuple[bytes, int]]:
+        """Yield (frame, hatype) until `running()` returns False."""
+        recvfrom = self.sock.recvfrom
+        snaplen = self.snaplen
+        while running():
+            try:
+                frame, address = recvfrom(snaplen)
+            except socket.timeout:
+                continue
+            yield frame, address[3]
+
+    def statistics(self) -> Optional[Dict[str, int]]:
+        """Kernel totals since the socket was opened: {"received": ..., "dropped": ...}."""
+        return self.stats.update(self.sock)
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
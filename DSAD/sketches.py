@@ -0,0 +1,370 @@
+"""
+Bounded per-source state for the DoS detector.
+
+- CountMinSketch: windowed per-key packet estimates in fixed memory (never below
+  the true count, apart from the interpolation at the window edge), with
+  conservative update.
+- SpaceSaving: the K heaviest keys of the current window.
+- LRUTable: exact entries with a size limit (least recently used goes first)
+  and an idle timeout.
+- SourceTracker: combines the three for one attack type. Every packet updates
+  the sketch; a source gets an exact SlidingWindowCounter once its estimate minus
+  the sketch noise reaches a quarter of the threshold. The counter starts from the
+  source's share of the current sketch window (less noise, at most half the
+  threshold), so an alert always needs at least half the threshold in exactly
+  counted packets. A spoofed-source flood (millions of addresses with a few
+  packets each) stays below the noise and creates no exact entries.
+
+Memory is fixed by the parameters, not by the number of distinct sources.
+"""
+
+import random
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from window_counters import SlidingWindowCounter
+
+# Sketch width follows the expected packet rate per attack type: about
+# SKETCH_LOAD packets per counter in a window at that rate. The default rate
+# and a 10 s window give 4 rows x 65536 counters x 2 windows x 4 bytes = 2 MB.
+EXPECTED_RATE = 20000
+SKETCH_LOAD = 4
+SKETCH_MIN_WIDTH = 1 << 12
+SKETCH_MAX_WIDTH = 1 << 20
+SKETCH_DEPTH = 4
+
+# Exact per-IP counters kept per attack type
+MAX_SOURCES = 10000
+
+# Keys in the Space-Saving table per attack type: every source above 1/TOP_K of the
+# window's packets is guaranteed to be in it
+TOP_K = 256
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def sketch_width(expected_rate: float, window: float) -> int:
+    """Power of two counters per row for `expected_rate` packets/s over `window` seconds."""
+    cells = max(1, int(expected_rate * window / SKETCH_LOAD))
+    return min(SKETCH_MAX_WIDTH, max(SKETCH_MIN_WIDTH, 1 << (cells - 1).bit_length()))
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch over a sliding window: counts of the current and previous window,
+    the previous one weighted by how much of it still overlaps (now - window, now].
+    Conservative update: only the key's smallest counters are raised, which keeps
+    the over-estimate of keys that share counters with heavy ones down.
+    """
+
+    def __init__(self, window: float, width: int = 1 << 16, depth: int = SKETCH_DEPTH,
+                 seed: Optional[int] = None):
+        self.window = float(window)
+        self.width = width
+        self.depth = depth
+        rng = random.Random(seed)
+        self._hashes = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(_MERSENNE_PRIME)) for _ in range(depth)]
+        self._offsets = [row * width for row in range(depth)]
+        self._current = self._zeros()
+        self._previous = self._zeros()
+        self._current_total = 0
+        self._previous_total = 0
+        self._epoch = None
+
+    def _zeros(self) -> array:
+        return array("I", bytes(4 * self.width * self.depth))
+
+    def _cells(self, key: Hashable) -> List[int]:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        width = self.width
+        return [off + (a * h + b) % _MERSENNE_PRIME % width for (a, b), off in zip(self._hashes, self._offsets)]
+
+    def _advance(self, now: float) -> float:
+        """Roll the windows forward; returns the weight of the previous window."""
+        epoch = int(now // self.window)
+        if epoch != self._epoch:
+            if self._epoch is not None and epoch == self._epoch + 1:
+                self._previous, self._current = self._current, self._previous
+                self._current[:] = self._zeros()
+                self._previous_total = self._current_total
+            elif self._epoch is None or epoch > self._epoch:
+                self._current = self._zeros()
+                self._previous = self._zeros()
+                self._previous_total = 0
+            else:
+                return 0.0  # clock stepped back: count into the current window
+            self._current_total = 0
+            self._epoch = epoch
+        return 1.0 - (now - epoch * self.window) / self.window
+
+    def add(self, key: Hashable, now: float, n: int = 1) -> int:
+        """Record `n` packets from `key` and return its estimated window count."""
+        weight = self._advance(now)
+        current = self._current
+        previous = self._previous
+        cells = self._cells(key)
+        self._current_total += n
+        target = min(current[cell] for cell in cells) + n
+        if target > 0xFFFFFFFF:
+            target = 0xFFFFFFFF
+        estimate = None
+        for cell in cells:
+            value = current[cell]
+            if value < target:
+                current[cell] = value = target
+            value += previous[cell] * weight
+            if estimate is None or value < estimate:
+                estimate = value
+        return int(estimate + 0.5)
+
+    def estimate(self, key: Hashable, now: float) -> int:
+        weight = self._advance(now)
+        current = self._current
+        previous = self._previous
+        return int(min(current[c] + previous[c] * weight for c in self._cells(key)) + 0.5)
+
+    def current_share(self, key: Hashable, now: float) -> float:
+        """
+        Estimate of `key` in the current sketch window only (which lies entirely inside
+        the sliding window) less the average noise per counter of that window.
+        """
+        self._advance(now)
+        current = self._current
+        return min(current[c] for c in self._cells(key)) - self._current_total / self.width
+
+    def noise(self, now: float) -> float:
+        """
+        Packets per counter in the window, averaged over a row: what an estimate may
+        hold of other keys. Under a spoofed-source flood every key's estimate is about this.
+        """
+        weight = self._advance(now)
+        return (self._current_total + self._previous_total * weight) / self.width
+
+    @property
+    def nbytes(self) -> int:
+        return 2 * self._current.itemsize * len(self._current)
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K with a stream summary (keys grouped by count), so increments,
+    replacements and finding the minimum are O(1). Counts over-estimate by at most
+    the recorded error; every key seen more than N/K times is guaranteed to be present.
+    """
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.clear()
+
+    def clear(self) -> None:
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self._by_count: Dict[int, set] = {}
+        self._min = 0
+
+    def _move(self, key: Hashable, old: int, new: int) -> None:
+        if old:
+            keys = self._by_count[old]
+            keys.discard(key)
+            if not keys:
+                del self._by_count[old]
+        self._by_count.setdefault(new, set()).add(key)
+
+    def add(self, key: Hashable) -> None:
+        counts = self.counts
+        count = counts.get(key)
+        if count is not None:
+            self._move(key, count, count + 1)
+            counts[key] = count + 1
+            if count == self._min and self._min not in self._by_count:
+                self._min += 1
+            return
+        if len(counts) < self.k:
+            counts[key] = 1
+            self.errors[key] = 0
+            self._move(key, 0, 1)
+            self._min = 1
+            return
+        # Replace a key with the minimum count; the newcomer inherits it as error
+        victim = self._by_count[self._min].pop()
+        if not self._by_count[self._min]:
+            del self._by_count[self._min]
+        del counts[victim]
+        del self.errors[victim]
+        counts[key] = self._min + 1
+        self.errors[key] = self._min
+        self._by_count.setdefault(self._min + 1, set()).add(key)
+        if self._min not in self._by_count:
+            self._min += 1
+
+    def top(self, n: int = 10) -> List[Tuple[Hashable, int]]:
+        """
+        The `n` heaviest keys with their guaranteed counts (count minus error); keys that
+        only inherited a large count from an evicted key sort last.
+        """
+        # list() copies in one step, safe while the capture thread keeps adding
+        errors = self.errors
+        guaranteed = ((key, count - errors.get(key, count)) for key, count in list(self.counts.items()))
+        return sorted((item for item in guaranteed if item[1] > 0), key=lambda item: item[1], reverse=True)[:n]
+
+
+class LRUTable:
+    """
+    Dict-like table with at most `max_entries` keys (least recently written is evicted)
+    whose entries also expire `ttl` seconds after their last write.
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [written_at, value]
+        self.evicted = 0
+
+    def expire(self, now: Optional[float] = None) -> None:
+        if self.ttl is None:
+            return
+        cutoff = (self.clock() if now is None else now) - self.ttl
+        data = self._data
+        while data:
+            key, entry = next(iter(data.items()))
+            if entry[0] >= cutoff:
+                break
+            del data[key]
+
+    def set(self, key: Hashable, value, now: Optional[float] = None) -> None:
+        now = self.clock() if now is None else now
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = [now, value]
+        if len(data) > self.max_entries:
+            data.popitem(last=False)
+            self.evicted += 1
+        self.expire(now)
+
+    def touch(self, key: Hashable, now: Optional[float] = None):
+        """Value of `key` (None if absent), marked as just written."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        entry[0] = self.clock() if now is None else now
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def get(self, key: Hashable, default=None):
+        entry = self._data.get(key)
+        return default if entry is None else entry[1]
+
+    def __getitem__(self, key: Hashable):
+        return self._data[key][1]
+
+    def __setitem__(self, key: Hashable, value) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self._data[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def items(self):
+        return [(key, entry[1]) for key, entry in list(self._data.items())]
+
+
+class SourceTracker:
+    """
+    Per-source packet counts for one attack type in bounded memory: sketch estimate
+    for every source, exact sliding-window counters for sources that come near the
+    threshold, top-K heavy hitters and the window total. Counts are exact or 0;
+    a sketch estimate is only used to decide which sources to count exactly.
+    Thread-safe: the capture thread adds while the statistics thread reads.
+    """
+
+    def __init__(self, window: float, threshold: int, max_sources: int = MAX_SOURCES,
+                 expected_rate: float = EXPECTED_RATE, depth: int = SKETCH_DEPTH, top_k: int = TOP_K,
+                 width: int = 0):
+        self.window = window
+        self.threshold = threshold
+        self.promote_at = max(1, threshold // 4)
+        # Most a new exact counter takes over from the sketch
+        self.max_seed = max(0, threshold // 2)
+        self.sketch = CountMinSketch(window, width or sketch_width(expected_rate, window), depth)
+        self.exact = LRUTable(max_sources, ttl=window)
+        self.heavy = SpaceSaving(top_k)
+        self.totals = SlidingWindowCounter(window)
+        self._heavy_epoch = None
+        self._lock = threading.Lock()
+
+    def add(self, src: Hashable, now: float) -> int:
+        """
+        Record one packet from `src`; returns its exact window count, or 0 while it
+        is not counted exactly.
+        """
+        with self._lock:
+            return self._add(src, now)
+
+    def _add(self, src: Hashable, now: float) -> int:
+        self.totals.add(now)
+        epoch = int(now // self.window)
+        if epoch != self._heavy_epoch:
+            self.heavy.clear()
+            self._heavy_epoch = epoch
+        self.heavy.add(src)
+
+        estimate = self.sketch.add(src, now)
+        counter = self.exact.touch(src, now)
+        if counter is not None:
+            return counter.add(now)
+        # Promote on what the estimate holds above the noise of all other sources
+        if estimate - self.sketch.noise(now) < self.promote_at:
+            return 0
+        # Seed with the current sketch window only (the previous one is partly outside
+        # the sliding window), capped so sketch noise alone can never reach the threshold
+        seed = int(min(self.max_seed, max(0.0, self.sketch.current_share(src, now) - 1)))
+        counter = SlidingWindowCounter(self.window)
+        self.exact.set(src, counter, now)
+        return counter.add(now, seed + 1)
+
+    def count(self, src: Hashable, now: float) -> int:
+        """Exact window count of `src`, 0 if it is not counted exactly."""
+        with self._lock:
+            counter = self.exact.get(src)
+            return counter.count(now) if counter is not None else 0
+
+    def estimate(self, src: Hashable, now: float) -> int:
+        """Sketch estimate of `src` (an upper bound, includes noise)."""
+        with self._lock:
+            return self.sketch.estimate(src, now)
+
+    def total(self, now: float) -> int:
+        """Packets of this type from all sources in the window."""
+        # Idle exact entries expire on the capture thread, when new ones are added
+        with self._lock:
+            return self.totals.count(now)
+
+    def top(self, n: int = 5) -> List[Tuple[Hashable, int]]:
+        with self._lock:
+            return self.heavy.top(n)
+
+    def get(self, src: Hashable):
+        """Exact counter of `src`, or None if it is not tracked exactly."""
+        with self._lock:
+            return self.exact.get(src)
+
+    def __contains__(self, src: Hashable) -> bool:
+        with self._lock:
+            return src in self.exact
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.exact)
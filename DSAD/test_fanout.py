@@ -0,0 +1,44 @@
+"""Tests for the fanout report/merge path (run with pytest)."""
+
+from fanout import REPORT_INTERVAL, ShardMerger, report_counts
+from packet_parser import KIND_SYN
+from sketches import SourceTracker
+
+WINDOW = 10.0
+SRC = "10.0.0.1"
+
+
+def _run(packets, until):
+    """Feed {worker: [times]} of SYNs from SRC through report_counts into a ShardMerger."""
+    trackers = {w: {KIND_SYN: SourceTracker(WINDOW, threshold=8)} for w in packets}
+    pending = {w: set() for w in packets}
+    reported = {w: set() for w in packets}
+    merger = ShardMerger(len(packets), WINDOW)
+    events = sorted((t, w) for w, times in packets.items() for t in times)
+    now = 0.0
+    while now <= until:
+        while events and events[0][0] < now:
+            t, w = events.pop(0)
+            if trackers[w][KIND_SYN].add(SRC, t):
+                pending[w].add((KIND_SYN, SRC))
+        for w in packets:
+            counts = report_counts(trackers[w], pending[w], reported[w], now)
+            merger.merge(w, now, counts, {}, None)
+            pending[w] = set()
+        now += REPORT_INTERVAL
+    true_count = sum(trackers[w][KIND_SYN].count(SRC, until) for w in packets)
+    return merger.top(KIND_SYN, until), true_count
+
+
+def test_decayed_share_is_re_reported():
+    # Worker 0 sees 60 packets in [0, 10), worker 1 sees 60 in [5, 15)
+    packets = {0: [i / 6 for i in range(60)], 1: [5 + i / 6 for i in range(60)]}
+    top, true_count = _run(packets, until=15.0)
+    assert top == [(SRC, true_count)]
+    assert true_count < 100
+
+
+def test_idle_source_decays_to_zero():
+    top, true_count = _run({0: [i / 10 for i in range(50)]}, until=WINDOW + 6)
+    assert true_count == 0
+    assert top == []
@@ -0,0 +1,10 @@
+"""Tests for the raw-bytes fast path of packet_parser (run with pytest)."""
+
+import random
+
+from bench_parser import cross_check, sample_frames
+
+
+def test_raw_classification_matches_scapy():
+    frames = list(sample_frames(random.Random(1), 3000))
+    assert cross_check(frames) == 0
@@ -0,0 +1,104 @@
+"""
+Constant-memory sliding-window packet counters.
+
+A SlidingWindowCounter splits the time window into a fixed number of buckets
+(1 s each by default) kept in a ring. Recording a packet and reading the count
+are O(1) and memory per tracked key does not depend on the packet rate.
+"""
+
+from typing import List
+
+
+class SlidingWindowCounter:
+    """
+    Number of events in the last `window` seconds, from `buckets` ring buckets.
+
+    The ring holds one bucket more than the window; the oldest bucket only partly
+    overlaps the window and is weighted by that overlap, so a steady rate gives the
+    same count as keeping every timestamp. For bursts right at the edge of the window
+    the count can differ by at most one bucket's worth.
+    """
+
+    __slots__ = ("window", "per_second", "slots", "counts", "total", "current")
+
+    def __init__(self, window: float, buckets: int = 0):
+        self.window = float(window)
+        buckets = buckets or max(1, round(self.window))
+        self.per_second = buckets / self.window  # buckets per second (multiply instead of divide)
+        self.slots = buckets + 1
+        self.counts: List[int] = [0] * self.slots
+        self.total = 0
+        self.current = None  # absolute number of the newest bucket
+
+    def _advance(self, bucket: int) -> None:
+        """Move the ring forward to `bucket`, clearing the buckets that expire."""
+        current = self.current
+        if current is None:
+            self.current = bucket
+        elif bucket > current:
+            counts = self.counts
+            slots = self.slots
+            if bucket - current >= slots:
+                counts[:] = [0] * slots
+                self.total = 0
+            else:
+                for b in range(current + 1, bucket + 1):
+                    i = b % slots
+                    self.total -= counts[i]
+                    counts[i] = 0
+            self.current = bucket
+
+    def _count(self, now: float) -> int:
+        total = self.total
+        if not total:
+            return 0
+        oldest = self.current - self.slots + 1
+        oldest_count = self.counts[oldest % self.slots]
+        if not oldest_count:
+            return total
+        # Share of the oldest bucket that still lies inside the window
+        overlap = (oldest + 1) - (now - self.window) * self.per_second
+        if overlap >= 1.0:
+            return total
+        if overlap <= 0.0:
+            return total - oldest_count
+        return total - oldest_count + int(oldest_count * overlap + 0.5)
+
+    def add(self, now: float, n: int = 1) -> int:
+        """
+        Record `n` events at time `now` (seconds) and return the count in the window.
+        A late event (clock stepped back) is kept if its bucket is still in the ring.
+        """
+        bucket = int(now * self.per_second)
+        if bucket != self.current:
+            self._advance(bucket)
+            if bucket != self.current:
+                if self.current - bucket < self.slots:
+                    self.counts[bucket % self.slots] += n
+                    self.total += n
+                return self.total
+        # Hot path, same as _count() inlined
+        counts = self.counts
+        slots = self.slots
+        counts[bucket % slots] += n
+        total = self.total = self.total + n
+        oldest = bucket - slots + 1
+        oldest_count = counts[oldest % slots]
+        if not oldest_count:
+            return total
+        overlap = (oldest + 1) - (now - self.window) * self.per_second
+        if overlap >= 1.0:
+            return total
+        if overlap <= 0.0:
+            return total - oldest_count
+        return total - oldest_count + int(oldest_count * overlap + 0.5)
+
+    def count(self, now: float) -> int:
+        """Events within (now - window, now]."""
+        bucket = int(now * self.per_second)
+        if bucket != self.current:
+            self._advance(bucket)
+        return self._count(now)
+
+    def __bool__(self) -> bool:
+        return self.total > 0
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark the `file` command backends against each other.
+
+Usage:
+    python3 benchmarks/bench_file_cmd.py [DIR] [--limit N]
+
+Without DIR a temporary set of small files is generated.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from file_cmd import BatchFileCommand, LibmagicFileCommand, SubprocessFileCommand  # noqa: E402
+
+
+def _sample_files(tmpdir: str, count: int):
+    payloads = [b"%PDF-1.4\n", b"MZ\x90\x00", b"\x89PNG\r\n\x1a\n", b"#!/bin/sh\necho hi\n", b"plain text\n"]
+    paths = []
+    for i in range(count):
+        p = os.path.join(tmpdir, f"sample_{i}.bin")
+        with open(p, "wb") as f:
+            f.write(payloads[i % len(payloads)] * 16)
+        paths.append(p)
+    return paths
+
+
+def _collect(directory: str, limit: int):
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            paths.append(os.path.join(root, name))
+            if len(paths) >= limit:
+                return paths
+    return paths
+
+
+def _run(backend, paths):
+    start = time.perf_counter()
+    outputs = [backend.describe(p) for p in paths]
+    elapsed = time.perf_counter() - start
+    backend.close()
+    return elapsed, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FTI file-command backends")
+    parser.add_argument("directory", nargs="?", help="Directory with files to describe")
+    parser.add_argument("--limit", type=int, default=500, help="Maximum number of files (default: 500)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = _collect(args.directory, args.limit) if args.directory else _sample_files(tmpdir, args.limit)
+        print(f"Files: {len(paths)}")
+
+        backends = [SubprocessFileCommand(), BatchFileCommand()]
+        try:
+            backends.append(LibmagicFileCommand())
+        except Exception:
+            print("libmagic: python-magic not installed, skipped")
+
+        reference = None
+        for backend in backends:
+            elapsed, outputs = _run(backend, paths)
+            rate = len(paths) / elapsed if elapsed else float("inf")
+            same = "" if reference is None else f"  identical output: {outputs == reference}"
+            print(f"{backend.name:<11} {elapsed:8.3f} s  {rate:10.1f} files/s{same}")
+            if reference is None:
+                reference = outputs
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory benchmark of the analysis stages over the synthetic corpus.
+
+Stages: match_magic (in-memory headers), calculate_hashes, calculate_entropy (whole
+file), identify (full pipeline, no cache) and identify with a warm analysis cache.
+Each stage runs in a fresh interpreter so its peak RSS is its own; files/s and MB/s
+are the best of --repeat runs, with the page cache warmed first.
+
+Usage:
+    python3 benchmarks/bench_pipeline.py [--corpus DIR] [--stages a,b] [--repeat N]
+    python3 benchmarks/bench_pipeline.py --save-baseline     # write benchmarks/baseline.json
+    python3 benchmarks/bench_pipeline.py --compare           # exit 1 on a regression
+
+Without --corpus a corpus is generated in a temporary directory (see corpus.py).
+Baselines are only comparable on the same machine and corpus settings.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+from corpus import generate_corpus, load_manifest  # noqa: E402
+
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+STAGES = ["match_magic", "hashes", "entropy", "identify", "identify_cached"]
+
+# A stage regresses when its files/s drops, or its peak RSS grows, by more than this
+TOLERANCE = 0.20
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _stage_runner(stage: str, paths: List[str], cache_path: str):
+    """(callable running the stage once over all files, bytes processed per run)."""
+    from identifier import HEADER_SIZE, calculate_entropy, calculate_hashes, identify, match_magic
+
+    if stage == "match_magic":
+        headers = []
+        for p in paths:
+            with open(p, "rb") as f:
+                headers.append(f.read(HEADER_SIZE))
+        return (lambda: [match_magic(h) for h in headers]), sum(len(h) for h in headers)
+
+    total = sum(os.path.getsize(p) for p in paths)
+    if stage == "hashes":
+        return (lambda: [calculate_hashes(p) for p in paths]), total
+    if stage == "entropy":
+        return (lambda: [calculate_entropy(p, header_bytes=None) for p in paths]), total
+    if stage == "identify":
+        return (lambda: [identify(p, use_file_cmd=False) for p in paths]), total
+    if stage == "identify_cached":
+        from cache import AnalysisCache
+        cache = AnalysisCache(cache_path)
+        for p in paths:
+            identify(p, use_file_cmd=False, cache=cache)
+        return (lambda: [identify(p, use_file_cmd=False, cache=cache) for p in paths]), total
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def _run_stage(stage: str, paths: List[str], repeat: int, cache_path: str, queue) -> None:
+    """Child process: time `stage` and report best time and peak RSS."""
+    run, nbytes = _stage_runner(stage, paths, cache_path)
+    rss_before = _peak_rss_mb()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    queue.put({
+        "seconds": round(best, 4),
+        "files_per_sec": round(len(paths) / best, 1) if best else None,
+        "mb_per_sec": round(nbytes / (1024 * 1024) / best, 1) if best else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "rss_growth_mb": round(_peak_rss_mb() - rss_before, 1),
+    })
+
+
+def _warm_page_cache(paths: List[str]) -> None:
+    for p in paths:
+        with open(p, "rb") as f:
+            while f.read(4 * 1024 * 1024):
+                pass
+
+
+def run_benchmarks(paths: List[str], stages: List[str], repeat: int) -> Dict[str, Dict]:
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for stage in stages:
+            _warm_page_cache(paths)
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run_stage, args=(stage, paths, repeat, os.path.join(tmpdir, f"{stage}.sqlite"), queue))
+            proc.start()
+            results[stage] = queue.get()
+            proc.join()
+            r = results[stage]
+            print(
+                f"{stage:<16} {r['seconds']:8.3f} s  {r['files_per_sec']:10.1f} files/s  "
+                f"{r['mb_per_sec']:9.1f} MB/s  peak RSS {r['peak_rss_mb']:7.1f} MB (+{r['rss_growth_mb']:.1f})",
+                flush=True,
+            )
+    return results
+
+
+def detection_summary(manifest: List[Dict]) -> Dict[str, int]:
+    """How many typed files are recognised and how many mislabelled copies are flagged."""
+    from identifier import identify
+
+    summary = {"typed": 0, "recognised": 0, "mislabelled": 0, "flagged": 0}
+    for entry in manifest:
+        if entry["kind"] not in ("typed", "mislabelled"):
+            continue
+        result = identify(entry["path"], use_file_cmd=False)
+        summary[entry["kind"]] += 1
+        if entry["kind"] == "typed":
+            expected = {e for e in entry["extensions"] if e}
+            found = set(result.get("detected_extensions") or [])
+            summary["recognised"] += bool(expected & found) or result.get("detected_type") == entry["type"]
+        else:
+            summary["flagged"] += bool(result.get("mismatch"))
+    return summary
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = TOLERANCE) -> List[str]:
+    """Regression messages for stages slower or bigger than the baseline by more than `tolerance`."""
+    problems = []
+    for stage, current in results.items():
+        base = baseline.get(stage)
+        if not base:
+            continue
+        if current["files_per_sec"] < base["files_per_sec"] * (1 - tolerance):
+            problems.append(f"{stage}: {current['files_per_sec']} files/s vs baseline {base['files_per_sec']}")
+        if current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            problems.append(f"{stage}: peak RSS {current['peak_rss_mb']} MB vs baseline {base['peak_rss_mb']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FTI analysis stages")
+    parser.add_argument("--corpus", metavar="DIR", help="Existing corpus directory (from corpus.py)")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated stages (default: all: {','.join(STAGES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best is reported (default: 3)")
+    parser.add_argument("--large-mb", type=int, default=64, help="Size of the large files in a generated corpus (default: 64)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write the results to {BASELINE_PATH.name}")
+    parser.add_argument("--compare", action="store_true", help=f"Compare with {BASELINE_PATH.name}; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help=f"Allowed regression (default: {TOLERANCE})")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.corpus:
+            manifest = load_manifest(args.corpus)
+        else:
+            manifest = generate_corpus(tmpdir, large_mb=args.large_mb)
+        paths = [entry["path"] for entry in manifest]
+        total_mb = sum(entry["size"] for entry in manifest) / (1024 * 1024)
+        print(f"Corpus: {len(paths)} files, {total_mb:.1f} MB")
+
+        detection = detection_summary(manifest)
+        print(
+            f"Detection: {detection['recognised']}/{detection['typed']} typed files recognised, "
+            f"{detection['flagged']}/{detection['mislabelled']} mislabelled copies flagged"
+        )
+        results = run_benchmarks(paths, stages, args.repeat)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()}",
+                "corpus": {"files": len(paths), "mb": round(total_mb, 1)},
+                "detection": detection,
+                "stages": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    if args.compare:
+        if not BASELINE_PATH.exists():
+            print(f"No baseline at {BASELINE_PATH}; run with --save-baseline first")
+            sys.exit(2)
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline["stages"], args.tolerance)
+        if baseline.get("detection") and detection != baseline["detection"]:
+            problems.append(f"detection changed: {detection} vs baseline {baseline['detection']}")
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No regression beyond {args.tolerance:.0%} against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Reproducible synthetic corpus for the FTI benchmarks.
+
+For every MAGIC_DATABASE signature it writes correctly named files and copies with a
+wrong extension, plus random high-entropy blobs, plain text and a few large files.
+The same seed always produces byte-identical files. A manifest.json next to the files
+records what each one is.
+
+Usage:
+    python3 benchmarks/corpus.py DIR [--seed N] [--copies N] [--blobs N] [--large N] [--large-mb MB]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from magic_db import MAGIC_DATABASE  # noqa: E402
+
+MANIFEST_NAME = "manifest.json"
+
+# Fill bytes for typed files: text-like, so whole-file entropy stays low (~4-5 bits)
+_FILLER_ALPHABET = b"abcdefghijklmnopqrstuvwxyz ABCDEFGHIJ0123456789\n\t.,;:=<>/"
+
+# Extension used for mislabelled copies when the type's own list gives no other choice
+_DECOY_EXTENSIONS = [".txt", ".jpg", ".pdf", ".docx", ".png", ".mp3"]
+
+
+def _filler(rng: random.Random, size: int) -> bytes:
+    # A short random block repeated: cheap to generate, still not a single byte value
+    block = bytes(rng.choice(_FILLER_ALPHABET) for _ in range(min(size, 4096)))
+    return (block * (size // len(block) + 1))[:size] if block else b""
+
+
+def _typed_payload(rng: random.Random, offset: int, signature: bytes, size: int) -> bytes:
+    size = max(size, offset + len(signature) + 16)
+    data = bytearray(_filler(rng, size))
+    data[offset:offset + len(signature)] = signature
+    if signature == b"RIFF" and offset == 0:
+        data[8:12] = b"WEBP"
+    return bytes(data)
+
+
+def _primary_extension(extensions: List[str]) -> str:
+    return next((e for e in extensions if e), ".bin")
+
+
+def _decoy_extension(rng: random.Random, extensions: List[str]) -> str:
+    own = {e.lower() for e in extensions}
+    choices = [e for e in _DECOY_EXTENSIONS if e not in own]
+    return rng.choice(choices)
+
+
+def _write(path: Path, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _write_random(path: Path, rng: random.Random, size: int) -> None:
+    """Random bytes written in 1 MB pieces (large files never sit in memory whole)."""
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            n = min(remaining, 1024 * 1024)
+            f.write(rng.randbytes(n))
+            remaining -= n
+
+
+def generate_corpus(
+    directory,
+    seed: int = 1,
+    copies: int = 4,
+    blobs: int = 32,
+    large: int = 2,
+    large_mb: int = 64,
+) -> List[Dict]:
+    """
+    Write the corpus below `directory` and return its manifest: one dict per file with
+    path, kind ("typed", "mislabelled", "random", "text", "large"), size and, for typed
+    files, the signature description and its typical extensions.
+    """
+    rng = random.Random(seed)
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest: List[Dict] = []
+
+    def _add(path: Path, kind: str, **extra) -> None:
+        manifest.append({"path": str(path), "kind": kind, "size": path.stat().st_size, **extra})
+
+    for n, (offset, hex_signature, description, extensions) in enumerate(MAGIC_DATABASE):
+        signature = bytes.fromhex(hex_signature)
+        for i in range(copies):
+            size = rng.choice((512, 4096, 65536, 262144))
+            data = _typed_payload(rng, offset, signature, size)
+            ext = _primary_extension(extensions)
+            path = root / f"type{n:03d}_{i}{ext}"
+            _write(path, data)
+            _add(path, "typed", type=description, extensions=extensions)
+            wrong = root / f"type{n:03d}_{i}_mislabelled{_decoy_extension(rng, extensions)}"
+            _write(wrong, data)
+            _add(wrong, "mislabelled", type=description, extensions=extensions)
+
+    for i in range(blobs):
+        path = root / f"blob{i:03d}.bin"
+        _write_random(path, rng, rng.choice((4096, 65536, 1024 * 1024)))
+        _add(path, "random")
+
+    for i in range(copies):
+        path = root / f"text{i:03d}.txt"
+        _write(path, _filler(rng, rng.choice((256, 8192, 131072))))
+        _add(path, "text")
+
+    for i in range(large):
+        path = root / f"large{i:02d}.bin"
+        _write_random(path, rng, large_mb * 1024 * 1024)
+        _add(path, "large")
+
+    with open(root / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump({"seed": seed, "files": manifest}, f, indent=1)
+    return manifest
+
+
+def load_manifest(directory) -> List[Dict]:
+    with open(Path(directory) / MANIFEST_NAME, encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the FTI benchmark corpus")
+    parser.add_argument("directory", help="Output directory")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    parser.add_argument("--copies", type=int, default=4, help="Files per signature (default: 4, plus as many mislabelled)")
+    parser.add_argument("--blobs", type=int, default=32, help="Random high-entropy blobs (default: 32)")
+    parser.add_argument("--large", type=int, default=2, help="Large random files (default: 2)")
+    parser.add_argument("--large-mb", type=int, default=64, help="Size of each large file in MB (default: 64)")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.directory, args.seed, args.copies, args.blobs, args.large, args.large_mb)
+    total = sum(entry["size"] for entry in manifest)
+    print(f"{len(manifest)} files, {total / (1024 * 1024):.1f} MB in {os.path.abspath(args.directory)}")
+
+
+if __name__ == "__main__":
+    main()
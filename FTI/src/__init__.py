@@ -5,7 +5,26 @@ File Type Identifier (FTI) - A tool for file type identification using magic num
 __version__ = "1.0.0"
 __author__ = "FTI Contributors"
 
-from .identifier import identify, print_report
+from .identifier import identify, identify_bytes, identify_fileobj, identify_stream, print_report
+from .archives import identify_recursive, identify_recursive_stream
+from .rules import RuleSet, load_rules
+from .executables import inspect_executable
 from .magic_db import MAGIC_DATABASE, get_all_signatures
+from .signature_index import SignatureIndex, get_signature_index
 
-__all__ = ["identify", "print_report", "MAGIC_DATABASE", "get_all_signatures"]
+__all__ = [
+    "identify",
+    "identify_bytes",
+    "identify_fileobj",
+    "identify_stream",
+    "identify_recursive",
+    "identify_recursive_stream",
+    "print_report",
+    "RuleSet",
+    "load_rules",
+    "inspect_executable",
+    "MAGIC_DATABASE",
+    "get_all_signatures",
+    "SignatureIndex",
+    "get_signature_index",
+]
@@ -0,0 +1,461 @@
+"""
+Streaming archive recursion.
+ZIP, tar, gzip, bzip2 and xz members are identified and hashed straight from the
+decompression stream; nothing is extracted to disk. Nested archives are expanded
+down to a depth limit, and every decompressed stream is metered so zip bombs
+(extreme ratios, huge members, too many members) are cut off early.
+
+Each member result carries `parent` (the containing file) and `depth`; member
+paths are written as parent!member, e.g. mail.zip!invoice.tar.gz!invoice.tar!a.exe.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Union
+
+# Use absolute imports when run as script, relative when imported as package
+try:
+    from .identifier import (
+        AnalysisCache, finish_stream, identify, identify_scanned, new_file_analyzer, new_stream_analyzer,
+    )
+    from .pipeline import CHUNK_SIZE
+    from .rules import RuleSet
+except ImportError:
+    from identifier import (
+        AnalysisCache, finish_stream, identify, identify_scanned, new_file_analyzer, new_stream_analyzer,
+    )
+    from pipeline import CHUNK_SIZE
+    from rules import RuleSet
+
+# Nesting limit (the archive itself is depth 0, its members depth 1)
+MAX_DEPTH = 4
+
+# Largest decompressed size of a single member
+MAX_MEMBER_BYTES = 512 * 1024 * 1024
+
+# Decompressed bytes and members allowed per top-level archive
+MAX_TOTAL_BYTES = 2 * 1024 * 1024 * 1024
+MAX_MEMBERS = 10000
+
+# Decompressed/compressed ratio above which a stream counts as a bomb. Only checked
+# once a stream has expanded to RATIO_MIN_BYTES: logs, dumps and sparse images
+# legitimately exceed the ratio, and below that size the member and total limits
+# already bound what a bomb costs
+MAX_RATIO = 100
+RATIO_MIN_BYTES = 64 * 1024 * 1024
+
+# The same ratio over everything a top-level archive expands to, against its own
+# size, from this many decompressed bytes on (many members each under RATIO_MIN_BYTES)
+TOTAL_RATIO_MIN_BYTES = 16 * 1024 * 1024
+
+# Nested ZIPs need random access, so they are held in memory up to this size
+ZIP_BUFFER_BYTES = 64 * 1024 * 1024
+
+# Bytes looked at to decide whether a stream is an archive (tar magic sits at 257)
+SNIFF_SIZE = 512
+
+_DECOMPRESSORS = {
+    "gzip": lambda f: gzip.GzipFile(fileobj=f, mode="rb"),
+    "bzip2": lambda f: bz2.BZ2File(f, mode="rb"),
+    "xz": lambda f: lzma.LZMAFile(f, mode="rb"),
+}
+
+_COMPRESSED_SUFFIXES = {
+    "gzip": {".gz": "", ".tgz": ".tar", ".z": ""},
+    "bzip2": {".bz2": "", ".tbz": ".tar", ".tbz2": ".tar"},
+    "xz": {".xz": "", ".txz": ".tar"},
+}
+
+# Errors raised by corrupt archives / compressed streams
+_FORMAT_ERRORS = (zipfile.BadZipFile, zipfile.LargeZipFile, tarfile.TarError, zlib.error,
+                  lzma.LZMAError, EOFError, OSError, NotImplementedError, RuntimeError, ValueError)
+
+
+class ArchiveLimitError(ValueError):
+    """A decompression limit was hit. `reader` is the stream that hit it; `fatal` stops the whole walk."""
+
+    def __init__(self, message: str, reader=None, fatal: bool = False):
+        super().__init__(message)
+        self.reader = reader
+        self.fatal = fatal
+
+
+class _StreamError(Exception):
+    """Reading (decompressing) one stream failed; `reader` is that stream."""
+
+    def __init__(self, error: Exception, reader):
+        super().__init__(str(error))
+        self.error = error
+        self.reader = reader
+
+
+def archive_kind(head: bytes) -> Optional[str]:
+    """'zip', 'tar', 'gzip', 'bzip2', 'xz' from the first bytes of a stream, else None."""
+    if head[:4] in (b"PK\x03\x04", b"PK\x05\x06"):
+        return "zip"
+    if head[:2] == b"\x1f\x8b":
+        return "gzip"
+    if head[:3] == b"BZh":
+        return "bzip2"
+    if head[:6] == b"\xfd7zXZ\x00":
+        return "xz"
+    if head[257:262] == b"ustar":
+        return "tar"
+    return None
+
+
+class _Walk:
+    """Options and shared budget of one recursive walk."""
+
+    def __init__(self, use_file_cmd, virustotal_api_key, hash_algorithms, entropy_blocks, rules,
+                 max_depth, max_member_bytes, max_total_bytes, max_ratio, ratio_min_bytes):
+        self.use_file_cmd = use_file_cmd
+        self.virustotal_api_key = virustotal_api_key
+        self.hash_algorithms = hash_algorithms
+        self.entropy_blocks = entropy_blocks
+        self.rules = rules
+        self.max_depth = max_depth
+        self.max_member_bytes = max_member_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_ratio = max_ratio
+        self.ratio_min_bytes = ratio_min_bytes
+        self.total_ratio_min_bytes = TOTAL_RATIO_MIN_BYTES
+        self.total_bytes = 0
+        self.members = 0
+        # Compressed bytes of the top-level archive read so far (set by the caller)
+        self.packed: Optional[Callable[[], int]] = None
+
+
+class _MeteredReader:
+    """
+    File-like wrapper that feeds everything read into an analyzer (if any), counts
+    bytes and enforces the member size, total size and compression ratio limits.
+    For decompressed streams `compressed()` returns the compressed bytes consumed so
+    far; stored data (tar members, the archive file itself) passes None.
+    """
+
+    def __init__(self, raw, walk: Optional[_Walk] = None, scan=None,
+                 compressed: Optional[Callable[[], int]] = None):
+        self.raw = raw
+        self.walk = walk
+        self.scan = scan
+        self.compressed = compressed
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is not None and size >= 0:
+            return self._read(size)
+        # Read to EOF in chunks, so the limits are checked as the data is produced
+        parts = []
+        while True:
+            data = self._read(CHUNK_SIZE)
+            if not data:
+                return b"".join(parts)
+            parts.append(data)
+
+    def _read(self, size: int) -> bytes:
+        try:
+            data = self.raw.read(size)
+        except (ArchiveLimitError, _StreamError):
+            raise
+        except _FORMAT_ERRORS as e:
+            raise _StreamError(e, self)
+        if not data:
+            return data
+        n = len(data)
+        self.bytes_read += n
+        if self.scan is not None:
+            self.scan.update(data)
+        walk = self.walk
+        if walk is not None:
+            if self.compressed is not None:
+                walk.total_bytes += n
+                if walk.total_bytes > walk.max_total_bytes:
+                    raise ArchiveLimitError(f"Archive expands beyond {walk.max_total_bytes} bytes", self, fatal=True)
+                if walk.total_bytes > walk.total_ratio_min_bytes and walk.packed is not None:
+                    if walk.total_bytes / max(1, walk.packed()) > walk.max_ratio:
+                        raise ArchiveLimitError(
+                            f"Archive expands more than {walk.max_ratio}:1 in total (possible zip bomb)",
+                            self, fatal=True,
+                        )
+                if self.bytes_read > walk.ratio_min_bytes:
+                    packed = max(1, self.compressed())
+                    if self.bytes_read / packed > walk.max_ratio:
+                        raise ArchiveLimitError(
+                            f"Compression ratio above {walk.max_ratio}:1 (possible zip bomb)", self
+                        )
+            if self.bytes_read > walk.max_member_bytes:
+                raise ArchiveLimitError(f"Member larger than {walk.max_member_bytes} bytes", self)
+        return data
+
+    def drain(self) -> None:
+        while self.read(CHUNK_SIZE):
+            pass
+
+
+class _HeadReader:
+    """Replays already-read leading bytes, then continues with the underlying reader."""
+
+    def __init__(self, head: bytes, rest):
+        self._head = head
+        self._rest = rest
+
+    def read(self, size: int = -1) -> bytes:
+        if self._head:
+            if size is None or size < 0:
+                size = len(self._head)
+            data, self._head = self._head[:size], self._head[size:]
+            return data
+        return self._rest.read(size)
+
+
+def _decompressed_name(name: str, kind: str) -> str:
+    lower = name.lower()
+    for suffix, replacement in _COMPRESSED_SUFFIXES[kind].items():
+        if lower.endswith(suffix):
+            return name[: len(name) - len(suffix)] + replacement
+    return name
+
+
+def _member_path(parent: str, name: str) -> str:
+    return f"{parent}!{name}"
+
+
+def _expand(source, kind: str, path: str, depth: int, walk: _Walk,
+            packed: Callable[[], int], zip_source=None) -> Iterator[Dict]:
+    """Yield results for the members of archive `source` (of `kind`) located at `path`."""
+    if kind in _DECOMPRESSORS:
+        _count_member(walk)
+        member = _member_path(path, _decompressed_name(Path(path.rsplit("!", 1)[-1]).name, kind))
+        yield from _member(_DECOMPRESSORS[kind](source), member, path, depth + 1, walk, packed)
+    elif kind == "tar":
+        with tarfile.open(fileobj=source, mode="r|") as tf:
+            for info in tf:
+                if not info.isfile():
+                    continue
+                _count_member(walk)
+                member_stream = tf.extractfile(info)
+                yield from _member(member_stream, _member_path(path, info.name), path, depth + 1, walk, None)
+    elif kind == "zip":
+        if zip_source is None:
+            # Not seekable: hold the (bounded) archive in memory
+            data = bytearray()
+            while len(data) <= ZIP_BUFFER_BYTES:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                data += chunk
+            if len(data) > ZIP_BUFFER_BYTES:
+                raise ValueError(f"Nested ZIP larger than {ZIP_BUFFER_BYTES} bytes not expanded")
+            zip_source = io.BytesIO(bytes(data))
+        with zipfile.ZipFile(zip_source) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                _count_member(walk)
+                mpath = _member_path(path, info.filename)
+                if info.flag_bits & 0x1:
+                    yield {
+                        "filepath": mpath,
+                        "error": "Encrypted archive member",
+                        "file_size": info.file_size,
+                        "parent": path,
+                        "depth": depth + 1,
+                    }
+                    continue
+                compressed_size = info.compress_size
+                yield from _member(zf.open(info), mpath, path, depth + 1, walk, lambda c=compressed_size: c)
+
+
+def _count_member(walk: _Walk) -> None:
+    walk.members += 1
+    if walk.members > MAX_MEMBERS:
+        raise ArchiveLimitError(f"More than {MAX_MEMBERS} archive members", fatal=True)
+
+
+def _member(raw, path: str, parent: str, depth: int, walk: _Walk,
+            packed: Optional[Callable[[], int]]) -> Iterator[Dict]:
+    """
+    Identify one member stream, yielding the results of its own members first when it
+    is an archive. Limits hit and read errors of this stream become an error record for
+    it; those raised by an enclosing stream (or fatal ones) are passed up.
+    """
+    scan = new_stream_analyzer(walk.hash_algorithms, walk.entropy_blocks, walk.rules)
+    reader = _MeteredReader(raw, walk, scan, packed)
+    archive_error = None
+    try:
+        head = reader.read(SNIFF_SIZE)
+        kind = archive_kind(head)
+        if kind and depth < walk.max_depth:
+            try:
+                yield from _expand(_HeadReader(head, reader), kind, path, depth, walk, lambda: reader.bytes_read)
+            except (ArchiveLimitError, _StreamError):
+                raise
+            except _FORMAT_ERRORS as e:
+                archive_error = f"Could not expand archive: {e}"
+        elif kind:
+            archive_error = f"Not expanded (depth limit {walk.max_depth})"
+        # Members consumed only part of the stream (or none): hash the rest
+        reader.drain()
+    except ArchiveLimitError as e:
+        if e.reader is not reader or e.fatal:
+            raise
+        yield {"filepath": path, "error": str(e), "parent": parent, "depth": depth}
+        return
+    except _StreamError as e:
+        if e.reader is not reader:
+            raise
+        yield {"filepath": path, "error": f"Could not decompress: {e}", "parent": parent, "depth": depth}
+        return
+
+    result = finish_stream(scan, path, walk.use_file_cmd, walk.virustotal_api_key)
+    result["parent"] = parent
+    result["depth"] = depth
+    if archive_error:
+        result["archive_error"] = archive_error
+    yield result
+
+
+def identify_recursive(
+    filepath: Union[str, Path],
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    cache: Optional[AnalysisCache] = None,
+    hash_algorithms=None,
+    entropy_blocks: bool = False,
+    rules: Optional[RuleSet] = None,
+    max_depth: int = MAX_DEPTH,
+    max_member_bytes: int = MAX_MEMBER_BYTES,
+    max_total_bytes: int = MAX_TOTAL_BYTES,
+    max_ratio: float = MAX_RATIO,
+    ratio_min_bytes: int = RATIO_MIN_BYTES,
+) -> Iterator[Dict]:
+    """
+    identify() `filepath` and, if it is a ZIP/tar/gzip/bzip2/xz archive, every member
+    (recursively, up to `max_depth`). Member results are yielded as they complete; the
+    file's own result comes last, with `archive_members` (count) and `archive_error`
+    (why expansion stopped, if it did).
+    """
+    path = str(filepath)
+    options = dict(use_file_cmd=use_file_cmd, virustotal_api_key=virustotal_api_key, cache=cache,
+                   hash_algorithms=hash_algorithms, entropy_blocks=entropy_blocks, rules=rules)
+    walk = _Walk(use_file_cmd, virustotal_api_key, hash_algorithms, entropy_blocks, rules,
+                 max_depth, max_member_bytes, max_total_bytes, max_ratio, ratio_min_bytes)
+    try:
+        f = open(path, "rb")
+    except OSError:
+        f = None
+    if f is None:
+        yield identify(path, **options)  # missing / unreadable: its error record
+        return
+
+    result = None
+    archive_error = None
+    with f:
+        kind = archive_kind(f.read(SNIFF_SIZE))
+        f.seek(0)
+        if not kind or max_depth <= 0:
+            result = identify(path, **options)
+        elif kind == "zip":
+            # Members are read by random access, so the file is hashed in its own pass
+            size = os.fstat(f.fileno()).st_size
+            walk.packed = lambda: size
+            try:
+                yield from _expand(_MeteredReader(f), kind, path, 0, walk, lambda: size, f)
+            except (ArchiveLimitError, _StreamError) as e:
+                archive_error = str(e)
+            except _FORMAT_ERRORS as e:
+                archive_error = f"Could not expand archive: {e}"
+            result = identify(path, **options)
+        else:
+            # Streamed formats: the file is hashed and scanned while it is decompressed
+            st = os.fstat(f.fileno())
+            scan = new_file_analyzer(hash_algorithms, entropy_blocks, rules)
+            source = _MeteredReader(f, None, scan)
+            walk.packed = lambda: source.bytes_read
+            try:
+                try:
+                    yield from _expand(source, kind, path, 0, walk, walk.packed)
+                except (ArchiveLimitError, _StreamError) as e:
+                    if getattr(e, "reader", None) is source:
+                        raise
+                    archive_error = str(e)
+                except _FORMAT_ERRORS as e:
+                    archive_error = f"Could not expand archive: {e}"
+                # Whatever expansion did not consume still counts for the file's own hashes
+                source.drain()
+                result = identify_scanned(path, scan, st, **options)
+            except _StreamError:
+                result = {"error": "Could not read file", "filepath": path}
+
+    if "error" in result:
+        yield result
+        return
+    result["parent"] = None
+    result["depth"] = 0
+    if kind and max_depth > 0:
+        result["archive_members"] = walk.members
+    if archive_error:
+        result["archive_error"] = archive_error
+    yield result
+
+
+def identify_recursive_stream(
+    fileobj,
+    filename: str = "-",
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    hash_algorithms=None,
+    entropy_blocks: bool = False,
+    rules: Optional[RuleSet] = None,
+    max_depth: int = MAX_DEPTH,
+    max_member_bytes: int = MAX_MEMBER_BYTES,
+    max_total_bytes: int = MAX_TOTAL_BYTES,
+    max_ratio: float = MAX_RATIO,
+    ratio_min_bytes: int = RATIO_MIN_BYTES,
+) -> Iterator[Dict]:
+    """
+    identify_recursive() for a binary stream that is read once (stdin, pipe, upload):
+    members are identified while the stream itself is hashed and scanned. ZIPs are
+    buffered up to ZIP_BUFFER_BYTES since their directory sits at the end.
+    """
+    walk = _Walk(use_file_cmd, virustotal_api_key, hash_algorithms, entropy_blocks, rules,
+                 max_depth, max_member_bytes, max_total_bytes, max_ratio, ratio_min_bytes)
+    scan = new_stream_analyzer(hash_algorithms, entropy_blocks, rules)
+    reader = _MeteredReader(fileobj, None, scan)
+    walk.packed = lambda: reader.bytes_read
+    kind = None
+    archive_error = None
+    try:
+        head = reader.read(SNIFF_SIZE)
+        kind = archive_kind(head)
+        if kind and max_depth > 0:
+            try:
+                yield from _expand(_HeadReader(head, reader), kind, filename, 0, walk, lambda: reader.bytes_read)
+            except (ArchiveLimitError, _StreamError) as e:
+                if getattr(e, "reader", None) is reader:
+                    raise
+                archive_error = str(e)
+            except _FORMAT_ERRORS as e:
+                archive_error = f"Could not expand archive: {e}"
+        # Whatever the members did not consume still counts for the stream's own hashes
+        reader.drain()
+    except _StreamError:
+        yield {"filepath": filename, "error": "Could not read file"}
+        return
+
+    result = finish_stream(scan, filename, use_file_cmd, virustotal_api_key)
+    result["parent"] = None
+    result["depth"] = 0
+    if kind and max_depth > 0:
+        result["archive_members"] = walk.members
+    if archive_error:
+        result["archive_error"] = archive_error
+    yield result
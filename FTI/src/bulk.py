@@ -0,0 +1,340 @@
+"""
+Bulk triage: analyse a directory tree or a list of files in parallel.
+Paths are fanned out over a process pool in small batches; records are streamed
+to an exporter (NDJSON, CSV or Parquet) as soon as each batch completes, with a
+bounded number of batches in flight so memory stays flat on very large trees.
+"""
+
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Union
+
+# Use absolute imports when run as script, relative when imported as package
+try:
+    from .identifier import identify, HIGH_ENTROPY_THRESHOLD, UNKNOWN_TYPE
+    from .archives import identify_recursive
+    from .cache import open_cache
+    from .export import Exporter
+    from .rules import load_rules
+    from .virustotal import get_client, is_sha256
+except ImportError:
+    from identifier import identify, HIGH_ENTROPY_THRESHOLD, UNKNOWN_TYPE
+    from archives import identify_recursive
+    from cache import open_cache
+    from export import Exporter
+    from rules import load_rules
+    from virustotal import get_client, is_sha256
+
+# Paths per task sent to a worker (amortises pickling/IPC overhead)
+BATCH_SIZE = 16
+
+# How many example paths to keep per summary category
+SUMMARY_SAMPLES = 10
+
+# Results held back for a VirusTotal verdict at most (bounds memory and the lookup queue)
+VT_MAX_WAITING = 1024
+
+VT_SKIPPED = {"error": "VirusTotal lookup skipped (too many lookups waiting for quota)"}
+
+
+def iter_directory(directory: Union[str, Path], recursive: bool = True) -> Iterator[str]:
+    """Yield regular files below `directory` lazily (symlinks are not followed)."""
+    stack = [str(directory)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def iter_file_list(list_path: Union[str, Path]) -> Iterator[str]:
+    """Yield paths from a newline-separated list file ('-' reads stdin)."""
+    handle = sys.stdin if str(list_path) == "-" else open(list_path, "r", encoding="utf-8", errors="surrogateescape")
+    try:
+        for line in handle:
+            line = line.rstrip("\r\n")
+            if line:
+                yield line
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def _batched(paths: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for p in paths:
+        batch.append(p)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def analyze_batch(
+    paths: List[str],
+    use_file_cmd: bool,
+    virustotal_api_key: Optional[str],
+    use_cache: bool = True,
+    hash_algorithms: Optional[tuple] = None,
+    entropy_blocks: bool = False,
+    archive_depth: Optional[int] = None,
+    rules_source: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Worker entry point (bulk and watch mode): identify() every path in the batch.
+    With `archive_depth` archives are expanded too (see identify_recursive); member
+    records come before the archive's own record. `rules_source` is passed to
+    load_rules() (loaded once per worker process).
+    """
+    cache = open_cache() if use_cache else None
+    rules = load_rules(rules_source) if rules_source else None
+    results = []
+    for p in paths:
+        options = dict(
+            use_file_cmd=use_file_cmd,
+            virustotal_api_key=virustotal_api_key,
+            cache=cache,
+            hash_algorithms=hash_algorithms,
+            entropy_blocks=entropy_blocks,
+            rules=rules,
+        )
+        try:
+            if archive_depth:
+                results.extend(identify_recursive(p, max_depth=archive_depth, **options))
+            else:
+                results.append(identify(p, **options))
+        except Exception as e:  # keep the batch alive if one file misbehaves
+            results.append({"error": f"{type(e).__name__}: {e}", "filepath": p})
+    return results
+
+
+def batch_results(fut, paths: List[str]) -> List[Dict]:
+    """
+    Records of a finished analyze_batch() future. If the worker itself failed (a
+    crashed process breaks the pool), every path of the batch gets an error record.
+    """
+    try:
+        return fut.result()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        return [{"error": error, "filepath": p} for p in paths]
+
+
+class BulkSummary:
+    """Running totals for a bulk run; keeps only a few example paths per category."""
+
+    def __init__(self):
+        self.total = 0
+        self.errors = 0
+        self.mismatches = 0
+        self.high_entropy = 0
+        self.unknown = 0
+        self.samples: Dict[str, List[str]] = {"mismatch": [], "high_entropy": [], "unknown": [], "error": []}
+
+    def _sample(self, category: str, path: str) -> None:
+        if len(self.samples[category]) < SUMMARY_SAMPLES:
+            self.samples[category].append(path)
+
+    def add(self, result: Dict) -> None:
+        self.total += 1
+        path = result.get("filepath", "")
+        if "error" in result:
+            self.errors += 1
+            self._sample("error", path)
+            return
+        if result.get("mismatch"):
+            self.mismatches += 1
+            self._sample("mismatch", path)
+        entropy = result.get("entropy")
+        if entropy is not None and entropy > HIGH_ENTROPY_THRESHOLD:
+            self.high_entropy += 1
+            self._sample("high_entropy", path)
+        if not result.get("detected_extensions") and result.get("detected_type") in (UNKNOWN_TYPE, "data"):
+            self.unknown += 1
+            self._sample("unknown", path)
+
+    def as_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "errors": self.errors,
+            "mismatches": self.mismatches,
+            "high_entropy": self.high_entropy,
+            "unknown": self.unknown,
+            "samples": self.samples,
+        }
+
+    def print(self, out: TextIO = sys.stderr) -> None:
+        """Print a human-readable summary (to stderr, so stdout stays machine-readable)."""
+        print("\nBulk summary", file=out)
+        print("-" * 40, file=out)
+        print(f"Files analysed: {self.total}", file=out)
+        print(f"Errors: {self.errors}", file=out)
+        print(f"Extension mismatches: {self.mismatches}", file=out)
+        print(f"High entropy (>{HIGH_ENTROPY_THRESHOLD}): {self.high_entropy}", file=out)
+        print(f"Unknown types: {self.unknown}", file=out)
+        for category, label in (("mismatch", "Mismatches"), ("high_entropy", "High entropy"), ("unknown", "Unknown"), ("error", "Errors")):
+            if self.samples[category]:
+                print(f"\n{label} (first {len(self.samples[category])}):", file=out)
+                for p in self.samples[category]:
+                    print(f"  {p}", file=out)
+
+
+class ResultEmitter:
+    """
+    Writes results to an exporter and counts them in `summary`. With a VirusTotal client
+    (`vt`), results with a SHA256 first wait for their verdict, which is looked up on the
+    client's rate-limited background queue; they are written once it is in.
+    At most `max_waiting` results are held back. Beyond that emit() blocks until the
+    oldest verdict is in (`block`, bulk mode), or writes the new result at once with
+    VT_SKIPPED as its verdict (watch mode, which must keep reading events).
+    """
+
+    def __init__(self, writer: Exporter, vt=None, max_waiting: int = VT_MAX_WAITING, block: bool = True):
+        self.writer = writer
+        self.vt = vt
+        self.max_waiting = max_waiting
+        self.block = block
+        self.summary = BulkSummary()
+        self._waiting: List = []  # (future, result) awaiting a VirusTotal verdict
+
+    @property
+    def waiting(self) -> int:
+        """Results held back for a VirusTotal verdict."""
+        return len(self._waiting)
+
+    def _write(self, result: Dict) -> None:
+        self.writer.write(result)
+        self.summary.add(result)
+
+    def emit(self, results: List[Dict]) -> None:
+        """Write `results` (those awaiting a verdict later), then any whose verdict came in."""
+        for result in results:
+            if self.vt is not None and "error" not in result and is_sha256(result.get("sha256")):
+                if self._make_room():
+                    self._waiting.append((self.vt.submit(result["sha256"]), result))
+                    continue
+                result["virustotal"] = dict(VT_SKIPPED)
+            self._write(result)
+        self.write_ready()
+
+    def _make_room(self) -> bool:
+        """Whether another result may be held back (waits for verdicts when blocking)."""
+        if len(self._waiting) >= self.max_waiting:
+            self.write_ready()
+        while len(self._waiting) >= self.max_waiting:
+            if not self.block:
+                return False
+            wait([self._waiting[0][0]])
+            self.write_ready()
+        return True
+
+    def write_ready(self) -> None:
+        """Write the held-back results whose verdict is in."""
+        still = []
+        for fut, result in self._waiting:
+            if fut.done():
+                result["virustotal"] = fut.result() or None
+                self._write(result)
+            else:
+                still.append((fut, result))
+        self._waiting = still
+
+    def wait_all(self) -> None:
+        """Write every held-back result as its verdict comes in (blocks for quota)."""
+        while self._waiting:
+            wait([fut for fut, _ in self._waiting], return_when=FIRST_COMPLETED)
+            self.write_ready()
+            self.writer.flush()
+
+    def write_queued(self) -> None:
+        """Write the held-back results without waiting, with a "queued" verdict."""
+        self.write_ready()
+        for _, result in self._waiting:
+            result["virustotal"] = {"status": "queued"}
+            self._write(result)
+        self._waiting = []
+
+
+def run_bulk(
+    paths: Iterable[str],
+    writer: Exporter,
+    workers: Optional[int] = None,
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    use_cache: bool = True,
+    hash_algorithms: Optional[tuple] = None,
+    entropy_blocks: bool = False,
+    archive_depth: Optional[int] = None,
+    rules_source: Optional[str] = None,
+) -> BulkSummary:
+    """
+    Analyse `paths` over a process pool and stream each result to `writer` as it completes.
+    At most 4 batches per worker are in flight at once, so memory does not grow with input size.
+    VirusTotal lookups run in this process on one rate-limited background queue (workers
+    never call the API); records are written once their verdict is in. The scan only
+    waits for quota when VT_MAX_WAITING records are held back, and at the end.
+    `archive_depth` > 0 also reports the members of archives, down to that nesting depth.
+    `rules_source` ("default" or a JSON rule file) adds content rule matches.
+    If a worker process dies, the batches it took down are recorded as errors and the
+    scan continues on a new pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 4
+    emitter = ResultEmitter(writer, get_client(virustotal_api_key) if virustotal_api_key else None)
+
+    if workers == 1:
+        for batch in _batched(paths, batch_size):
+            emitter.emit(analyze_batch(
+                batch, use_file_cmd, None, use_cache, hash_algorithms, entropy_blocks, archive_depth, rules_source
+            ))
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        pending: Dict = {}  # future -> its batch of paths
+
+        def submit(batch: List[str]):
+            return pool.submit(
+                analyze_batch, batch, use_file_cmd, None, use_cache, hash_algorithms, entropy_blocks,
+                archive_depth, rules_source,
+            )
+
+        def collect() -> None:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                emitter.emit(batch_results(fut, pending.pop(fut)))
+
+        try:
+            for batch in _batched(paths, batch_size):
+                try:
+                    fut = submit(batch)
+                except BrokenProcessPool:
+                    # A worker died (its batches fail in batch_results): carry on with a new pool
+                    pool.shutdown(wait=False)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                    fut = submit(batch)
+                pending[fut] = batch
+                if len(pending) >= max_pending:
+                    collect()
+            while pending:
+                collect()
+        finally:
+            pool.shutdown(wait=True)
+
+    if emitter.waiting:
+        print(f"Waiting for {emitter.waiting} VirusTotal lookups (rate limited)...", file=sys.stderr, flush=True)
+    emitter.wait_all()
+    return emitter.summary
@@ -0,0 +1,188 @@
+"""
+Persistent analysis cache for FTI.
+Results are stored in SQLite keyed by (device, inode, size, mtime_ns), so unchanged
+files are not re-read on the next scan. The SHA256 is kept as a secondary key so
+content seen before under another path/inode can reuse expensive parts of the analysis.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+# Default cache location (next to the FTI sources)
+DEFAULT_CACHE_PATH = Path(os.getenv("FTI_CACHE_PATH", Path(__file__).resolve().parent.parent / ".fti_cache.sqlite"))
+
+# Eviction defaults: entries older than this are dropped, and the stored results are kept below this size
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when the result format changes so old entries are ignored
+CACHE_VERSION = 6
+
+StatKey = Tuple[int, int, int, int]
+
+
+def stat_key(st: os.stat_result) -> StatKey:
+    """Cache key for a stat result: (device, inode, size, mtime_ns)."""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class AnalysisCache:
+    """
+    SQLite-backed result cache. Safe to share between threads; each process opens its
+    own connection (WAL mode lets bulk-mode workers read and write concurrently).
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.path = Path(path)
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                variant TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                sha256 TEXT,
+                result TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (dev, ino, size, mtime_ns, variant)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_sha256 ON results (sha256)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_stored_at ON results (stored_at)")
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def get(self, key: StatKey, variant: str = "") -> Optional[Dict]:
+        """Return the cached result for a stat key, or None."""
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT result FROM results WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND variant=? AND version=?",
+                    (*key, variant, CACHE_VERSION),
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        return json.loads(row[0]) if row else None
+
+    def lookup_sha256(self, sha256: str, variant: str = "") -> Optional[Dict]:
+        """Return the most recent cached result for content with this SHA256, or None."""
+        if not sha256:
+            return None
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT result FROM results WHERE sha256=? AND variant=? AND version=? ORDER BY stored_at DESC LIMIT 1",
+                    (sha256, variant, CACHE_VERSION),
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        return json.loads(row[0]) if row else None
+
+    def sha256_for(self, key: StatKey) -> Optional[str]:
+        """SHA256 recorded for a stat key by any earlier analysis (any variant), or None."""
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT sha256 FROM results WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND version=? "
+                    "AND LENGTH(sha256)=64 LIMIT 1",
+                    (*key, CACHE_VERSION),
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        return row[0] if row else None
+
+    def put(self, key: StatKey, result: Dict, variant: str = "") -> None:
+        """Store a result under its stat key (errors are ignored; the cache is best effort)."""
+        payload = json.dumps(result, ensure_ascii=False, default=str)
+        with self._lock:
+            try:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO results (dev, ino, size, mtime_ns, variant, version, sha256, result, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*key, variant, CACHE_VERSION, result.get("sha256"), payload, time.time()),
+                )
+            except sqlite3.Error:
+                pass
+
+    def evict(self) -> int:
+        """Drop entries older than max_age_days and the oldest entries beyond max_bytes. Returns rows removed."""
+        removed = 0
+        with self._lock:
+            try:
+                conn = self._connect()
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += conn.execute(
+                    "DELETE FROM results WHERE stored_at < ? OR version != ?", (cutoff, CACHE_VERSION)
+                ).rowcount
+                total = conn.execute("SELECT COALESCE(SUM(LENGTH(result)), 0) FROM results").fetchone()[0]
+                if total > self.max_bytes:
+                    # Walk from the oldest entry until enough bytes are freed
+                    excess = total - self.max_bytes
+                    freed = 0
+                    cutoff_at = None
+                    cur = conn.execute("SELECT stored_at, LENGTH(result) FROM results ORDER BY stored_at")
+                    for stored_at, length in cur:
+                        freed += length
+                        cutoff_at = stored_at
+                        if freed >= excess:
+                            break
+                    cur.close()
+                    if cutoff_at is not None:
+                        removed += conn.execute("DELETE FROM results WHERE stored_at <= ?", (cutoff_at,)).rowcount
+            except sqlite3.Error:
+                pass
+        return removed
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            try:
+                self._connect().execute("DELETE FROM results")
+            except sqlite3.Error:
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+_caches: Dict[str, AnalysisCache] = {}
+
+
+def open_cache(path: Union[str, Path] = DEFAULT_CACHE_PATH) -> AnalysisCache:
+    """Return the process-wide cache for `path`, evicting stale entries on first use."""
+    key = str(path)
+    cache = _caches.get(key)
+    if cache is None:
+        cache = AnalysisCache(path)
+        cache.evict()
+        _caches[key] = cache
+    return cache
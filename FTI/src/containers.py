@@ -0,0 +1,324 @@
+"""
+Container introspection: tell DOCX/XLSX/JAR/APK/... apart from plain ZIP, and
+DOC/XLS/PPT/MSI apart from generic OLE, without decompressing anything.
+
+ZIP: the end-of-central-directory record is located in the last 64 KB, then only
+the central directory is read and classified by member names.
+OLE: the header points at the directory chain; only the directory sectors (and
+the FAT entries linking them) are read and classified by stream names / root CLSID.
+
+All reads go through a `read_at(offset, size)` callable, so the same code works on
+files (os.pread) and on the prefix/tail windows kept while streaming an upload.
+"""
+
+import os
+import struct
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# read_at(offset, size) -> bytes (may be shorter at EOF) or None if that range is unavailable
+RangeReader = Callable[[int, int], Optional[bytes]]
+
+# (description, typical_extensions), same shape as a match_magic() entry
+ContainerType = Tuple[str, List[str]]
+
+ZIP_LOCAL_MAGIC = b"PK\x03\x04"
+ZIP_EMPTY_MAGIC = b"PK\x05\x06"
+OLE_MAGIC = bytes.fromhex("D0CF11E0A1B11AE1")
+
+# EOCD (22 bytes) plus the largest possible archive comment
+ZIP_EOCD_SEARCH = 22 + 0xFFFF
+
+# Upper bounds so a hostile archive can't make triage expensive
+MAX_CENTRAL_DIRECTORY = 4 * 1024 * 1024
+MAX_MEMBERS = 65536
+MAX_OLE_DIR_SECTORS = 64
+
+# Bytes kept from the end of a stream so ZIP central directories can be read without seeking
+STREAM_TAIL_SIZE = 1024 * 1024
+
+_OLE_FREE_SECT = 0xFFFFFFFF
+_OLE_END_OF_CHAIN = 0xFFFFFFFE
+
+# Root storage CLSIDs (on-disk byte order) of Windows Installer files
+_OLE_ROOT_CLSIDS = {
+    bytes.fromhex("84100C0000000000C000000000000046"): ("Windows Installer package (MSI)", [".msi"]),
+    bytes.fromhex("86100C0000000000C000000000000046"): ("Windows Installer patch (MSP)", [".msp"]),
+    bytes.fromhex("82100C0000000000C000000000000046"): ("Windows Installer transform (MST)", [".mst"]),
+}
+
+_OOXML_PARTS = (
+    ("word/", "Microsoft Word document (OOXML)", [".docx", ".dotx"], [".docm", ".dotm"]),
+    ("xl/", "Microsoft Excel workbook (OOXML)", [".xlsx", ".xltx"], [".xlsm", ".xltm", ".xlam"]),
+    ("ppt/", "Microsoft PowerPoint presentation (OOXML)", [".pptx", ".potx", ".ppsx"], [".pptm", ".potm", ".ppsm"]),
+    ("visio/", "Microsoft Visio drawing (OOXML)", [".vsdx"], [".vsdm"]),
+)
+
+_ODF_MIMETYPES = {
+    "application/vnd.oasis.opendocument.text": ("OpenDocument text (ODT)", [".odt"]),
+    "application/vnd.oasis.opendocument.spreadsheet": ("OpenDocument spreadsheet (ODS)", [".ods"]),
+    "application/vnd.oasis.opendocument.presentation": ("OpenDocument presentation (ODP)", [".odp"]),
+    "application/vnd.oasis.opendocument.graphics": ("OpenDocument drawing (ODG)", [".odg"]),
+    "application/epub+zip": ("EPUB e-book", [".epub"]),
+}
+
+
+def is_container(header: bytes) -> bool:
+    """True if the header starts like a ZIP or OLE file."""
+    return header[:4] in (ZIP_LOCAL_MAGIC, ZIP_EMPTY_MAGIC) or header[:8] == OLE_MAGIC
+
+
+def inspect_container(header: bytes, read_at: RangeReader, size: int) -> Optional[ContainerType]:
+    """Refined (description, extensions) for a ZIP/OLE container, or None if not recognised."""
+    try:
+        if header[:4] in (ZIP_LOCAL_MAGIC, ZIP_EMPTY_MAGIC):
+            return _inspect_zip(read_at, size)
+        if header[:8] == OLE_MAGIC:
+            return _inspect_ole(read_at, size)
+    except struct.error:
+        pass  # truncated or malformed structures: keep the generic type
+    return None
+
+
+def inspect_path(filepath: Union[str, Path], header: bytes, size: int) -> Optional[ContainerType]:
+    """inspect_container() on a file, using positioned reads."""
+    if not is_container(header):
+        return None
+    try:
+        fd = os.open(str(filepath), os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    except OSError:
+        return None
+    try:
+        return inspect_container(header, file_reader(fd), size)
+    finally:
+        os.close(fd)
+
+
+def file_reader(fd: int) -> RangeReader:
+    """RangeReader over an open file descriptor."""
+    def read_at(offset: int, length: int) -> Optional[bytes]:
+        try:
+            if hasattr(os, "pread"):
+                return os.pread(fd, length, offset)
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.read(fd, length)
+        except OSError:
+            return None
+    return read_at
+
+
+def window_reader(prefix: bytes, tail: bytes, size: int) -> RangeReader:
+    """RangeReader over the first and last bytes of a stream of `size` bytes."""
+    tail_start = size - len(tail)
+
+    def read_at(offset: int, length: int) -> Optional[bytes]:
+        end = min(offset + length, size)
+        if end <= len(prefix):
+            return prefix[offset:end]
+        if offset >= tail_start:
+            return tail[offset - tail_start:end - tail_start]
+        return None
+    return read_at
+
+
+# ZIP
+
+def _inspect_zip(read_at: RangeReader, size: int) -> Optional[ContainerType]:
+    located = _zip_central_directory(read_at, size)
+    if located is None:
+        return None
+    cd_offset, cd_size, base = located
+    data = read_at(cd_offset, min(cd_size, MAX_CENTRAL_DIRECTORY))
+    if not data:
+        return None
+
+    members: Dict[str, Tuple[int, int, int]] = {}  # name -> (method, compressed size, local header offset)
+    pos = 0
+    while pos + 46 <= len(data) and len(members) < MAX_MEMBERS:
+        if data[pos:pos + 4] != b"PK\x01\x02":
+            break
+        method, = struct.unpack_from("<H", data, pos + 10)
+        csize, = struct.unpack_from("<I", data, pos + 20)
+        name_len, extra_len, comment_len = struct.unpack_from("<HHH", data, pos + 28)
+        local_offset, = struct.unpack_from("<I", data, pos + 42)
+        name = data[pos + 46:pos + 46 + name_len].decode("utf-8", errors="replace")
+        members[name] = (method, csize, local_offset + base)
+        pos += 46 + name_len + extra_len + comment_len
+    if not members:
+        return None
+
+    def read_stored(name: str, limit: int = 128) -> Optional[bytes]:
+        """Content of a small stored (uncompressed) member, e.g. ODF/EPUB `mimetype`."""
+        method, csize, offset = members[name]
+        if method != 0 or csize > limit:
+            return None
+        local = read_at(offset, 30)
+        if not local or len(local) < 30 or local[:4] != ZIP_LOCAL_MAGIC:
+            return None
+        name_len, extra_len = struct.unpack_from("<HH", local, 26)
+        return read_at(offset + 30 + name_len + extra_len, csize)
+
+    return classify_zip_members(list(members), read_stored)
+
+
+def _zip_central_directory(read_at: RangeReader, size: int) -> Optional[Tuple[int, int, int]]:
+    """Locate the central directory: (offset, size, base) where base corrects for prepended data."""
+    search = min(size, ZIP_EOCD_SEARCH)
+    tail = read_at(size - search, search)
+    if not tail:
+        return None
+    idx = tail.rfind(ZIP_EMPTY_MAGIC)
+    if idx < 0 or idx + 22 > len(tail):
+        return None
+    eocd_pos = size - search + idx
+    cd_size, cd_offset = struct.unpack_from("<II", tail, idx + 12)
+
+    if cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF:
+        # ZIP64: the locator sits right before the EOCD and points at the ZIP64 EOCD record
+        locator = tail[idx - 20:idx] if idx >= 20 else read_at(eocd_pos - 20, 20)
+        if not locator or len(locator) < 20 or locator[:4] != b"PK\x06\x07":
+            return None
+        eocd64_offset, = struct.unpack_from("<Q", locator, 8)
+        record = read_at(eocd64_offset, 56)
+        if not record or len(record) < 56 or record[:4] != b"PK\x06\x06":
+            return None
+        cd_size, cd_offset = struct.unpack_from("<QQ", record, 40)
+        return cd_offset, cd_size, 0
+
+    # Self-extracting archives etc.: data before the ZIP shifts every stored offset
+    base = eocd_pos - cd_size - cd_offset
+    if base < 0:
+        return None
+    return cd_offset + base, cd_size, base
+
+
+def classify_zip_members(
+    names: List[str],
+    read_stored: Optional[Callable[[str], Optional[bytes]]] = None,
+) -> Optional[ContainerType]:
+    """Document/package type from ZIP member names (None: plain ZIP)."""
+    name_set = set(names)
+
+    if "mimetype" in name_set and read_stored is not None:
+        mimetype = read_stored("mimetype")
+        if mimetype:
+            known = _ODF_MIMETYPES.get(mimetype.decode("ascii", errors="replace").strip())
+            if known:
+                return known
+
+    if "[Content_Types].xml" in name_set:
+        for prefix, desc, exts, macro_exts in _OOXML_PARTS:
+            if any(n.startswith(prefix) for n in names):
+                if any(n.endswith("vbaProject.bin") for n in names):
+                    return desc.replace(" (OOXML)", " with macros (OOXML)"), macro_exts + exts
+                return desc, exts + macro_exts
+        if any(n.startswith("Documents/") for n in names) or "FixedDocumentSequence.fdseq" in name_set:
+            return "XPS document", [".xps", ".oxps"]
+
+    if "AndroidManifest.xml" in name_set:
+        if "classes.dex" in name_set or any(n.startswith("classes") and n.endswith(".dex") for n in names):
+            return "Android package (APK)", [".apk"]
+        if "base/manifest/AndroidManifest.xml" in name_set:
+            return "Android App Bundle (AAB)", [".aab"]
+        return "Android library (AAR)", [".aar", ".apk"]
+    if "base/manifest/AndroidManifest.xml" in name_set:
+        return "Android App Bundle (AAB)", [".aab"]
+
+    if any(n.startswith("Payload/") and ".app/" in n for n in names):
+        return "iOS application (IPA)", [".ipa"]
+
+    if "META-INF/MANIFEST.MF" in name_set or any(n.endswith(".class") for n in names):
+        if any(n.startswith("WEB-INF/") for n in names):
+            return "Java web archive (WAR)", [".war", ".jar"]
+        if "META-INF/application.xml" in name_set:
+            return "Java enterprise archive (EAR)", [".ear", ".jar"]
+        return "Java archive (JAR)", [".jar"]
+
+    if "META-INF/container.xml" in name_set:
+        return "EPUB e-book", [".epub"]
+    if "manifest.json" in name_set and any(n.startswith("META-INF/mozilla") for n in names):
+        return "Firefox extension (XPI)", [".xpi"]
+    if any(n.endswith(".nuspec") and "/" not in n for n in names):
+        return "NuGet package", [".nupkg"]
+    return None
+
+
+# OLE (Compound File Binary)
+
+def _inspect_ole(read_at: RangeReader, size: int) -> Optional[ContainerType]:
+    header = read_at(0, 512)
+    if not header or len(header) < 512:
+        return None
+    sector_shift, = struct.unpack_from("<H", header, 0x1E)
+    if sector_shift not in (9, 12):
+        return None
+    sector_size = 1 << sector_shift
+    first_dir, = struct.unpack_from("<I", header, 0x30)
+    difat = struct.unpack_from("<109I", header, 0x4C)
+    per_fat_sector = sector_size // 4
+    fat_cache: Dict[int, bytes] = {}
+
+    def next_sector(sector: int) -> Optional[int]:
+        index = sector // per_fat_sector
+        if index >= len(difat) or difat[index] in (_OLE_FREE_SECT, _OLE_END_OF_CHAIN):
+            return None  # FAT sector listed in the DIFAT chain: beyond what we read
+        fat = fat_cache.get(index)
+        if fat is None:
+            fat = read_at((difat[index] + 1) * sector_size, sector_size)
+            if not fat or len(fat) < sector_size:
+                return None
+            fat_cache[index] = fat
+        return struct.unpack_from("<I", fat, (sector % per_fat_sector) * 4)[0]
+
+    names: List[str] = []
+    root_clsid = b""
+    sector = first_dir
+    seen = set()
+    while sector is not None and sector < _OLE_END_OF_CHAIN and len(seen) < MAX_OLE_DIR_SECTORS:
+        if sector in seen or (sector + 1) * sector_size >= size:
+            break
+        seen.add(sector)
+        data = read_at((sector + 1) * sector_size, sector_size)
+        if not data:
+            break
+        for pos in range(0, len(data) - 127, 128):
+            name_len, = struct.unpack_from("<H", data, pos + 64)
+            entry_type = data[pos + 66]
+            if entry_type == 0 or not 2 <= name_len <= 64:
+                continue
+            name = data[pos:pos + name_len - 2].decode("utf-16-le", errors="replace")
+            if entry_type == 5:
+                root_clsid = bytes(data[pos + 80:pos + 96])
+            names.append(name)
+        sector = next_sector(sector)
+
+    if not names:
+        return None
+    return classify_ole_entries(names, root_clsid)
+
+
+def classify_ole_entries(names: List[str], root_clsid: bytes = b"") -> Optional[ContainerType]:
+    """Document type from OLE directory entry names and the root CLSID (None: generic OLE)."""
+    known = _OLE_ROOT_CLSIDS.get(root_clsid)
+    if known:
+        return known
+
+    name_set = set(names)
+    macros = bool(name_set & {"Macros", "_VBA_PROJECT_CUR", "VBA", "_VBA_PROJECT"})
+    suffix = " with macros (OLE)" if macros else " (OLE)"
+
+    if "EncryptedPackage" in name_set and "EncryptionInfo" in name_set:
+        return "Encrypted Office document (OLE)", [".docx", ".xlsx", ".pptx", ".docm", ".xlsm", ".pptm"]
+    if "WordDocument" in name_set:
+        return "Microsoft Word document" + suffix, [".doc", ".dot"]
+    if "Workbook" in name_set or "Book" in name_set:
+        return "Microsoft Excel workbook" + suffix, [".xls", ".xlt", ".xla"]
+    if "PowerPoint Document" in name_set:
+        return "Microsoft PowerPoint presentation" + suffix, [".ppt", ".pps", ".pot"]
+    if "VisioDocument" in name_set:
+        return "Microsoft Visio drawing (OLE)", [".vsd", ".vss", ".vst"]
+    if "__properties_version1.0" in name_set or any(n.startswith("__substg1.0_") for n in names):
+        return "Outlook message (OLE)", [".msg"]
+    if "Contents" in name_set and "Quill" in name_set:
+        return "Microsoft Publisher document (OLE)", [".pub"]
+    return None
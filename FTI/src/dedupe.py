@@ -0,0 +1,349 @@
+"""
+Duplicate and near-duplicate file finder.
+Exact duplicates are narrowed down in stages: file size, then a partial hash of the
+first and last 64 KB, then a full SHA256 only for files that still collide, so most
+files are never read in full. Similarity mode builds a MinHash signature from sampled
+8-byte shingles of each file and clusters the signatures through an LSH band index,
+so only files that share a band bucket are ever compared.
+"""
+
+import hashlib
+import os
+import random
+import stat
+import struct
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+# Use absolute imports when run as script, relative when imported as package
+try:
+    from .cache import AnalysisCache, stat_key
+    from .hashing import hash_file
+except ImportError:
+    from cache import AnalysisCache, stat_key
+    from hashing import hash_file
+
+# Bytes hashed from each end of a file in the partial-hash stage
+PARTIAL_SIZE = 64 * 1024
+
+# Similarity: shingle length, 1-in-2**SAMPLE_BITS shingles kept as features
+SHINGLE_SIZE = 8
+SAMPLE_BITS = 6
+
+# MinHash signature length and LSH banding (NUM_PERM = BANDS * rows per band)
+NUM_PERM = 64
+BANDS = 16
+
+# Only the first SIMILARITY_MAX_BYTES of a file are shingled
+SIMILARITY_MAX_BYTES = 16 * 1024 * 1024
+
+# Files with fewer sampled features than this are too small to compare
+MIN_FEATURES = 4
+
+# Default estimated Jaccard similarity for two files to be clustered
+DEFAULT_SIMILARITY = 0.5
+
+# Clusters per LSH bucket a file is compared with (one representative each)
+MAX_BUCKET_REPRESENTATIVES = 64
+
+_MASK64 = (1 << 64) - 1
+_SHINGLE_MULT = 0x9E3779B97F4A7C15
+_rng = random.Random(0x5EED)
+_PERM_A = [_rng.getrandbits(64) | 1 for _ in range(NUM_PERM)]
+_PERM_B = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+del _rng
+
+# Features hashed per numpy step (bounds the features x NUM_PERM matrix)
+_NUMPY_FEATURE_BATCH = 16384
+
+# Bytes shingled per numpy step (bounds the temporary uint64 arrays to 8x this)
+_NUMPY_SHINGLE_WINDOW = 1024 * 1024
+
+
+class DedupeStats:
+    """Counts of how much work each stage did."""
+
+    def __init__(self):
+        self.files = 0
+        self.size_candidates = 0
+        self.partial_hashed = 0
+        self.full_hashed = 0
+        self.cache_hits = 0
+        self.groups = 0
+        self.duplicate_files = 0
+        self.wasted_bytes = 0
+
+    def as_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+    def print(self, out: TextIO = sys.stderr) -> None:
+        print("\nDuplicate summary", file=out)
+        print("-" * 40, file=out)
+        print(f"Files scanned: {self.files}", file=out)
+        print(f"Same-size candidates: {self.size_candidates}", file=out)
+        print(f"Partially hashed: {self.partial_hashed}", file=out)
+        print(f"Fully hashed: {self.full_hashed} ({self.cache_hits} SHA256 from cache)", file=out)
+        print(f"Duplicate groups: {self.groups} ({self.duplicate_files} redundant files, "
+              f"{self.wasted_bytes / (1024 * 1024):.1f} MB)", file=out)
+
+
+def _regular_files(paths: Iterable[Union[str, Path]]) -> Iterable[Tuple[str, os.stat_result]]:
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            yield str(p), st
+
+
+def partial_hash(filepath: Union[str, Path], size: int, partial_size: int = PARTIAL_SIZE) -> Optional[str]:
+    """
+    Hash of the first and last `partial_size` bytes (and the size). For files of up to
+    2 * `partial_size` bytes this covers the whole content, and the SHA256 is returned.
+    """
+    try:
+        with open(filepath, "rb", buffering=0) as f:
+            fd = f.fileno()
+            if size <= 2 * partial_size:
+                return hashlib.sha256(os.pread(fd, size, 0)).hexdigest()
+            h = hashlib.blake2b(digest_size=16)
+            h.update(size.to_bytes(8, "little"))
+            h.update(os.pread(fd, partial_size, 0))
+            h.update(os.pread(fd, partial_size, size - partial_size))
+            return "partial:" + h.hexdigest()
+    except OSError:
+        return None
+
+
+def _full_sha256(item: Tuple[str, os.stat_result], cache: Optional[AnalysisCache]) -> Tuple[Optional[str], bool]:
+    path, st = item
+    if cache is not None:
+        sha256 = cache.sha256_for(stat_key(st))
+        if sha256:
+            return sha256, True
+    try:
+        return hash_file(path, ("sha256",))["sha256"], False
+    except OSError:
+        return None, False
+
+
+def find_duplicates(
+    paths: Iterable[Union[str, Path]],
+    partial_size: int = PARTIAL_SIZE,
+    min_size: int = 1,
+    workers: Optional[int] = None,
+    cache: Optional[AnalysisCache] = None,
+    stats: Optional[DedupeStats] = None,
+) -> List[Dict]:
+    """
+    Group files with identical content. Returns one dict per group (largest waste first):
+    sha256, size, count, paths and wasted_bytes. Hard links to the same inode are listed
+    but hashed once and not counted as waste. `cache` supplies SHA256s of files FTI has
+    already analysed, so they are not hashed again.
+    """
+    stats = stats if stats is not None else DedupeStats()
+    workers = workers or min(32, (os.cpu_count() or 1) * 2)
+
+    # Stage 1: size (hard links collapse onto one inode)
+    inodes: Dict[Tuple[int, int], List[str]] = defaultdict(list)
+    by_size: Dict[int, List[Tuple[str, os.stat_result]]] = defaultdict(list)
+    for path, st in _regular_files(paths):
+        stats.files += 1
+        if st.st_size < min_size:
+            continue
+        links = inodes[(st.st_dev, st.st_ino)]
+        links.append(path)
+        if len(links) == 1:
+            by_size[st.st_size].append((path, st))
+
+    candidates = [item for items in by_size.values() if len(items) > 1 for item in items]
+    stats.size_candidates = len(candidates)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Stage 2: first and last partial_size bytes (the full SHA256 for small files)
+        partial = pool.map(lambda item: partial_hash(item[0], item[1].st_size, partial_size), candidates)
+        by_partial: Dict[str, List[Tuple[str, os.stat_result]]] = defaultdict(list)
+        for item, digest in zip(candidates, partial):
+            stats.partial_hashed += 1
+            if digest is not None:
+                by_partial[digest].append(item)
+
+        # Stage 3: full SHA256 of large files whose partial hashes collide
+        by_sha256: Dict[str, List[Tuple[str, os.stat_result]]] = defaultdict(list)
+        to_hash = []
+        for digest, items in by_partial.items():
+            if len(items) < 2:
+                continue
+            if digest.startswith("partial:"):
+                to_hash.extend(items)
+            else:
+                by_sha256[digest].extend(items)
+        for item, (sha256, cached) in zip(to_hash, pool.map(lambda item: _full_sha256(item, cache), to_hash)):
+            stats.full_hashed += 1
+            stats.cache_hits += cached
+            if sha256 is not None:
+                by_sha256[sha256].append(item)
+
+    groups = []
+    for sha256, items in by_sha256.items():
+        if len(items) < 2:
+            continue
+        size = items[0][1].st_size
+        group_paths = sorted(p for path, st in items for p in inodes[(st.st_dev, st.st_ino)])
+        groups.append({
+            "sha256": sha256,
+            "size": size,
+            "count": len(group_paths),
+            "paths": group_paths,
+            "wasted_bytes": size * (len(items) - 1),
+        })
+        stats.duplicate_files += len(items) - 1
+        stats.wasted_bytes += size * (len(items) - 1)
+    stats.groups = len(groups)
+    groups.sort(key=lambda g: (-g["wasted_bytes"], g["paths"][0]))
+    return groups
+
+
+def shingle_features(data: bytes) -> List[int]:
+    """
+    Sampled content features: hashes of the 8-byte shingles whose hash falls in the top
+    1/2**SAMPLE_BITS range. Sampling by value (not position) keeps features aligned when
+    bytes are inserted or removed.
+    """
+    n = len(data) - SHINGLE_SIZE + 1
+    if n <= 0:
+        return []
+    keep = 64 - SAMPLE_BITS
+    if np is not None:
+        a = np.frombuffer(data, dtype=np.uint8)
+        parts = []
+        # Shingles starting in [start, start + window); windows overlap by SHINGLE_SIZE - 1 bytes
+        for start in range(0, n, _NUMPY_SHINGLE_WINDOW):
+            count = min(_NUMPY_SHINGLE_WINDOW, n - start)
+            grams = np.zeros(count, dtype=np.uint64)
+            for j in range(SHINGLE_SIZE):
+                grams |= a[start + j:start + j + count].astype(np.uint64) << np.uint64(8 * j)
+            grams *= np.uint64(_SHINGLE_MULT)
+            parts.append(grams[(grams >> np.uint64(keep)) == 0])
+        return np.unique(np.concatenate(parts)).tolist()
+
+    features = set()
+    for k in range(SHINGLE_SIZE):
+        usable = (len(data) - k) // SHINGLE_SIZE * SHINGLE_SIZE
+        for (gram,) in struct.iter_unpack("<Q", data[k:k + usable]):
+            h = (gram * _SHINGLE_MULT) & _MASK64
+            if not h >> keep:
+                features.add(h)
+    return sorted(features)
+
+
+def minhash(features: List[int]) -> Optional[Tuple[int, ...]]:
+    """NUM_PERM-slot MinHash signature of a feature set (None if there are too few features)."""
+    if len(features) < MIN_FEATURES:
+        return None
+    if np is not None:
+        a = np.array(_PERM_A, dtype=np.uint64)
+        b = np.array(_PERM_B, dtype=np.uint64)
+        f = np.array(features, dtype=np.uint64)
+        mins = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(f), _NUMPY_FEATURE_BATCH):
+            batch = f[start:start + _NUMPY_FEATURE_BATCH, None]
+            mins = np.minimum(mins, (batch * a + b).min(axis=0))
+        return tuple(int(x) for x in mins)
+    return tuple(min(((x * pa + pb) & _MASK64) for x in features) for pa, pb in zip(_PERM_A, _PERM_B))
+
+
+def file_signature(filepath: Union[str, Path], max_bytes: int = SIMILARITY_MAX_BYTES) -> Optional[Tuple[int, ...]]:
+    """MinHash signature of the first `max_bytes` of a file (None if unreadable or too small)."""
+    try:
+        with open(filepath, "rb") as f:
+            data = f.read(max_bytes)
+    except OSError:
+        return None
+    return minhash(shingle_features(data))
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures (fraction of equal slots)."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def find_similar(
+    paths: Iterable[Union[str, Path]],
+    threshold: float = DEFAULT_SIMILARITY,
+    workers: Optional[int] = None,
+    max_bytes: int = SIMILARITY_MAX_BYTES,
+) -> List[Dict]:
+    """
+    Cluster files whose estimated similarity to each other is at least `threshold`.
+    Signatures are computed over a process pool; the LSH index only compares files that
+    share a band. Within a band bucket each file is compared with one representative of
+    every cluster met so far in it (up to MAX_BUCKET_REPRESENTATIVES), not with every
+    other file. Returns clusters of two or more files (largest first): count, paths
+    and min_similarity to the cluster's first file.
+    """
+    paths = [str(p) for p in paths]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        signatures = [file_signature(p, max_bytes) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            signatures = list(pool.map(file_signature, paths, [max_bytes] * len(paths), chunksize=16))
+
+    indexed = [(p, s) for p, s in zip(paths, signatures) if s is not None]
+    parent = list(range(len(indexed)))
+
+    def _find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_PERM // BANDS
+    for band in range(BANDS):
+        buckets: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+        for i, (_, sig) in enumerate(indexed):
+            buckets[sig[band * rows:(band + 1) * rows]].append(i)
+        for members in buckets.values():
+            # Similarity is not transitive: a member below the threshold to the first
+            # cluster can still match another one, so every cluster keeps a representative
+            representatives: List[int] = []
+            for i in members:
+                root = _find(i)
+                for rep in representatives:
+                    rep_root = _find(rep)
+                    if rep_root == root:
+                        break
+                    if similarity(indexed[rep][1], indexed[i][1]) >= threshold:
+                        parent[root] = rep_root
+                        break
+                else:
+                    if len(representatives) < MAX_BUCKET_REPRESENTATIVES:
+                        representatives.append(i)
+
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(indexed)):
+        clusters[_find(i)].append(i)
+
+    result = []
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda i: indexed[i][0])
+        head = indexed[members[0]][1]
+        result.append({
+            "count": len(members),
+            "paths": [indexed[i][0] for i in members],
+            "min_similarity": round(min(similarity(head, indexed[i][1]) for i in members[1:]), 3),
+        })
+    result.sort(key=lambda c: (-c["count"], c["paths"][0]))
+    return result
@@ -0,0 +1,192 @@
+"""
+Entropy analysis: whole-file Shannon entropy and a per-block entropy profile.
+Histograms are computed with numpy.bincount over the raw buffer when numpy is
+installed (no Python loop over bytes; block entropies are evaluated in batches
+through a c*log2(c) lookup table), with a pure-Python fallback otherwise. The profile shows packed/encrypted regions inside a file.
+"""
+
+import math
+from collections import Counter
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+# Window size for the block entropy profile
+BLOCK_SIZE = 4096
+
+# Blocks above this entropy count as high-entropy (same threshold as the report)
+HIGH_BLOCK_ENTROPY = 7.5
+
+# Maximum number of high-entropy regions reported per file
+MAX_REGIONS = 32
+
+# Blocks whose entropies are computed together in one vectorised step
+_NUMPY_BATCH_BLOCKS = 256
+
+_clog2_cache: Dict[int, "np.ndarray"] = {}
+
+
+def _clog2_table(n: int):
+    """Lookup table of c * log2(c) for c in 0..n (numpy only)."""
+    table = _clog2_cache.get(n)
+    if table is None:
+        c = np.arange(n + 1, dtype=np.float64)
+        c[0] = 1.0
+        table = np.arange(n + 1, dtype=np.float64) * np.log2(c)
+        _clog2_cache[n] = table
+    return table
+
+
+def shannon_entropy(counts, length: int) -> Optional[float]:
+    """Shannon entropy (0-8) from a 256-entry byte histogram. Returns None for empty input."""
+    if length <= 0:
+        return None
+    if np is not None and isinstance(counts, np.ndarray):
+        p = counts[counts > 0] / length
+        return float(-(p * np.log2(p)).sum())
+    entropy = 0.0
+    for count in counts:
+        if count > 0:
+            p = count / length
+            entropy -= p * math.log2(p)
+    return entropy
+
+
+def byte_histogram(data) -> List[int]:
+    """256-entry byte frequency histogram of `data` (bytes-like)."""
+    if np is not None:
+        return np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256).tolist()
+    counts = [0] * 256
+    for byte, n in Counter(bytes(data)).items():
+        counts[byte] = n
+    return counts
+
+
+def data_entropy(data) -> Optional[float]:
+    """Shannon entropy of a bytes-like object."""
+    return shannon_entropy(byte_histogram(data), len(data))
+
+
+class EntropyAccumulator:
+    """
+    Streaming whole-file entropy plus per-block profile.
+    Feed consecutive chunks with update(); blocks that straddle chunk boundaries
+    are carried over, the trailing partial block is included in the whole-file
+    entropy and, if non-empty, as a last (shorter) block in the profile.
+    """
+
+    def __init__(self, block_size: int = BLOCK_SIZE, keep_blocks: bool = False):
+        self.block_size = block_size
+        self.keep_blocks = keep_blocks
+        self.length = 0
+        self.blocks: List[float] = []
+        self.block_count = 0
+        self.high_blocks = 0
+        self.max_block = 0.0
+        self.regions: List[List[int]] = []  # [start_offset, end_offset) of high-entropy runs
+        self._carry = bytearray()
+        if np is not None:
+            self._counts = np.zeros(256, dtype=np.int64)
+        else:
+            self._counts = [0] * 256
+        self._finished = False
+
+    def update(self, chunk) -> None:
+        if not len(chunk):
+            return
+        mv = memoryview(chunk).cast("B")
+        if self._carry:
+            need = self.block_size - len(self._carry)
+            self._carry += mv[:need]
+            mv = mv[need:]
+            if len(self._carry) < self.block_size:
+                return
+            self._add_blocks(memoryview(bytes(self._carry)))
+            self._carry.clear()
+        full = len(mv) - len(mv) % self.block_size
+        if full:
+            self._add_blocks(mv[:full])
+        if full < len(mv):
+            self._carry += mv[full:]
+
+    def _add_blocks(self, mv: memoryview) -> None:
+        """Histogram whole blocks (len(mv) is a multiple of block_size, or the final partial block)."""
+        size = len(mv)
+        bs = self.block_size
+        if np is not None:
+            arr = np.frombuffer(mv, dtype=np.uint8)
+            for start in range(0, size, bs * _NUMPY_BATCH_BLOCKS):
+                part = arr[start:start + bs * _NUMPY_BATCH_BLOCKS]
+                n = -(-len(part) // bs)
+                if len(part) % bs:
+                    # Final partial block: histogram it on its own
+                    counts = np.bincount(part, minlength=256)
+                    self._counts += counts
+                    self._record([shannon_entropy(counts, len(part)) or 0.0], self.length + start, bs)
+                    continue
+                # One bincount for all blocks: block i's bytes are counted at i * 256 + byte
+                # (uint16 holds every index since n <= _NUMPY_BATCH_BLOCKS = 256)
+                offsets = (np.arange(n, dtype=np.uint16) * 256)[:, None]
+                counts = np.bincount((part.reshape(n, bs) + offsets).ravel(), minlength=n * 256).reshape(n, 256)
+                self._counts += counts.sum(axis=0)
+                # H = log2(bs) - sum(c * log2(c)) / bs, with c * log2(c) from a lookup table
+                table = _clog2_table(bs)
+                entropies = math.log2(bs) - table[counts].sum(axis=1) / bs
+                self._record(entropies.tolist(), self.length + start, bs)
+        else:
+            for start in range(0, size, bs):
+                block = mv[start:start + bs]
+                counts = byte_histogram(block)
+                for i, c in enumerate(counts):
+                    self._counts[i] += c
+                self._record([shannon_entropy(counts, len(block)) or 0.0], self.length + start, bs)
+        self.length += size
+
+    def _record(self, entropies: List[float], offset: int, bs: int) -> None:
+        for i, e in enumerate(entropies):
+            self.block_count += 1
+            if self.keep_blocks:
+                self.blocks.append(round(e, 3))
+            if e > self.max_block:
+                self.max_block = e
+            if e > HIGH_BLOCK_ENTROPY:
+                self.high_blocks += 1
+                start = offset + i * bs
+                if self.regions and self.regions[-1][1] == start:
+                    self.regions[-1][1] = start + bs
+                elif len(self.regions) < MAX_REGIONS:
+                    self.regions.append([start, start + bs])
+
+    def finish(self) -> None:
+        """Flush the trailing partial block (idempotent)."""
+        if self._finished:
+            return
+        self._finished = True
+        if self._carry:
+            self._add_blocks(memoryview(bytes(self._carry)))
+            # the last block may be shorter than block_size
+            if self.regions and self.regions[-1][1] > self.length:
+                self.regions[-1][1] = self.length
+            self._carry.clear()
+
+    def entropy(self) -> Optional[float]:
+        """Whole-content Shannon entropy (0-8), None if nothing was fed."""
+        self.finish()
+        return shannon_entropy(self._counts, self.length)
+
+    def profile(self) -> Dict:
+        """Summary of the block profile (plus the per-block values when keep_blocks is set)."""
+        self.finish()
+        summary = {
+            "block_size": self.block_size,
+            "blocks": self.block_count,
+            "max": round(self.max_block, 3),
+            "high_entropy_ratio": round(self.high_blocks / self.block_count, 4) if self.block_count else 0.0,
+            "high_entropy_regions": self.regions,
+        }
+        if self.keep_blocks:
+            summary["values"] = self.blocks
+        return summary
@@ -0,0 +1,534 @@
+"""
+Structural parsing of PE and ELF executables.
+The file is mmap'ed and read through a memoryview with struct.unpack_from, so
+nothing is copied except the fields that are decoded. Parsing is lazy: each
+structure (sections, imports, overlay, ...) is decoded the first time it is
+accessed. Per-section entropy uses the same byte histogram code as the whole-file
+entropy (numpy.bincount when available).
+"""
+
+import mmap
+import struct
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# Use absolute imports when run as script, relative when imported as package
+try:
+    from .entropy import data_entropy
+except ImportError:
+    from entropy import data_entropy
+
+# Sanity limits for malformed or hostile headers
+MAX_SECTIONS = 4096
+MAX_IMPORTS = 4096
+MAX_NAME_LENGTH = 256
+
+PE_MACHINES = {
+    0x014C: "x86",
+    0x8664: "x64",
+    0x01C0: "ARM",
+    0x01C4: "ARMv7",
+    0xAA64: "ARM64",
+    0x0200: "IA-64",
+}
+
+PE_SUBSYSTEMS = {
+    1: "Native",
+    2: "Windows GUI",
+    3: "Windows console",
+    9: "Windows CE",
+    10: "EFI application",
+    11: "EFI boot driver",
+    12: "EFI runtime driver",
+    16: "Windows boot application",
+}
+
+ELF_MACHINES = {
+    2: "SPARC",
+    3: "x86",
+    8: "MIPS",
+    20: "PowerPC",
+    21: "PowerPC64",
+    22: "s390",
+    40: "ARM",
+    62: "x86-64",
+    183: "AArch64",
+    243: "RISC-V",
+}
+
+ELF_TYPES = {1: "relocatable", 2: "executable", 3: "shared object / PIE", 4: "core dump"}
+
+# PE section characteristics / ELF section flags
+_IMAGE_SCN_MEM_EXECUTE = 0x20000000
+_IMAGE_SCN_MEM_READ = 0x40000000
+_IMAGE_SCN_MEM_WRITE = 0x80000000
+_SHF_WRITE = 0x1
+_SHF_ALLOC = 0x2
+_SHF_EXECINSTR = 0x4
+
+# ELF section / segment types
+_SHT_DYNAMIC = 6
+_SHT_NOBITS = 8
+_SHT_DYNSYM = 11
+_PT_INTERP = 3
+_DT_NEEDED = 1
+
+
+class ExecutableFormatError(ValueError):
+    """Headers are truncated or inconsistent."""
+
+
+def _cstring(view, offset: int, limit: int = MAX_NAME_LENGTH) -> str:
+    """NUL-terminated string at `offset` (latin-1; at most `limit` bytes)."""
+    if offset < 0 or offset >= len(view):
+        raise ExecutableFormatError(f"String offset 0x{offset:X} outside file")
+    chunk = bytes(view[offset:offset + limit])
+    end = chunk.find(b"\0")
+    return chunk[: end if end >= 0 else len(chunk)].decode("latin-1")
+
+
+def _flags(readable: bool, writable: bool, executable: bool) -> str:
+    return ("r" if readable else "-") + ("w" if writable else "-") + ("x" if executable else "-")
+
+
+class _Binary:
+    """Common base: a read-only view over the file and lazily computed properties."""
+
+    format_name = ""
+
+    def __init__(self, view):
+        self.view = view
+        self.size = len(view)
+
+    def _unpack(self, fmt: str, offset: int) -> Tuple:
+        # Offsets come from the file: check them before struct sees them (a 64-bit
+        # offset can overflow ssize_t, a negative one would count from the end)
+        if not 0 <= offset <= self.size - struct.calcsize(fmt):
+            raise ExecutableFormatError(f"Truncated header at 0x{offset:X}")
+        return struct.unpack_from(fmt, self.view, offset)
+
+    def section_entropy(self, offset: int, size: int) -> Optional[float]:
+        if size <= 0 or offset >= self.size:
+            return None
+        value = data_entropy(self.view[offset:min(self.size, offset + size)])
+        return round(value, 4) if value is not None else None
+
+    @cached_property
+    def overlay_offset(self) -> int:
+        """First byte after everything the headers describe (== size when there is no overlay)."""
+        return min(self.size, self._data_end())
+
+    @property
+    def overlay_size(self) -> int:
+        return self.size - self.overlay_offset
+
+    def _data_end(self) -> int:
+        raise NotImplementedError
+
+    def summary(self) -> Dict:
+        raise NotImplementedError
+
+    def _try(self, getter, default, problems: List[str]):
+        """Value of `getter()`, or `default` with the error noted (truncated samples still get a summary)."""
+        try:
+            return getter()
+        except ExecutableFormatError as e:
+            if str(e) not in problems:
+                problems.append(str(e))
+            return default
+
+    def _section_list(self) -> List[Dict]:
+        # ELF SHT_NULL entries carry no data; the raw section type is not reported
+        return [
+            dict({k: v for k, v in s.items() if k != "type"}, entropy=self.section_entropy(s["raw_offset"], s["raw_size"]))
+            for s in self.sections if s.get("type") != 0
+        ]
+
+
+class PEFile(_Binary):
+    """Lazily parsed PE/COFF image (EXE, DLL, SYS)."""
+
+    def __init__(self, view):
+        super().__init__(view)
+        if bytes(view[:2]) != b"MZ":
+            raise ExecutableFormatError("No MZ header")
+        (self.pe_offset,) = self._unpack("<I", 0x3C)
+        if bytes(view[self.pe_offset:self.pe_offset + 4]) != b"PE\0\0":
+            raise ExecutableFormatError("No PE signature (DOS executable?)")
+
+    @cached_property
+    def _coff(self) -> Tuple:
+        # Machine, NumberOfSections, TimeDateStamp, PointerToSymbolTable, NumberOfSymbols,
+        # SizeOfOptionalHeader, Characteristics
+        return self._unpack("<HHIIIHH", self.pe_offset + 4)
+
+    @property
+    def _optional_offset(self) -> int:
+        return self.pe_offset + 24
+
+    @cached_property
+    def is_64bit(self) -> bool:
+        (magic,) = self._unpack("<H", self._optional_offset)
+        if magic not in (0x10B, 0x20B):
+            raise ExecutableFormatError(f"Unknown optional header magic 0x{magic:X}")
+        return magic == 0x20B
+
+    @property
+    def format_name(self) -> str:
+        return "PE32+" if self.is_64bit else "PE32"
+
+    @property
+    def machine(self) -> str:
+        return PE_MACHINES.get(self._coff[0], f"0x{self._coff[0]:04X}")
+
+    @property
+    def timestamp(self) -> int:
+        return self._coff[2]
+
+    @property
+    def is_dll(self) -> bool:
+        return bool(self._coff[6] & 0x2000)
+
+    @cached_property
+    def entry_point(self) -> int:
+        """AddressOfEntryPoint (RVA)."""
+        return self._unpack("<I", self._optional_offset + 16)[0]
+
+    @cached_property
+    def image_base(self) -> int:
+        if self.is_64bit:
+            return self._unpack("<Q", self._optional_offset + 24)[0]
+        return self._unpack("<I", self._optional_offset + 28)[0]
+
+    @cached_property
+    def subsystem(self) -> str:
+        (value,) = self._unpack("<H", self._optional_offset + 68)
+        return PE_SUBSYSTEMS.get(value, str(value))
+
+    def data_directory(self, index: int) -> Tuple[int, int]:
+        """(address, size) of data directory `index` ((0, 0) if absent)."""
+        count_at = self._optional_offset + (108 if self.is_64bit else 92)
+        (count,) = self._unpack("<I", count_at)
+        if index >= min(count, 16):
+            return 0, 0
+        return self._unpack("<II", count_at + 4 + index * 8)
+
+    @cached_property
+    def sections(self) -> List[Dict]:
+        count = min(self._coff[1], MAX_SECTIONS)
+        table = self._optional_offset + self._coff[5]
+        sections = []
+        for i in range(count):
+            name, vsize, vaddr, raw_size, raw_ptr = self._unpack("<8sIIII", table + i * 40)
+            (characteristics,) = self._unpack("<I", table + i * 40 + 36)
+            sections.append({
+                "name": name.rstrip(b"\0").decode("latin-1"),
+                "virtual_address": vaddr,
+                "virtual_size": vsize,
+                "raw_offset": raw_ptr,
+                "raw_size": raw_size,
+                "flags": _flags(
+                    bool(characteristics & _IMAGE_SCN_MEM_READ),
+                    bool(characteristics & _IMAGE_SCN_MEM_WRITE),
+                    bool(characteristics & _IMAGE_SCN_MEM_EXECUTE),
+                ),
+            })
+        return sections
+
+    def rva_to_offset(self, rva: int) -> Optional[int]:
+        for s in self.sections:
+            span = max(s["virtual_size"], s["raw_size"])
+            if s["virtual_address"] <= rva < s["virtual_address"] + span:
+                delta = rva - s["virtual_address"]
+                return s["raw_offset"] + delta if delta < s["raw_size"] else None
+        # Headers are mapped 1:1
+        return rva if self.sections and rva < self.sections[0]["raw_offset"] else None
+
+    @cached_property
+    def entry_section(self) -> Optional[str]:
+        for s in self.sections:
+            if s["virtual_address"] <= self.entry_point < s["virtual_address"] + max(s["virtual_size"], s["raw_size"]):
+                return s["name"]
+        return None
+
+    @cached_property
+    def imports(self) -> Dict[str, List[str]]:
+        """{DLL name: [function name or "#ordinal", ...]} from the import directory."""
+        rva, size = self.data_directory(1)
+        offset = self.rva_to_offset(rva) if rva and size else None
+        if offset is None:
+            return {}
+        thunk_fmt, thunk_size, ordinal_flag = ("<Q", 8, 1 << 63) if self.is_64bit else ("<I", 4, 1 << 31)
+        imports: Dict[str, List[str]] = {}
+        total = 0
+        for d in range(MAX_IMPORTS):
+            original_thunk, _, _, name_rva, first_thunk = self._unpack("<IIIII", offset + d * 20)
+            if not (original_thunk or name_rva or first_thunk):
+                break
+            name_offset = self.rva_to_offset(name_rva)
+            if name_offset is None:
+                continue
+            dll = _cstring(self.view, name_offset)
+            functions = imports.setdefault(dll, [])
+            thunk = self.rva_to_offset(original_thunk or first_thunk)
+            while thunk is not None and total < MAX_IMPORTS:
+                (value,) = self._unpack(thunk_fmt, thunk)
+                if not value:
+                    break
+                if value & ordinal_flag:
+                    functions.append(f"#{value & 0xFFFF}")
+                else:
+                    hint_name = self.rva_to_offset(value & 0x7FFFFFFF)
+                    functions.append(_cstring(self.view, hint_name + 2) if hint_name is not None else "?")
+                total += 1
+                thunk += thunk_size
+        return imports
+
+    @cached_property
+    def signature_size(self) -> int:
+        """Size of the Authenticode certificate table (0 if unsigned)."""
+        return self.data_directory(4)[1]
+
+    def _data_end(self) -> int:
+        end = max((s["raw_offset"] + s["raw_size"] for s in self.sections if s["raw_size"]), default=0)
+        # The certificate table sits after the sections but is part of the image
+        cert_offset, cert_size = self.data_directory(4)
+        if cert_size and cert_offset >= end:
+            end = max(end, cert_offset + cert_size)
+        return end
+
+    def summary(self) -> Dict:
+        problems: List[str] = []
+        sections = self._try(self._section_list, [], problems)
+        imports = self._try(lambda: self.imports, {}, problems)
+        result = {
+            "format": self.format_name,
+            "machine": self.machine,
+            "subsystem": self.subsystem,
+            "dll": self.is_dll,
+            "timestamp": self.timestamp,
+            "image_base": f"0x{self.image_base:X}",
+            "entry_point": f"0x{self.entry_point:X}",
+            "entry_section": self._try(lambda: self.entry_section, None, problems),
+            "sections": sections,
+            "imports": imports,
+            "import_count": sum(len(f) for f in imports.values()),
+            "signed": self.signature_size > 0,
+            "overlay_offset": self._try(lambda: self.overlay_offset, None, problems),
+            "overlay_size": self._try(lambda: self.overlay_size, None, problems),
+        }
+        if problems:
+            result["problems"] = problems
+        return result
+
+
+class ELFFile(_Binary):
+    """Lazily parsed ELF object (executable, shared object, relocatable, core)."""
+
+    def __init__(self, view):
+        super().__init__(view)
+        if bytes(view[:4]) != b"\x7fELF":
+            raise ExecutableFormatError("No ELF header")
+        ei_class, ei_data = view[4], view[5]
+        if ei_class not in (1, 2) or ei_data not in (1, 2):
+            raise ExecutableFormatError("Unknown ELF class or byte order")
+        self.is_64bit = ei_class == 2
+        self.endian = "<" if ei_data == 1 else ">"
+
+    @property
+    def format_name(self) -> str:
+        return "ELF64" if self.is_64bit else "ELF32"
+
+    @cached_property
+    def _header(self) -> Tuple:
+        # e_type, e_machine, e_version, e_entry, e_phoff, e_shoff, e_flags, e_ehsize,
+        # e_phentsize, e_phnum, e_shentsize, e_shnum, e_shstrndx
+        fmt = "HHIQQQIHHHHHH" if self.is_64bit else "HHIIIIIHHHHHH"
+        return self._unpack(self.endian + fmt, 16)
+
+    @property
+    def elf_type(self) -> str:
+        return ELF_TYPES.get(self._header[0], str(self._header[0]))
+
+    @property
+    def machine(self) -> str:
+        return ELF_MACHINES.get(self._header[1], str(self._header[1]))
+
+    @property
+    def entry_point(self) -> int:
+        return self._header[3]
+
+    @cached_property
+    def _section_headers(self) -> List[Tuple]:
+        """Raw (name, type, flags, addr, offset, size, link, info, align, entsize) per section."""
+        shoff, shentsize, shnum = self._header[5], self._header[10], min(self._header[11], MAX_SECTIONS)
+        if not shoff or not shnum:
+            return []
+        fmt = self.endian + ("IIQQQQIIQQ" if self.is_64bit else "IIIIIIIIII")
+        return [self._unpack(fmt, shoff + i * shentsize) for i in range(shnum)]
+
+    @cached_property
+    def _segments(self) -> List[Tuple]:
+        """(type, offset, vaddr, filesz, memsz, flags) per program header."""
+        phoff, phentsize, phnum = self._header[4], self._header[8], min(self._header[9], MAX_SECTIONS)
+        segments = []
+        for i in range(phnum if phoff else 0):
+            at = phoff + i * phentsize
+            if self.is_64bit:
+                p_type, p_flags, p_offset, p_vaddr, _, p_filesz, p_memsz, _ = self._unpack(self.endian + "IIQQQQQQ", at)
+            else:
+                p_type, p_offset, p_vaddr, _, p_filesz, p_memsz, p_flags, _ = self._unpack(self.endian + "IIIIIIII", at)
+            segments.append((p_type, p_offset, p_vaddr, p_filesz, p_memsz, p_flags))
+        return segments
+
+    @cached_property
+    def sections(self) -> List[Dict]:
+        headers = self._section_headers
+        shstrndx = self._header[12]
+        names_at = headers[shstrndx][4] if shstrndx < len(headers) else None
+        sections = []
+        for name, sh_type, flags, addr, offset, size, _, _, _, _ in headers:
+            try:
+                section_name = _cstring(self.view, names_at + name) if names_at is not None else ""
+            except ExecutableFormatError:
+                section_name = ""
+            sections.append({
+                "name": section_name,
+                "type": sh_type,
+                "virtual_address": addr,
+                "raw_offset": offset,
+                "raw_size": 0 if sh_type == _SHT_NOBITS else size,
+                "flags": _flags(bool(flags & _SHF_ALLOC), bool(flags & _SHF_WRITE), bool(flags & _SHF_EXECINSTR)),
+            })
+        return sections
+
+    @cached_property
+    def entry_section(self) -> Optional[str]:
+        for s in self.sections:
+            if s["flags"][0] == "r" and s["virtual_address"] <= self.entry_point < s["virtual_address"] + s["raw_size"]:
+                return s["name"]
+        return None
+
+    @cached_property
+    def interpreter(self) -> Optional[str]:
+        for p_type, p_offset, _, p_filesz, _, _ in self._segments:
+            if p_type == _PT_INTERP:
+                return _cstring(self.view, p_offset, min(p_filesz, MAX_NAME_LENGTH))
+        return None
+
+    def _linked_strings(self, sh_type: int) -> Optional[Tuple[Tuple, int]]:
+        """(section header, offset of its linked string table) for the first section of `sh_type`."""
+        headers = self._section_headers
+        for header in headers:
+            if header[1] == sh_type and header[6] < len(headers):
+                return header, headers[header[6]][4]
+        return None
+
+    @cached_property
+    def needed(self) -> List[str]:
+        """Shared libraries from DT_NEEDED entries."""
+        found = self._linked_strings(_SHT_DYNAMIC)
+        if found is None:
+            return []
+        header, strtab = found
+        entry_fmt, entry_size = (self.endian + "qQ", 16) if self.is_64bit else (self.endian + "iI", 8)
+        libs = []
+        for i in range(min(header[5] // entry_size, MAX_IMPORTS)):
+            tag, value = self._unpack(entry_fmt, header[4] + i * entry_size)
+            if tag == 0:
+                break
+            if tag == _DT_NEEDED:
+                libs.append(_cstring(self.view, strtab + value))
+        return libs
+
+    @cached_property
+    def imports(self) -> List[str]:
+        """Undefined dynamic symbols (functions/objects resolved from shared libraries)."""
+        found = self._linked_strings(_SHT_DYNSYM)
+        if found is None:
+            return []
+        header, strtab = found
+        if self.is_64bit:
+            fmt, size, name_i, shndx_i = self.endian + "IBBHQQ", 24, 0, 3
+        else:
+            fmt, size, name_i, shndx_i = self.endian + "IIIBBH", 16, 0, 5
+        symbols = []
+        for i in range(1, min(header[5] // size, MAX_IMPORTS)):
+            entry = self._unpack(fmt, header[4] + i * size)
+            if entry[shndx_i] == 0 and entry[name_i]:
+                symbols.append(_cstring(self.view, strtab + entry[name_i]))
+        return symbols
+
+    def _data_end(self) -> int:
+        h = self._header
+        ends = [h[5] + h[10] * h[11] if h[5] else 0, h[4] + h[8] * h[9] if h[4] else 0]
+        ends += [s["raw_offset"] + s["raw_size"] for s in self.sections if s["raw_size"]]
+        ends += [offset + filesz for _, offset, _, filesz, _, _ in self._segments]
+        return max(ends)
+
+    def summary(self) -> Dict:
+        problems: List[str] = []
+        sections = self._try(self._section_list, [], problems)
+        imports = self._try(lambda: self.imports, [], problems)
+        result = {
+            "format": self.format_name,
+            "machine": self.machine,
+            "type": self.elf_type,
+            "endianness": "little" if self.endian == "<" else "big",
+            "entry_point": f"0x{self.entry_point:X}",
+            "entry_section": self._try(lambda: self.entry_section, None, problems),
+            "interpreter": self._try(lambda: self.interpreter, None, problems),
+            "sections": sections,
+            "needed": self._try(lambda: self.needed, [], problems),
+            "imports": imports,
+            "import_count": len(imports),
+            "overlay_offset": self._try(lambda: self.overlay_offset, None, problems),
+            "overlay_size": self._try(lambda: self.overlay_size, None, problems),
+        }
+        if problems:
+            result["problems"] = problems
+        return result
+
+
+def is_executable(header: bytes) -> bool:
+    """True if `header` starts like a PE (MZ) or ELF file."""
+    return header[:2] == b"MZ" or header[:4] == b"\x7fELF"
+
+
+def parse_executable(view) -> _Binary:
+    """PEFile or ELFFile over a bytes-like `view`. Raises ExecutableFormatError."""
+    if bytes(view[:4]) == b"\x7fELF":
+        return ELFFile(view)
+    return PEFile(view)
+
+
+def executable_summary(view) -> Optional[Dict]:
+    """inspect_executable() for content already in memory (bytes, bytearray, memoryview)."""
+    if not is_executable(bytes(view[:4])):
+        return None
+    try:
+        return parse_executable(view).summary()
+    except ExecutableFormatError as e:
+        return {"error": str(e)}
+    except (ValueError, OverflowError, IndexError, struct.error) as e:
+        # Hostile headers must not abort the analysis of the file
+        return {"error": f"Malformed headers ({type(e).__name__}: {e})"}
+
+
+def inspect_executable(filepath: Union[str, Path]) -> Optional[Dict]:
+    """
+    Structure summary of a PE/ELF file (format, machine, entry point, sections with
+    entropy, imports, overlay), None if it is neither, or {"error": ...} if the headers
+    are malformed.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    return executable_summary(view)
+                finally:
+                    view.release()
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,207 @@
+"""
+Streaming exporters for analysis results.
+Each exporter writes records as they arrive (one CSV header, one NDJSON line or one
+buffered Parquet row per result) and flushes periodically, so memory stays constant
+no matter how many files a run covers.
+"""
+
+import abc
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, TextIO, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+    pq = None
+
+# Flat columns of the CSV / Parquet exports
+CSV_FIELDS = [
+    "filepath", "file_size", "detected_type", "file_extension", "md5", "sha1", "sha256", "entropy", "mismatch",
+    "file_cmd_output",
+]
+
+# Columns of the single-result CSV written by identifier.export_to_csv (kept as they were)
+SINGLE_CSV_FIELDS = [
+    "filepath", "file_size", "detected_type", "file_extension", "md5", "sha256", "entropy", "mismatch", "file_cmd_output",
+]
+
+# Flush text output after this many records or seconds, whichever comes first
+FLUSH_RECORDS = 256
+FLUSH_SECONDS = 1.0
+
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP = 8192
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+PARQUET_MISSING = "Parquet export needs pyarrow (pip install pyarrow)"
+
+
+class Exporter(abc.ABC):
+    """Base class: `write()` one result at a time, `close()` when done."""
+
+    def __init__(self, out, flush_records: int = FLUSH_RECORDS, flush_seconds: float = FLUSH_SECONDS):
+        self.out = out
+        self.count = 0
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, record: Dict) -> None:
+        self._write(record)
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_records or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    @abc.abstractmethod
+    def _write(self, record: Dict) -> None:
+        """Write one record to `out` (flushing is handled by write())."""
+
+    def flush(self) -> None:
+        self.out.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Flush buffered records (the underlying file is left open)."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class NdjsonExporter(Exporter):
+    """One JSON object per line, with every field of the result."""
+
+    def _write(self, record: Dict) -> None:
+        self.out.write(json.dumps(record, ensure_ascii=False, default=str))
+        self.out.write("\n")
+
+
+class CsvExporter(Exporter):
+    """CSV_FIELDS plus `error` (or the given `fields`), with the header written once."""
+
+    def __init__(self, out: TextIO, fields: Optional[List[str]] = None, **kwargs):
+        super().__init__(out, **kwargs)
+        self._csv = csv.DictWriter(out, fieldnames=fields or CSV_FIELDS + ["error"], extrasaction="ignore")
+        self._csv.writeheader()
+
+    def _write(self, record: Dict) -> None:
+        self._csv.writerow(record)
+
+
+class ParquetExporter(Exporter):
+    """
+    Parquet file with the CSV columns plus `error` and the full result as JSON (`record`).
+    Rows are buffered into row groups of PARQUET_ROW_GROUP; flush() does not cut a group
+    short, so the file is only complete after close().
+    """
+
+    def __init__(self, out: BinaryIO, row_group_size: int = PARQUET_ROW_GROUP, **kwargs):
+        if pa is None:
+            raise ValueError(PARQUET_MISSING)
+        super().__init__(out, **kwargs)
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([
+            ("filepath", pa.string()),
+            ("file_size", pa.int64()),
+            ("detected_type", pa.string()),
+            ("file_extension", pa.string()),
+            ("md5", pa.string()),
+            ("sha1", pa.string()),
+            ("sha256", pa.string()),
+            ("entropy", pa.float64()),
+            ("mismatch", pa.bool_()),
+            ("file_cmd_output", pa.string()),
+            ("error", pa.string()),
+            ("record", pa.string()),
+        ])
+        self._columns: Dict[str, List] = {name: [] for name in self.schema.names}
+        self._writer = pq.ParquetWriter(out, self.schema)
+
+    def _write(self, record: Dict) -> None:
+        for name, values in self._columns.items():
+            if name == "record":
+                values.append(json.dumps(record, ensure_ascii=False, default=str))
+            elif name == "mismatch":
+                values.append(bool(record.get("mismatch")))
+            else:
+                values.append(record.get(name))
+        if len(self._columns["filepath"]) >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self) -> None:
+        if not self._columns["filepath"]:
+            return
+        self._writer.write_table(pa.table(self._columns, schema=self.schema))
+        for values in self._columns.values():
+            values.clear()
+
+    def flush(self) -> None:
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self._write_row_group()
+        self._writer.close()
+
+
+def open_exporter(out, output_format: str = "ndjson", **kwargs) -> Exporter:
+    """
+    Exporter for `output_format` ("ndjson", "csv" or "parquet") writing to `out`
+    (a text stream; a binary stream for parquet).
+    """
+    if output_format == "ndjson":
+        return NdjsonExporter(out, **kwargs)
+    if output_format == "csv":
+        return CsvExporter(out, **kwargs)
+    if output_format == "parquet":
+        return ParquetExporter(out, **kwargs)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def open_output(path: Optional[Union[str, Path]], output_format: str, mode: str = "w"):
+    """File object suited to `output_format` for `path` (None: stdout). Caller closes it unless stdout."""
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format == "parquet":
+        if pa is None:
+            raise ValueError(PARQUET_MISSING)
+        if path is None:
+            return sys.stdout.buffer
+        return open(path, mode + "b")
+    if path is None:
+        return sys.stdout
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def export_results(
+    results: Iterable[Dict],
+    output_path: Optional[Union[str, Path]],
+    output_format: str = "ndjson",
+    **kwargs,
+) -> int:
+    """
+    Stream `results` (any iterable, e.g. a generator) to `output_path` (None: stdout,
+    which is left open). `kwargs` go to the exporter. Returns the record count.
+    """
+    out = open_output(output_path, output_format)
+    try:
+        with open_exporter(out, output_format, **kwargs) as exporter:
+            for result in results:
+                exporter.write(result)
+        return exporter.count
+    finally:
+        if output_path is not None:
+            out.close()
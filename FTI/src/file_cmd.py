@@ -0,0 +1,242 @@
+"""
+Backends for the system `file` command.
+Forking `file -b` per file dominates bulk scans, so by default a single long-lived
+`file -b -n -f -` process is fed paths over a pipe and answers are read back one line
+per path. An in-process libmagic binding (python-magic) is used instead when
+installed; it also describes in-memory buffers without a fork. The original per-call
+subprocess remains as fallback (and describes buffers for the batch backend).
+
+Select a backend with FTI_FILE_BACKEND=auto|libmagic|batch|subprocess (default: auto).
+"""
+
+import atexit
+import os
+import select
+import subprocess
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+# Seconds to wait for `file` to answer for one path (same as the per-call timeout)
+FILE_CMD_TIMEOUT = 5
+
+
+class SubprocessFileCommand:
+    """Original behaviour: one `file -b <path>` subprocess per call."""
+
+    name = "subprocess"
+
+    def describe(self, filepath: Union[str, Path]) -> Optional[str]:
+        try:
+            r = subprocess.run(
+                ["file", "-b", str(filepath)],
+                capture_output=True,
+                text=True,
+                timeout=FILE_CMD_TIMEOUT,
+            )
+            if r.returncode == 0 and r.stdout:
+                return r.stdout.strip()
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            pass
+        return None
+
+    def describe_buffer(self, data: bytes) -> Optional[str]:
+        """`file -b -` on in-memory content (fed over stdin)."""
+        try:
+            r = subprocess.run(
+                ["file", "-b", "-"],
+                input=data,
+                capture_output=True,
+                timeout=FILE_CMD_TIMEOUT,
+            )
+            if r.returncode == 0 and r.stdout:
+                return r.stdout.decode("utf-8", errors="replace").strip()
+        except (FileNotFoundError, subprocess.TimeoutExpired, OSError):
+            pass
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class BatchFileCommand:
+    """
+    One long-lived `file -b -n -f -` process. Paths are written to its stdin and
+    answers read from stdout in order, so each request maps to exactly one line.
+    The process is restarted after a timeout or crash; paths containing a newline
+    (which would desynchronise the protocol) go through the per-call fallback, as do
+    in-memory buffers (the -f protocol only takes paths).
+    """
+
+    name = "batch"
+
+    def __init__(self):
+        self._proc: Optional[subprocess.Popen] = None
+        self._buf = bytearray()
+        self._lock = threading.Lock()
+        self._fallback = SubprocessFileCommand()
+
+    def _start(self) -> subprocess.Popen:
+        self._buf.clear()
+        self._proc = subprocess.Popen(
+            ["file", "-b", "-n", "-f", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        return self._proc
+
+    def _readline(self, fd: int, timeout: float) -> Optional[bytes]:
+        """Read one line from `fd` within `timeout` seconds; None on timeout/EOF."""
+        while b"\n" not in self._buf:
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if not ready:
+                return None
+            data = os.read(fd, 65536)
+            if not data:
+                return None
+            self._buf += data
+        idx = self._buf.index(b"\n")
+        line = bytes(self._buf[:idx])
+        del self._buf[: idx + 1]
+        return line
+
+    def describe(self, filepath: Union[str, Path]) -> Optional[str]:
+        path = os.fsencode(str(filepath))
+        if b"\n" in path:
+            return self._fallback.describe(filepath)
+        with self._lock:
+            proc = self._proc
+            if proc is None or proc.poll() is not None:
+                proc = self._start()
+            try:
+                proc.stdin.write(path + b"\n")
+                line = self._readline(proc.stdout.fileno(), FILE_CMD_TIMEOUT)
+            except (OSError, ValueError):
+                line = None
+            if line is None:
+                # Timed out or died: the next answer can't be trusted, start over
+                self._kill()
+                return None
+        out = line.decode("utf-8", errors="replace").strip()
+        return out or None
+
+    def describe_buffer(self, data: bytes) -> Optional[str]:
+        # The -f protocol only takes paths; buffers go through a one-off process
+        return self._fallback.describe_buffer(data)
+
+    def _kill(self) -> None:
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self._proc = None
+        self._buf.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=1)
+                except (OSError, subprocess.TimeoutExpired):
+                    self._kill()
+            self._proc = None
+
+
+class LibmagicFileCommand:
+    """In-process libmagic via python-magic (no fork at all)."""
+
+    name = "libmagic"
+
+    def __init__(self):
+        import magic  # optional dependency
+        self._magic = magic.Magic()
+        self._lock = threading.Lock()  # a libmagic cookie is not thread-safe
+
+    def describe(self, filepath: Union[str, Path]) -> Optional[str]:
+        try:
+            with self._lock:
+                out = self._magic.from_file(str(filepath))
+        except Exception:
+            return None
+        return out.strip() if out else None
+
+    def describe_buffer(self, data: bytes) -> Optional[str]:
+        try:
+            with self._lock:
+                out = self._magic.from_buffer(data)
+        except Exception:
+            return None
+        return out.strip() if out else None
+
+    def close(self) -> None:
+        pass
+
+
+def _file_available() -> bool:
+    try:
+        r = subprocess.run(["file", "--version"], capture_output=True, timeout=FILE_CMD_TIMEOUT)
+        return r.returncode == 0
+    except (FileNotFoundError, subprocess.TimeoutExpired, OSError):
+        return False
+
+
+def create_backend(name: str = "auto"):
+    """
+    Create a `file` backend by name. 'auto' prefers libmagic, then the batched
+    process, then the per-call subprocess. Returns None if no backend is usable.
+    """
+    if name in ("auto", "libmagic"):
+        try:
+            return LibmagicFileCommand()
+        except Exception:
+            if name == "libmagic":
+                return None
+    if name in ("auto", "batch") and _file_available():
+        if hasattr(select, "select") and os.name == "posix":
+            return BatchFileCommand()
+        return SubprocessFileCommand()
+    if name == "subprocess":
+        return SubprocessFileCommand()
+    return None
+
+
+_backend = None
+_backend_pid: Optional[int] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Process-wide default backend (recreated after fork so workers get their own pipe)."""
+    global _backend, _backend_pid
+    with _backend_lock:
+        if _backend is None or _backend_pid != os.getpid():
+            _backend = create_backend(os.getenv("FTI_FILE_BACKEND", "auto"))
+            _backend_pid = os.getpid()
+        return _backend
+
+
+def describe_file(filepath: Union[str, Path]) -> Optional[str]:
+    """One-line `file` description of `filepath` using the default backend, or None."""
+    backend = get_backend()
+    if backend is None:
+        return None
+    return backend.describe(filepath)
+
+
+def describe_buffer(data: bytes) -> Optional[str]:
+    """One-line `file` description of in-memory content (e.g. an upload prefix), or None."""
+    backend = get_backend()
+    if backend is None:
+        return None
+    return backend.describe_buffer(data)
+
+
+@atexit.register
+def _close_backend() -> None:
+    if _backend is not None and _backend_pid == os.getpid():
+        _backend.close()
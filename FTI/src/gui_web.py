@@ -3,17 +3,18 @@
 Web-based GUI for File Type Identifier.
 """
 
-import cgi
 import html
 import http.server
-import io
+import json
 import os
 import re
 import shutil
 import socketserver
-import tempfile
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
 
 import sys
 from pathlib import Path
@@ -45,9 +46,91 @@ except ImportError:
 
 # Use absolute imports when run as script, relative when imported as package
 try:
-    from .identifier import identify
+    from .identifier import identify_bytes, identify_fileobj
+    from .hashing import normalize_algorithms
+    from .multipart import MultipartReader, get_boundary
 except ImportError:
-    from identifier import identify
+    from identifier import identify_bytes, identify_fileobj
+    from hashing import normalize_algorithms
+    from multipart import MultipartReader, get_boundary
+
+# Upload limiet; uploads worden gestreamd geanalyseerd, dus dit kan ruim boven het geheugen liggen
+MAX_UPLOAD_BYTES = int(os.getenv("FTI_MAX_UPLOAD_MB", "4096")) * 1024 * 1024
+
+# Socket timeout (seconden) per read; een stilgevallen upload houdt de server niet vast
+UPLOAD_READ_TIMEOUT = 60
+
+
+def _size_label(size: int) -> str:
+    """Upload limiet als leesbare tekst (bijv. 4GB, 512MB)."""
+    gb = 1024 * 1024 * 1024
+    if size >= gb and size % gb == 0:
+        return f"{size // gb}GB"
+    return f"{size // (1024 * 1024)}MB"
+
+
+MAX_UPLOAD_LABEL = _size_label(MAX_UPLOAD_BYTES)
+
+# Maximaal aantal seconden wachten op VirusTotal quota; daarna komt de hash in de
+# achtergrond wachtrij en toont de GUI "in wachtrij"
+VT_MAX_WAIT = 10
+
+# JSON API: aantal analyse-workers (gedeeld door alle requests)
+API_WORKERS = int(os.getenv("FTI_WEB_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+# Bestanden tot deze grootte worden gebufferd en door de pool geanalyseerd;
+# grotere worden direct tijdens de upload geanalyseerd (constant geheugen)
+API_SPOOL_BYTES = 64 * 1024 * 1024
+
+# Maximaal aantal gebufferde bytes dat nog op een worker wacht, over alle requests samen
+API_MAX_PENDING_BYTES = 256 * 1024 * 1024
+
+# Seconden dat een request op ruimte in dat budget wacht; daarna 503
+API_PENDING_WAIT = 30
+
+# Maximaal aantal bestanden per API request
+API_MAX_FILES = 1000
+
+_api_pool = None
+_api_pool_lock = threading.Lock()
+
+
+class ServerBusyError(Exception):
+    """Het gedeelde buffer budget bleef te lang vol (wordt een 503 response)."""
+
+
+class _ByteBudget:
+    """Procesbreed budget voor gebufferde upload bytes; gedeeld door alle request threads."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n: int, timeout: float) -> bool:
+        """Reserveer `n` bytes; False als er binnen `timeout` seconden geen ruimte komt."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.used + n <= self.limit, timeout):
+                return False
+            self.used += n
+            return True
+
+    def release(self, n: int) -> None:
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+
+_api_budget = _ByteBudget(API_MAX_PENDING_BYTES)
+
+
+def _analysis_pool() -> ThreadPoolExecutor:
+    """Gedeelde worker pool voor de JSON API (lazy aangemaakt)."""
+    global _api_pool
+    with _api_pool_lock:
+        if _api_pool is None:
+            _api_pool = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="fti-api")
+        return _api_pool
 
 # HTML template met alle styling en JavaScript
 PAGE_HTML = """<!DOCTYPE html>
@@ -537,10 +620,10 @@ PAGE_HTML = """<!DOCTYPE html>
     <div class="card">
       <form method="post" action="/" enctype="multipart/form-data" id="form">
         <div class="dropzone" id="dropzone">
-          <input type="file" name="file" id="file" class="file-input" accept="*" aria-label="Bestand kiezen" data-max-size="26214400">
+          <input type="file" name="file" id="file" class="file-input" accept="*" aria-label="Bestand kiezen" data-max-size="{max_upload_bytes}">
           <div class="dropzone-inner">
             <div class="icon">📁</div>
-            <div class="hint" id="hint" data-nl="Sleep een bestand hierheen of klik om te kiezen" data-en="Drag a file here or click to choose">Sleep een bestand hierheen of klik om te kiezen<br><small style="color:#71717a;" id="maxSizeHint" data-nl="Maximaal 25MB" data-en="Maximum 25MB">Maximaal 25MB</small></div>
+            <div class="hint" id="hint" data-nl="Sleep een bestand hierheen of klik om te kiezen" data-en="Drag a file here or click to choose">Sleep een bestand hierheen of klik om te kiezen<br><small style="color:#71717a;" id="maxSizeHint" data-nl="Maximaal {max_upload_label}" data-en="Maximum {max_upload_label}">Maximaal {max_upload_label}</small></div>
             <div class="filename" id="filename" style="display:none;"></div>
             <span class="btn btn-upload" id="btnUpload" data-nl="Kies bestand" data-en="Choose file">Kies bestand</span>
           </div>
@@ -549,7 +632,7 @@ PAGE_HTML = """<!DOCTYPE html>
       </form>
       <p class="no-file-msg" id="noFileMsg" style="display:none;" data-nl="Selecteer eerst een bestand." data-en="Please select a file first.">Selecteer eerst een bestand.</p>
       <div class="info-box">
-        <strong id="uploadLimitLabel" data-nl="📋 Upload limiet:" data-en="📋 Upload limit:">📋 Upload limiet:</strong> <span id="uploadLimitText" data-nl="Maximaal 25MB per bestand." data-en="Maximum 25MB per file.">Maximaal 25MB per bestand.</span><br>
+        <strong id="uploadLimitLabel" data-nl="📋 Upload limiet:" data-en="📋 Upload limit:">📋 Upload limiet:</strong> <span id="uploadLimitText" data-nl="Maximaal {max_upload_label} per bestand." data-en="Maximum {max_upload_label} per file.">Maximaal {max_upload_label} per bestand.</span><br>
         <span id="cliLabel" data-nl="Voor grotere bestanden gebruik de CLI:" data-en="For larger files use the CLI:">Voor grotere bestanden gebruik de CLI:</span> <code>python3 main.py &lt;bestand&gt;</code>
       </div>
       {result_block}
@@ -632,7 +715,7 @@ PAGE_HTML = """<!DOCTYPE html>
     var hint = document.getElementById('hint');
     var filenameEl = document.getElementById('filename');
     var noFileMsg = document.getElementById('noFileMsg');
-    var maxSize = parseInt(fileInput.getAttribute('data-max-size')) || 26214400; // 25MB default
+    var maxSize = parseInt(fileInput.getAttribute('data-max-size')) || {max_upload_bytes};
     function flashDropzoneError() {{
       dropzone.classList.add('error-flash');
       setTimeout(function() {{
@@ -796,99 +879,153 @@ PAGE_HTML = """<!DOCTYPE html>
 """
 
 
-def parse_multipart(handler: http.server.BaseHTTPRequestHandler):
-    """Parse multipart/form-data; retourneer (bestandsinhoud als bytes, bestandsnaam)."""
-    ctype = handler.headers.get("Content-Type", "")
-    if not ctype.startswith("multipart/form-data"):
-        return None, None
+def _upload_filename(part) -> str:
+    """Bestandsnaam van een upload; browsers sturen meestal alleen de naam, maar strip eventuele paden."""
+    return part.filename.replace("\\", "/").rsplit("/", 1)[-1] or "upload"
+
+
+def analyze_upload(handler: http.server.BaseHTTPRequestHandler):
+    """
+    Lees multipart/form-data gestreamd van de socket en analyseer het "file" veld terwijl
+    het binnenkomt (geen buffer van de hele body, geen temp file).
+    Retourneert het resultaat van identify_fileobj(), of None als er geen bestand is.
+    """
+    boundary = get_boundary(handler.headers.get("Content-Type", ""))
+    if boundary is None:
+        return None
     try:
         content_length = int(handler.headers.get("Content-Length", 0))
     except ValueError:
-        return None, None
+        return None
     if content_length <= 0:
-        return None, None
-    
-    # Veiligheid: limiet op upload grootte (max 25MB)
-    max_upload = 25 * 1024 * 1024
-    if content_length > max_upload:
-        raise ValueError(f"Bestand te groot ({content_length / (1024*1024):.1f} MB > 25MB). Gebruik de CLI: python3 main.py <bestand>")
-    
+        return None
+
+    reader = MultipartReader(handler.rfile, boundary, content_length, max_bytes=MAX_UPLOAD_BYTES)
+    result = None
+    for part in reader:
+        if part.name == "file" and part.filename:
+            result = identify_fileobj(
+                part,
+                filename=_upload_filename(part),
+                use_file_cmd=True,
+                virustotal_api_key=VIRUSTOTAL_API_KEY,
+                vt_max_wait=VT_MAX_WAIT,
+            )
+            break
+    if result is not None and "error" in result:
+        # Lezen van de socket mislukt; de verbinding is niet meer bruikbaar
+        handler.close_connection = True
+    else:
+        reader.discard_rest()
+    return result
+
+
+class _ChainedReader:
+    """Leest eerst een al gelezen begin, daarna de rest van een multipart part."""
+
+    def __init__(self, head: bytes, rest):
+        self._head = head
+        self._rest = rest
+
+    def read(self, size: int = -1) -> bytes:
+        if self._head:
+            head, self._head = self._head, b""
+            return head
+        return self._rest.read(size)
+
+
+def _api_options(query: str) -> dict:
+    """
+    Opties uit de query string: ?file_cmd=0, ?vt=0, ?hash=md5,sha256, ?entropy_blocks=1.
+    Raises ValueError bij onbekende hash algoritmes.
+    """
+    params = parse_qs(query)
+
+    def flag(name: str, default: bool) -> bool:
+        values = params.get(name)
+        if not values:
+            return default
+        return values[-1].strip().lower() not in ("0", "false", "no", "off")
+
+    hashes = params.get("hash")
+    return {
+        "use_file_cmd": flag("file_cmd", True),
+        "virustotal_api_key": VIRUSTOTAL_API_KEY if flag("vt", True) else None,
+        "hash_algorithms": normalize_algorithms(hashes[-1].split(",")) if hashes else None,
+        "entropy_blocks": flag("entropy_blocks", False),
+        "vt_max_wait": VT_MAX_WAIT,
+    }
+
+
+def api_identify(handler: http.server.BaseHTTPRequestHandler, options: dict) -> list:
+    """
+    Analyseer alle bestanden in een multipart request (elk veld met een bestandsnaam).
+    Kleine bestanden gaan parallel door de worker pool; grote worden gestreamd in de
+    request thread geanalyseerd. Retourneert de resultaten in upload volgorde.
+    Raises ValueError bij een ongeldige body of te veel/te grote bestanden, en
+    ServerBusyError als het gedeelde buffer budget te lang vol blijft.
+    """
+    boundary = get_boundary(handler.headers.get("Content-Type", ""))
+    if boundary is None:
+        raise ValueError("Content-Type moet multipart/form-data zijn")
     try:
-        # Lees body in chunks met timeout check
-        body_parts = []
-        remaining = content_length
-        chunk_size = 2 * 1024 * 1024  # 2MB chunks
-        max_read_time = 30  # Max 30 seconden lezen
-        start_time = time.time()
-        bytes_read = 0
-        
-        while remaining > 0:
-            # Timeout check
-            if time.time() - start_time > max_read_time:
-                raise ValueError("Timeout bij lezen bestand (te groot of te traag)")
-            
-            chunk = handler.rfile.read(min(chunk_size, remaining))
-            if not chunk:
-                break
-            body_parts.append(chunk)
-            remaining -= len(chunk)
-            bytes_read += len(chunk)
-            
-            # Veiligheid: stop als we te veel hebben gelezen
-            if bytes_read > max_upload:
-                raise ValueError(f"Bestand te groot (>{max_upload / (1024*1024):.0f}MB)")
-        
-        body = b"".join(body_parts)
+        content_length = int(handler.headers.get("Content-Length", 0))
     except ValueError:
-        raise  # Her-raise ValueError
-    except (OSError, ConnectionError, MemoryError):
-        return None, None
-    except Exception:
-        return None, None
-    
-    if len(body) != content_length:
-        return None, None
-    
-    env = {
-        "REQUEST_METHOD": "POST",
-        "CONTENT_TYPE": ctype,
-        "CONTENT_LENGTH": str(content_length),
-    }
+        raise ValueError("Ongeldige Content-Length")
+
+    pool = _analysis_pool()
+    reader = MultipartReader(handler.rfile, boundary, content_length, max_bytes=MAX_UPLOAD_BYTES)
+    entries = []  # (veldnaam, bestandsnaam, future of resultaat)
     try:
-        fs = cgi.FieldStorage(
-            fp=io.BytesIO(body),
-            environ=env,
-            keep_blank_values=True,
-        )
-        if "file" not in fs:
-            return None, None
-        field = fs["file"]
-        if isinstance(field, list):
-            field = field[0] if field else None
-        if field is None:
-            return None, None
-        filename = getattr(field, "filename", None) or "upload"
-        # Lees inhoud direct nu (field.file kan daarna gesloten worden door cgi)
-        if getattr(field, "file", None):
-            f = field.file
-            try:
-                content = f.read()
-            except (OSError, ValueError):
-                return None, None
-        elif isinstance(field, bytes):
-            content = field
-        elif isinstance(field, str):
-            content = field.encode("utf-8")
-        else:
-            val = getattr(field, "value", None)
-            if isinstance(val, bytes):
-                content = val
+        for part in reader:
+            if not part.filename:
+                continue
+            if len(entries) >= API_MAX_FILES:
+                raise ValueError(f"Te veel bestanden (maximaal {API_MAX_FILES} per request)")
+            filename = _upload_filename(part)
+            head = part.read(API_SPOOL_BYTES + 1)
+            if len(head) <= API_SPOOL_BYTES:
+                # Wacht tot er weer ruimte is (ook door andere requests vrijgegeven)
+                size = len(head)
+                if not _api_budget.acquire(size, API_PENDING_WAIT):
+                    raise ServerBusyError("Server is bezet, probeer het later opnieuw")
+                try:
+                    fut = pool.submit(identify_bytes, head, filename=filename, **options)
+                except BaseException:
+                    _api_budget.release(size)
+                    raise
+                fut.add_done_callback(lambda f, size=size: _api_budget.release(size))
+                entries.append((part.name, filename, fut))
             else:
-                return None, None
-        return content, filename
+                result = identify_fileobj(_ChainedReader(head, part), filename=filename, **options)
+                entries.append((part.name, filename, result))
     except Exception:
-        return None, None
-    return None, None
+        for _, _, item in entries:
+            if hasattr(item, "cancel"):
+                item.cancel()
+        raise
+
+    results = []
+    for index, (field, filename, item) in enumerate(entries):
+        if hasattr(item, "result"):
+            try:
+                result = item.result()
+            except Exception as e:  # één misgaand bestand mag de andere resultaten niet kosten
+                result = {"error": f"{type(e).__name__}: {e}", "filepath": filename}
+        else:
+            result = item
+        results.append(dict(result, index=index, field=field))
+    return results
+
+
+def render_page(result_block: str = "", export_block: str = "") -> str:
+    """Vul de HTML template in."""
+    return PAGE_HTML.format(
+        result_block=result_block,
+        export_block=export_block,
+        max_upload_bytes=MAX_UPLOAD_BYTES,
+        max_upload_label=MAX_UPLOAD_LABEL,
+    )
 
 
 def render_result(data: dict) -> tuple:
@@ -911,6 +1048,7 @@ def render_result(data: dict) -> tuple:
         "Bestandsextensie": {"nl": "Bestandsextensie", "en": "File extension"},
         "file-commando": {"nl": "file-commando", "en": "file command"},
         "MD5": {"nl": "MD5", "en": "MD5"},
+        "SHA1": {"nl": "SHA1", "en": "SHA1"},
         "SHA256": {"nl": "SHA256", "en": "SHA256"},
         "Entropy": {"nl": "Entropy", "en": "Entropy"},
         "VirusTotal": {"nl": "VirusTotal", "en": "VirusTotal"},
@@ -927,6 +1065,8 @@ def render_result(data: dict) -> tuple:
         rows.append(("file-commando", data["file_cmd_output"], labels["file-commando"]))
     if data.get("md5"):
         rows.append(("MD5", data["md5"], labels["MD5"]))
+    if data.get("sha1"):
+        rows.append(("SHA1", data["sha1"], labels["SHA1"]))
     if data.get("sha256"):
         rows.append(("SHA256", data["sha256"], labels["SHA256"]))
     if data.get("entropy") is not None:
@@ -944,6 +1084,8 @@ def render_result(data: dict) -> tuple:
             rows.append(("VirusTotal", f'<span style="color: #f59e0b;" data-nl="{error_nl}" data-en="{error_en}">{error_nl}</span>', labels["VirusTotal"]))
         elif vt_result.get("status") == "not_found":
             rows.append(("VirusTotal", '<span style="color: #71717a;" data-nl="Niet gevonden in database" data-en="Not found in database">Niet gevonden in database</span>', labels["VirusTotal"]))
+        elif vt_result.get("status") == "queued":
+            rows.append(("VirusTotal", '<span style="color: #71717a;" data-nl="In wachtrij (API limiet bereikt), probeer het later opnieuw" data-en="Queued (API rate limit reached), try again later">In wachtrij (API limiet bereikt), probeer het later opnieuw</span>', labels["VirusTotal"]))
         else:
             detected = vt_result.get("detected", 0)
             total = vt_result.get("total", 0)
@@ -988,7 +1130,7 @@ def render_result(data: dict) -> tuple:
             check_icon_attr = check_icon_svg.replace('"', '&quot;')
             copy_button = f'<span class="hash-container"><span class="{cell_class}">{raw_value_escaped}</span><button class="copy-btn" onclick="copyToClipboard(\'{raw_value_js}\', this)" title="Kopieer" data-icon="{copy_icon_attr}" data-check="{check_icon_attr}">{copy_icon_svg}</button></span>'
             value_display = copy_button
-        elif label in ("MD5", "SHA256"):
+        elif label in ("MD5", "SHA1", "SHA256"):
             cell_class = " result-hash"
             # Voeg copy button toe
             hash_value = str(value)
@@ -1051,19 +1193,28 @@ def render_result(data: dict) -> tuple:
 
 
 class Handler(http.server.SimpleHTTPRequestHandler):
+    timeout = UPLOAD_READ_TIMEOUT
+
     def do_GET(self) -> None:
         """Handle GET requests."""
-        if self.path == "/" or self.path == "/index.html":
+        if urlsplit(self.path).path == "/api/identify":
+            self._send_json(405, {"error": "Gebruik POST met multipart/form-data"})
+        elif self.path == "/" or self.path == "/index.html":
             self.send_response(200)
             self.send_header("Content-type", "text/html; charset=utf-8")
             self.end_headers()
-            html_out = PAGE_HTML.format(result_block="", export_block="")
+            html_out = render_page()
             self.wfile.write(html_out.encode("utf-8"))
         else:
             super().do_GET()
     
     def do_POST(self) -> None:
         """Handle POST requests with error recovery."""
+        url = urlsplit(self.path)
+        if url.path == "/api/identify":
+            self._api_identify(url.query)
+            return
+
         result_block = ""
         export_block = ""
         
@@ -1075,28 +1226,32 @@ class Handler(http.server.SimpleHTTPRequestHandler):
             except (ValueError, TypeError):
                 content_length = 0
             
-            max_upload = 25 * 1024 * 1024  # 25MB
-            if content_length > max_upload:
+            if content_length > MAX_UPLOAD_BYTES:
                 result_block = (
                     '<div class="result-wrap"><div class="result-title" data-nl="Resultaat" data-en="Result">Resultaat</div>'
-                    f'<div class="result error">Bestand te groot ({content_length / (1024*1024):.1f} MB > 25MB). '
+                    f'<div class="result error">Bestand te groot ({content_length / (1024*1024):.1f} MB > {MAX_UPLOAD_LABEL}). '
                     'Gebruik de CLI voor grote bestanden:<br><code style="background:#27272a;padding:0.25rem 0.5rem;border-radius:4px;">python3 main.py &lt;bestand&gt;</code></div></div>'
                 )
+                # Body niet gelezen: verbinding sluiten na het antwoord
+                self.close_connection = True
                 self._send_response(result_block, "")
                 return
             
-            # Parse multipart (kan crashen bij grote bestanden)
+            # Upload gestreamd parsen en analyseren
             try:
-                file_content, orig_name = parse_multipart(self)
+                result = analyze_upload(self)
             except ValueError as e:
-                # Bestand te groot tijdens parsing
+                # Ongeldige multipart body of bestand te groot
+                self.close_connection = True
                 result_block = (
                     '<div class="result-wrap"><div class="result-title" data-nl="Resultaat" data-en="Result">Resultaat</div>'
                     f'<div class="result error">{html.escape(str(e))}</div></div>'
                 )
                 self._send_response(result_block, "")
                 return
-            except Exception as e:
+            except OSError as e:
+                # Verbinding verbroken of timeout tijdens upload
+                self.close_connection = True
                 result_block = (
                     '<div class="result-wrap"><div class="result-title" data-nl="Resultaat" data-en="Result">Resultaat</div>'
                     f'<div class="result error">Fout bij lezen bestand: {html.escape(str(e))}</div></div>'
@@ -1104,24 +1259,8 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                 self._send_response(result_block, "")
                 return
             
-            if file_content and orig_name:
-                # Schrijf naar temp file voor analyse
-                tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=Path(orig_name).suffix)
-                tmp_path = tmp_file.name
-                try:
-                    tmp_file.write(file_content)
-                    tmp_file.close()
-                    
-                    # Analyseer bestand
-                    result = identify(tmp_path, use_file_cmd=True, virustotal_api_key=VIRUSTOTAL_API_KEY)
-                    result_block, export_block = render_result(result)
-                finally:
-                    # Ruim temp file op
-                    if os.path.exists(tmp_path):
-                        try:
-                            os.unlink(tmp_path)
-                        except OSError:
-                            pass
+            if result is not None:
+                result_block, export_block = render_result(result)
             else:
                 result_block = '<div class="result-wrap"><div class="result-title" data-nl="Resultaat" data-en="Result">Resultaat</div><div class="result error" data-nl="Geen bestand ontvangen. Kies een bestand en klik op Analyseren." data-en="No file received. Please select a file and click Analyze.">Geen bestand ontvangen. Kies een bestand en klik op Analyseren.</div></div>'
         except ValueError as e:
@@ -1141,7 +1280,7 @@ class Handler(http.server.SimpleHTTPRequestHandler):
         except MemoryError:
             result_block = (
                 '<div class="result-wrap"><div class="result-title" data-nl="Resultaat" data-en="Result">Resultaat</div>'
-                '<div class="result error" data-nl="Onvoldoende geheugen. Het bestand is te groot om te verwerken. Probeer een kleiner bestand (&lt;25MB) of gebruik de CLI." data-en="Insufficient memory. The file is too large to process. Try a smaller file (&lt;25MB) or use the CLI.">Onvoldoende geheugen. Het bestand is te groot om te verwerken. Probeer een kleiner bestand (&lt;25MB) of gebruik de CLI.</div></div>'
+                '<div class="result error" data-nl="Onvoldoende geheugen. Het bestand is te groot om te verwerken. Gebruik de CLI." data-en="Insufficient memory. The file is too large to process. Use the CLI.">Onvoldoende geheugen. Het bestand is te groot om te verwerken. Gebruik de CLI.</div></div>'
             )
             export_block = ""
         except Exception as e:
@@ -1156,13 +1295,59 @@ class Handler(http.server.SimpleHTTPRequestHandler):
         # Stuur altijd een response
         self._send_response(result_block, export_block)
     
+    def _api_identify(self, query: str) -> None:
+        """POST /api/identify: meerdere bestanden per request, JSON resultaat per bestand."""
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+        except (ValueError, TypeError):
+            content_length = 0
+        if content_length > MAX_UPLOAD_BYTES:
+            self.close_connection = True
+            self._send_json(413, {"error": f"Request te groot (> {MAX_UPLOAD_LABEL})"})
+            return
+        try:
+            results = api_identify(self, _api_options(query))
+        except ServerBusyError as e:
+            self.close_connection = True
+            self._send_json(503, {"error": str(e)}, {"Retry-After": str(API_PENDING_WAIT)})
+            return
+        except ValueError as e:
+            self.close_connection = True
+            self._send_json(400, {"error": str(e)})
+            return
+        except OSError as e:
+            self.close_connection = True
+            self._send_json(400, {"error": f"Fout bij lezen upload: {e}"})
+            return
+        except Exception as e:
+            self.close_connection = True
+            self._send_json(500, {"error": f"Server fout: {type(e).__name__}: {e}"})
+            return
+        errors = sum(1 for r in results if "error" in r)
+        self._send_json(200, {"count": len(results), "errors": errors, "results": results})
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        """Stuur een JSON response (met eventuele extra headers)."""
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        try:
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            self.wfile.flush()
+        except OSError:
+            pass  # Client is al weg
+
     def _send_response(self, result_block: str, export_block: str) -> None:
         """Helper om altijd een response te sturen, zelfs bij errors."""
         try:
             self.send_response(200)
             self.send_header("Content-type", "text/html; charset=utf-8")
             self.end_headers()
-            html_out = PAGE_HTML.format(result_block=result_block, export_block=export_block)
+            html_out = render_page(result_block, export_block)
             self.wfile.write(html_out.encode("utf-8"))
             self.wfile.flush()
         except Exception:
@@ -1176,9 +1361,14 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                 pass  # Geen response mogelijk, server crasht
 
 
-class ReuseTCPServer(socketserver.TCPServer):
-    """TCPServer met SO_REUSEADDR om port conflicts te voorkomen."""
+class ReuseTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    TCPServer met SO_REUSEADDR om port conflicts te voorkomen.
+    Elke verbinding krijgt een eigen thread, zodat een trage upload of VirusTotal
+    lookup andere gebruikers niet blokkeert.
+    """
     allow_reuse_address = True
+    daemon_threads = True
 
 
 
@@ -0,0 +1,157 @@
+"""
+Full-file, multi-algorithm hashing.
+Large updates are spread over the algorithms: the calling thread runs one and idle
+threads of a shared, CPU-sized pool run the others (hashlib releases the GIL for
+large updates). Files are read through mmap in large slices, so MD5, SHA1 and
+SHA256 of a multi-GB image cost roughly one pass at disk speed. When the pool is
+already busy (many files hashed at once by bulk or GUI workers), updates are
+hashed inline: those callers already keep the cores busy.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+# Default algorithm set (sha256 is always included: VirusTotal and the cache key on it)
+DEFAULT_HASH_ALGORITHMS = ("md5", "sha1", "sha256")
+
+# Slice size when hashing an mmap'ed file
+HASH_SLICE_SIZE = 8 * 1024 * 1024
+
+# Updates smaller than this are hashed inline (thread hand-off would cost more than it saves)
+PARALLEL_MIN_BYTES = 256 * 1024
+
+# Pool threads for parallel updates, next to the calling thread (none on one CPU)
+HASH_THREADS = (os.cpu_count() or 1) - 1
+
+# progress(bytes_done, total_bytes)
+ProgressCallback = Callable[[int, int], None]
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_busy = 0  # pool threads reserved by running updates
+_pool_lock = threading.Lock()
+
+
+def _reserve_threads(wanted: int) -> Tuple[Optional[ThreadPoolExecutor], int]:
+    """
+    Shared pool (recreated after fork) and how many of its threads, at most `wanted`,
+    the caller may use; (None, 0) when none are idle. Release them with _release_threads().
+    """
+    global _pool, _pool_pid, _pool_busy
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _pool = None
+            _pool_pid = os.getpid()
+            _pool_busy = 0
+        count = min(wanted, HASH_THREADS - _pool_busy)
+        if count <= 0:
+            return None, 0
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HASH_THREADS, thread_name_prefix="fti-hash")
+        _pool_busy += count
+        return _pool, count
+
+
+def _release_threads(count: int) -> None:
+    global _pool_busy
+    with _pool_lock:
+        _pool_busy -= count
+
+
+def normalize_algorithms(algorithms: Optional[Iterable[str]]) -> tuple:
+    """Lower-case, de-duplicate and validate algorithm names; always includes sha256."""
+    names = [a.strip().lower() for a in (algorithms or DEFAULT_HASH_ALGORITHMS) if a and a.strip()]
+    if "sha256" not in names:
+        names.append("sha256")
+    result = []
+    for name in names:
+        if name in result:
+            continue
+        hashlib.new(name)  # raises ValueError for unknown algorithms
+        result.append(name)
+    return tuple(result)
+
+
+class MultiHasher:
+    """Feeds every update to several hash objects, in parallel threads for large buffers when the pool is idle."""
+
+    def __init__(self, algorithms: Optional[Iterable[str]] = None):
+        self.algorithms = normalize_algorithms(algorithms)
+        self._hashers = [hashlib.new(name) for name in self.algorithms]
+
+    def update(self, data) -> None:
+        pool, count = None, 0
+        if len(self._hashers) > 1 and len(data) >= PARALLEL_MIN_BYTES:
+            pool, count = _reserve_threads(len(self._hashers) - 1)
+        if pool is None:
+            for h in self._hashers:
+                h.update(data)
+            return
+        try:
+            futures = [pool.submit(h.update, data) for h in self._hashers[:count]]
+            for h in self._hashers[count:]:
+                h.update(data)
+            for fut in futures:
+                fut.result()
+        finally:
+            _release_threads(count)
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {name: h.hexdigest() for name, h in zip(self.algorithms, self._hashers)}
+
+
+def hash_file(
+    filepath: Union[str, Path],
+    algorithms: Optional[Iterable[str]] = None,
+    progress: Optional[ProgressCallback] = None,
+    timeout_seconds: Optional[float] = None,
+) -> Dict[str, str]:
+    """
+    Hash the whole file with every algorithm in `algorithms`. Raises OSError on read errors.
+    Returns {algorithm: hexdigest}, or {algorithm: "(timeout)"} if `timeout_seconds` elapses.
+    """
+    hasher = MultiHasher(algorithms)
+    start = time.time()
+    with open(filepath, "rb", buffering=0) as f:
+        total = os.fstat(f.fileno()).st_size
+        done = 0
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if total else None
+        except (OSError, ValueError):
+            mm = None  # not mappable (pipe, some network filesystems): fall back to reads
+
+        if mm is not None:
+            with mm:
+                view = memoryview(mm)
+                try:
+                    while done < total:
+                        chunk = view[done:done + HASH_SLICE_SIZE]
+                        hasher.update(chunk)
+                        done += len(chunk)
+                        chunk.release()
+                        if progress:
+                            progress(done, total)
+                        if timeout_seconds is not None and time.time() - start > timeout_seconds:
+                            return {name: "(timeout)" for name in hasher.algorithms}
+                finally:
+                    view.release()
+        else:
+            buf = bytearray(HASH_SLICE_SIZE)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                hasher.update(view[:n])
+                done += n
+                if progress:
+                    progress(done, total)
+                if timeout_seconds is not None and time.time() - start > timeout_seconds:
+                    return {name: "(timeout)" for name in hasher.algorithms}
+    return hasher.hexdigests()
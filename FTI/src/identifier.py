@@ -4,18 +4,34 @@ Reads file header, matches against known signatures, flags extension mismatches.
 """
 
 import os
-import subprocess
 from pathlib import Path
-from typing import Union, Optional, List, Dict
-import hashlib
-import math
-import time
+from typing import BinaryIO, Union, Optional, List, Dict, Iterable
 
 # Use absolute imports when run as script, relative when imported as package
 try:
-    from .magic_db import MAGIC_DATABASE, get_all_signatures
+    from .signature_index import get_signature_index, read_ranges
+    from .pipeline import CHUNK_SIZE, FILE_CMD_PREFIX, StreamAnalyzer, iter_chunks, scan_file
+    from .entropy import EntropyAccumulator, data_entropy
+    from .hashing import ProgressCallback, hash_file, normalize_algorithms
+    from .file_cmd import describe_buffer, describe_file
+    from .cache import AnalysisCache, stat_key
+    from .virustotal import get_client, is_sha256
+    from .containers import STREAM_TAIL_SIZE, ContainerType, inspect_container, inspect_path, is_container, window_reader
+    from .rules import RuleSet
+    from .export import SINGLE_CSV_FIELDS, export_results
+    from .executables import executable_summary, inspect_executable, is_executable
 except ImportError:
-    from magic_db import MAGIC_DATABASE, get_all_signatures
+    from signature_index import get_signature_index, read_ranges
+    from pipeline import CHUNK_SIZE, FILE_CMD_PREFIX, StreamAnalyzer, iter_chunks, scan_file
+    from entropy import EntropyAccumulator, data_entropy
+    from hashing import ProgressCallback, hash_file, normalize_algorithms
+    from file_cmd import describe_buffer, describe_file
+    from cache import AnalysisCache, stat_key
+    from virustotal import get_client, is_sha256
+    from containers import STREAM_TAIL_SIZE, ContainerType, inspect_container, inspect_path, is_container, window_reader
+    from rules import RuleSet
+    from export import SINGLE_CSV_FIELDS, export_results
+    from executables import executable_summary, inspect_executable, is_executable
 
 # How many bytes to read from the start of the file (enough for all signatures)
 HEADER_SIZE = 64
@@ -23,6 +39,16 @@ HEADER_SIZE = 64
 # Common text file extensions that shouldn't trigger mismatch warnings
 TEXT_EXTENSIONS = {".txt", ".csv", ".json", ".xml", ".html", ".htm", ".css", ".js", ".log", ".md", ".yml", ".yaml"}
 
+# Entropy above this value is reported as possibly encrypted/obfuscated
+HIGH_ENTROPY_THRESHOLD = 7.5
+
+# Detected type when no signature matches
+UNKNOWN_TYPE = "Unknown or Text File"
+
+# Result fields that depend on the path, not the content (never cached: a renamed
+# file keeps its inode and mtime, so its cache entry is still found)
+PATH_FIELDS = ("filepath", "file_extension", "mismatch", "message")
+
 
 def read_header(filepath: Union[str, Path], size: int = HEADER_SIZE) -> Optional[bytes]:
     """Read the first `size` bytes of the file. Returns None on error."""
@@ -41,23 +67,24 @@ def bytes_to_hex(b: bytes, max_len: int = 32) -> str:
     return h
 
 
-def match_magic(header: bytes) -> List[tuple]:
+def match_magic(header: bytes, ranges: Optional[Dict[int, bytes]] = None) -> List[tuple]:
     """
     Match header against magic database. Returns list of (description, extensions).
     Longest matching signature wins when multiple match (e.g. ZIP vs empty ZIP).
+    Uses the compiled signature index, so cost does not grow with database size.
+    `ranges` ({offset: bytes}, from the index read plan) adds deep-offset signatures
+    such as TAR (257) and ISO-9660 (32769).
     """
     if not header:
         return []
 
-    results = []
-    for offset, hex_sig, description, extensions in get_all_signatures():
-        sig_len = len(hex_sig) // 2
-        end = offset + sig_len
-        if end > len(header):
-            continue
-        chunk = header[offset:end]
-        if chunk.hex().upper() == hex_sig.upper():
-            results.append((description, extensions))
+    index = get_signature_index()
+    if ranges:
+        sparse = dict(ranges)
+        sparse.setdefault(0, header)
+        results = index.match_ranges(sparse)
+    else:
+        results = index.match(header)
 
     # Special case: RIFF + WEBP at offset 8
     if len(header) >= 12 and header[:4] == b"RIFF" and header[8:12] == b"WEBP":
@@ -73,6 +100,22 @@ def match_magic(header: bytes) -> List[tuple]:
     return results[:1] if len(results) == 1 else _pick_best(results)
 
 
+def match_file(filepath: Union[str, Path]) -> List[tuple]:
+    """
+    Magic match of a file using only the index read plan: a few positioned reads
+    (e.g. bytes 0-265 and 32769-36870) instead of a prefix read or a full pass.
+    Raises OSError if the file can't be read.
+    """
+    index = get_signature_index()
+    fd = os.open(str(filepath), os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        ranges = read_ranges(fd, index.read_plan(size, min_first=HEADER_SIZE))
+    finally:
+        os.close(fd)
+    return match_magic(ranges.get(0, b""), ranges)
+
+
 def _pick_best(results: List[tuple]) -> List[tuple]:
     """Prefer more specific description (longer or executable/docs over shebang)."""
     executable_or_binary = ("PE", "ELF", "Mach-O", "PDF", "ZIP", "PNG", "JPEG", "GIF", "Office")
@@ -98,80 +141,46 @@ def extension_matches_detected(ext: str, detected_extensions: List[str]) -> bool
 
 
 def run_file_command(filepath: Union[str, Path]) -> Optional[str]:
-    """Run system `file` command if available. Returns one-line output or None."""
-    try:
-        r = subprocess.run(
-            ["file", "-b", str(filepath)],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-        if r.returncode == 0 and r.stdout:
-            return r.stdout.strip()
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        pass
-    return None
+    """
+    Describe the file with the system `file` command if available. Returns one-line output or None.
+    Uses libmagic or a long-lived batched `file` process when possible (see file_cmd.py).
+    """
+    return describe_file(filepath)
 
 
-def calculate_hashes(filepath: Union[str, Path], timeout_seconds: int = 30) -> Dict[str, str]:
-    """Calculate MD5 and SHA256 hashes. Returns dict with 'md5' and 'sha256' keys."""
-    md5_hash = hashlib.md5()
-    sha256_hash = hashlib.sha256()
-    
+def calculate_hashes(
+    filepath: Union[str, Path],
+    timeout_seconds: Optional[float] = None,
+    algorithms: Optional[Iterable[str]] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, str]:
+    """
+    Hash the complete file. Returns dict keyed by algorithm (default: 'md5', 'sha1', 'sha256').
+    Algorithms run in parallel threads (when idle) over an mmap of the file; `progress(done, total)`
+    is called after every slice.
+    """
+    algorithms = normalize_algorithms(algorithms)
     try:
-        file_size = os.path.getsize(filepath)
-        # Skip very large files (>1GB) to avoid memory issues
-        if file_size > 1024 * 1024 * 1024:
-            return {"md5": "(file too large)", "sha256": "(file too large)"}
-        
-        # For large files (>500MB), sample first 100MB
-        sample_size = 100 * 1024 * 1024 if file_size > 500 * 1024 * 1024 else file_size
-        
-        start_time = time.time()
-        with open(filepath, "rb") as f:
-            bytes_read = 0
-            while bytes_read < sample_size:
-                chunk = f.read(8192)
-                if not chunk:
-                    break
-                md5_hash.update(chunk)
-                sha256_hash.update(chunk)
-                bytes_read += len(chunk)
-                
-                # Timeout check
-                if time.time() - start_time > timeout_seconds:
-                    return {"md5": "(timeout)", "sha256": "(timeout)"}
-        
-        return {
-            "md5": md5_hash.hexdigest(),
-            "sha256": sha256_hash.hexdigest()
-        }
+        return hash_file(filepath, algorithms, progress=progress, timeout_seconds=timeout_seconds)
     except (OSError, MemoryError):
-        return {"md5": "(error)", "sha256": "(error)"}
+        return {name: "(error)" for name in algorithms}
 
 
-def calculate_entropy(filepath: Union[str, Path], header_bytes: int = 1024) -> Optional[float]:
-    """Calculate Shannon entropy of file header. Returns float between 0-8."""
+def calculate_entropy(filepath: Union[str, Path], header_bytes: Optional[int] = 1024) -> Optional[float]:
+    """
+    Calculate Shannon entropy of the file header (first `header_bytes`), or of the whole
+    file when `header_bytes` is None. Returns float between 0-8.
+    """
     try:
+        if header_bytes is not None:
+            with open(filepath, "rb") as f:
+                data = f.read(header_bytes)
+            return data_entropy(data) if data else None
+        acc = EntropyAccumulator()
         with open(filepath, "rb") as f:
-            data = f.read(header_bytes)
-        if not data:
-            return None
-        
-        # Count byte frequencies
-        byte_counts = [0] * 256
-        for byte in data:
-            byte_counts[byte] += 1
-        
-        # Calculate entropy
-        entropy = 0.0
-        length = len(data)
-        for count in byte_counts:
-            if count > 0:
-                p = count / length
-                entropy -= p * math.log2(p)
-        
-        return entropy
+            for chunk in iter(lambda: f.read(4 * 1024 * 1024), b""):
+                acc.update(chunk)
+        return acc.entropy()
     except (OSError, MemoryError):
         return None
 
@@ -185,30 +194,17 @@ def format_file_size(size_bytes: int) -> str:
     return f"{size_bytes:.2f} PB"
 
 
-def check_virustotal(sha256_hash: str, api_key: str) -> Dict:
-    """Check file hash on VirusTotal. Returns dict with results."""
+def check_virustotal(sha256_hash: str, api_key: str, max_wait: Optional[float] = None) -> Dict:
+    """
+    Check file hash on VirusTotal. Returns dict with results.
+    Lookups are cached and rate limited (see virustotal.py); if no quota frees up within
+    `max_wait` seconds the hash is queued and {"status": "queued"} is returned.
+    """
     if not api_key:
         return {}
     
     try:
-        import requests
-        url = f"https://www.virustotal.com/api/v3/files/{sha256_hash}"
-        headers = {"x-apikey": api_key}
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            stats = data.get("data", {}).get("attributes", {}).get("last_analysis_stats", {})
-            permalink = data.get("data", {}).get("links", {}).get("self", "")
-            return {
-                "detected": stats.get("malicious", 0),
-                "total": stats.get("malicious", 0) + stats.get("undetected", 0),
-                "permalink": permalink.replace("/api/v3/files/", "/gui/file/") if permalink else None
-            }
-        elif response.status_code == 404:
-            return {"status": "not_found"}
-        else:
-            return {"error": f"API error: {response.status_code}"}
+        return get_client(api_key).lookup(sha256_hash, max_wait=max_wait)
     except Exception as e:
         return {"error": str(e)}
 
@@ -221,33 +217,30 @@ def export_to_json(data: Dict, output_path: Union[str, Path]) -> None:
 
 
 def export_to_csv(data: Dict, output_path: Union[str, Path]) -> None:
-    """Export analysis results to CSV file."""
-    import csv
-    with open(output_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["filepath", "file_size", "detected_type", "file_extension", "md5", "sha256", "entropy", "mismatch", "file_cmd_output"])
-        writer.writerow([
-            data.get("filepath", ""),
-            data.get("file_size", ""),
-            data.get("detected_type", ""),
-            data.get("file_extension", ""),
-            data.get("md5", ""),
-            data.get("sha256", ""),
-            data.get("entropy", ""),
-            data.get("mismatch", False),
-            data.get("file_cmd_output", "")
-        ])
+    """Export analysis results to CSV file (for many results use export.export_results)."""
+    export_results([data], output_path, "csv", fields=SINGLE_CSV_FIELDS)
 
 
 def identify(
     filepath: Union[str, Path],
     use_file_cmd: bool = True,
     virustotal_api_key: Optional[str] = None,
+    cache: Optional[AnalysisCache] = None,
+    hash_algorithms: Optional[Iterable[str]] = None,
+    progress: Optional[ProgressCallback] = None,
+    entropy_blocks: bool = False,
+    rules: Optional[RuleSet] = None,
 ) -> Dict:
     """
     Identify file type by magic number and optional `file` command.
     Returns dict with: raw_hex, detected_type, extensions, file_extension,
-    file_cmd_output, mismatch (bool), message, file_size, md5, sha256, entropy, virustotal.
+    file_cmd_output, mismatch (bool), message, file_size, md5, sha1, sha256, entropy, virustotal.
+    Hashes cover the whole file; `hash_algorithms` selects them (sha256 is always included).
+    `entropy` is over the whole file and `entropy_profile` summarises 4 KB block entropies
+    (with every block value when `entropy_blocks` is set).
+    With `cache`, unchanged files (same device, inode, size and mtime) are answered
+    from the cache without reading them; VirusTotal verdicts have their own TTL cache.
+    With `rules` (see rules.load_rules) the matching content rules are listed in `rules`.
     """
     path = Path(filepath)
     if not path.exists():
@@ -256,81 +249,382 @@ def identify(
             "filepath": str(path),
         }
 
-    header = read_header(path)
-    if header is None:
+    algorithms = normalize_algorithms(hash_algorithms)
+    variant = _variant(use_file_cmd, algorithms, entropy_blocks, rules)
+    result = None
+    if cache is not None:
+        try:
+            cached = cache.get(stat_key(path.stat()), variant)
+        except OSError:
+            cached = None
+        if cached is not None:
+            result = cached
+
+    if result is None:
+        result = _analyze(path, use_file_cmd, cache, variant, algorithms, progress, entropy_blocks, rules)
+        if "error" in result:
+            return result
+
+    return _add_virustotal(_with_path_fields(result, path), virustotal_api_key)
+
+
+def identify_scanned(
+    filepath: Union[str, Path],
+    scan: StreamAnalyzer,
+    st: os.stat_result,
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    cache: Optional[AnalysisCache] = None,
+    hash_algorithms: Optional[Iterable[str]] = None,
+    entropy_blocks: bool = False,
+    rules: Optional[RuleSet] = None,
+) -> Dict:
+    """
+    identify() for a file whose whole content another reader already fed to `scan`
+    (from new_file_analyzer()), e.g. while expanding it as an archive, so the file is
+    read once. `st` is the stat of the file as read; the result is stored in `cache`.
+    """
+    path = Path(filepath)
+    variant = _variant(use_file_cmd, normalize_algorithms(hash_algorithms), entropy_blocks, rules)
+    result = _finish_file(scan, st, path, use_file_cmd, cache, variant)
+    return _add_virustotal(_with_path_fields(result, path), virustotal_api_key)
+
+
+def new_file_analyzer(
+    hash_algorithms: Optional[Iterable[str]] = None,
+    entropy_blocks: bool = False,
+    rules: Optional[RuleSet] = None,
+) -> StreamAnalyzer:
+    """StreamAnalyzer set up like identify() sets it up for a file; see identify_scanned()."""
+    return StreamAnalyzer(
+        HEADER_SIZE,
+        hash_algorithms=normalize_algorithms(hash_algorithms),
+        keep_entropy_blocks=entropy_blocks,
+        ranges=get_signature_index().read_plan(),
+        rules=rules,
+    )
+
+
+def _variant(use_file_cmd: bool, algorithms: tuple, entropy_blocks: bool, rules: Optional[RuleSet]) -> str:
+    """Cache variant: the options that change a file's result."""
+    variant = ("file" if use_file_cmd else "nofile") + ":" + ",".join(algorithms) + (":blocks" if entropy_blocks else "")
+    if rules is not None:
+        variant += ":rules=" + rules.fingerprint[:16]
+    return variant
+
+
+def _analyze(
+    path: Path,
+    use_file_cmd: bool,
+    cache: Optional[AnalysisCache],
+    variant: str,
+    algorithms: tuple,
+    progress: Optional[ProgressCallback] = None,
+    entropy_blocks: bool = False,
+    rules: Optional[RuleSet] = None,
+) -> Dict:
+    """Local analysis of one file (everything except VirusTotal); stores the result in `cache`."""
+    # Single read pass: header, hashes and entropy sample come from one open()
+    try:
+        scan, st = scan_file(
+            path,
+            header_size=HEADER_SIZE,
+            hash_algorithms=algorithms,
+            progress=progress,
+            keep_entropy_blocks=entropy_blocks,
+            ranges=get_signature_index().read_plan(),
+            rules=rules,
+            # PE/ELF: parsed from the mapping the pass reads through
+            inspect_if=is_executable,
+            inspect=executable_summary,
+        )
+    except OSError:
         return {
             "error": "Could not read file",
             "filepath": str(path),
         }
+    return _finish_file(scan, st, path, use_file_cmd, cache, variant)
+
+
+def _finish_file(
+    scan: StreamAnalyzer,
+    st: os.stat_result,
+    path: Path,
+    use_file_cmd: bool,
+    cache: Optional[AnalysisCache],
+    variant: str,
+) -> Dict:
+    """Result of a completely scanned file (without VirusTotal); stores it in `cache`."""
+    file_cmd_out = None
+    if use_file_cmd:
+        # Same content seen before (other path or touched file): reuse its `file` output
+        sha256 = scan.hexdigests().get("sha256", "")
+        seen = cache.lookup_sha256(sha256, variant) if cache is not None else None
+        file_cmd_out = seen.get("file_cmd_output") if seen else run_file_command(path)
+
+    # ZIP/OLE: refine the generic container type from member / stream names
+    container = inspect_path(path, scan.header, st.st_size)
+    result = _build_result(scan, str(path), get_extension(path), st.st_size, file_cmd_out, container)
+    # PE/ELF: section table, imports and overlay (from the scan's mapping if it had one)
+    if is_executable(scan.header):
+        executable = scan.inspection if scan.inspection is not None else inspect_executable(path)
+        if executable is not None:
+            result["executable"] = executable
+
+    if cache is not None and scan.hash_status is None:
+        cache.put(stat_key(st), {k: v for k, v in result.items() if k not in PATH_FIELDS}, variant)
+    
+    return result
+
+
+def _build_result(
+    scan: StreamAnalyzer,
+    display_path: str,
+    ext: str,
+    file_size: int,
+    file_cmd_out: Optional[str],
+    container: Optional[ContainerType] = None,
+) -> Dict:
+    """Turn a finished scan into the result dict (without VirusTotal)."""
+    header = scan.header
+    hashes = scan.hexdigests()
 
     raw_hex = bytes_to_hex(header, max_len=32)
-    matches = match_magic(header)
+    matches = match_magic(header, scan.ranges)
+    if container is not None:
+        matches = [container]
 
     if matches:
         detected_type, detected_exts = matches[0]
     else:
-        detected_type = "Unknown or Text File"
+        detected_type = UNKNOWN_TYPE
         detected_exts = []
 
-    ext = get_extension(path)
-    file_cmd_out = run_file_command(path) if use_file_cmd else None
-    
     # Refine detected_type using file command output for text files
-    if detected_type == "Unknown or Text File" and file_cmd_out:
+    if detected_type == UNKNOWN_TYPE and file_cmd_out:
         # Use file command output for more specific type
         detected_type = file_cmd_out
     
-    # Check for mismatch (but suppress warnings for common text files)
-    match_ok = extension_matches_detected(ext, detected_exts)
-    # Don't flag mismatch for common text extensions when detected as text
-    if not match_ok and ext.lower() in TEXT_EXTENSIONS and "text" in detected_type.lower():
-        match_ok = True
-    
-    mismatch = not match_ok
-
-    # Get file size
-    try:
-        file_size = os.path.getsize(path)
-        file_size_formatted = format_file_size(file_size)
-    except OSError:
-        file_size = 0
-        file_size_formatted = "—"
-
-    # Calculate hashes
-    hashes = calculate_hashes(path)
-    
-    # Calculate entropy
-    entropy = calculate_entropy(path)
-
-    # Check VirusTotal
-    virustotal_result = {}
-    if virustotal_api_key and hashes.get("sha256") and hashes["sha256"] not in ["(error)", "(timeout)", "(file too large)"]:
-        virustotal_result = check_virustotal(hashes["sha256"], virustotal_api_key)
-
     result = {
-        "filepath": str(path),
+        "filepath": display_path,
         "file_size": file_size,
-        "file_size_formatted": file_size_formatted,
+        "file_size_formatted": format_file_size(file_size),
         "raw_hex": raw_hex,
         "detected_type": detected_type,
         "detected_extensions": detected_exts,
-        "file_extension": ext or "(none)",
         "file_cmd_output": file_cmd_out,
         "md5": hashes.get("md5", ""),
+        "sha1": hashes.get("sha1", ""),
         "sha256": hashes.get("sha256", ""),
-        "entropy": entropy,
+        "entropy": scan.entropy(),
+        "entropy_profile": scan.entropy_profile(),
+        "virustotal": None,
+    }
+    result.update(_extension_check(ext, detected_type, detected_exts))
+    # Any extra algorithms requested (e.g. sha512, blake2b)
+    for name, digest in hashes.items():
+        result.setdefault(name, digest)
+    rule_matches = scan.rule_matches()
+    if rule_matches is not None:
+        result["rules"] = rule_matches
+    return result
+
+
+def _with_path_fields(content: Dict, path: Path) -> Dict:
+    """Result for `path`: the content-derived fields of `content` plus PATH_FIELDS for this path."""
+    result = {"filepath": str(path)}
+    result.update((k, v) for k, v in content.items() if k not in PATH_FIELDS)
+    result.update(_extension_check(get_extension(path), result["detected_type"], result["detected_extensions"]))
+    return result
+
+
+def _extension_check(ext: str, detected_type: str, detected_exts: List[str]) -> Dict:
+    """The path-dependent fields (file_extension, mismatch, message) for extension `ext`."""
+    # Check for mismatch (but suppress warnings for common text files)
+    match_ok = extension_matches_detected(ext, detected_exts)
+    # Don't flag mismatch for common text extensions when detected as text
+    if not match_ok and ext.lower() in TEXT_EXTENSIONS and "text" in detected_type.lower():
+        match_ok = True
+
+    mismatch = not match_ok
+    return {
+        "file_extension": ext or "(none)",
         "mismatch": mismatch,
-        "virustotal": virustotal_result if virustotal_result else None,
         "message": (
             "Note: Check if magic number matches the extension — possible spoofing."
             if mismatch
             else None
         ),
     }
-    
+
+
+def _add_virustotal(result: Dict, virustotal_api_key: Optional[str], max_wait: Optional[float] = None) -> Dict:
+    """Fill result['virustotal'] from a VirusTotal lookup of its SHA256 (if a key is given)."""
+    virustotal_result = {}
+    sha256 = result.get("sha256")
+    if virustotal_api_key and is_sha256(sha256):
+        virustotal_result = check_virustotal(sha256, virustotal_api_key, max_wait=max_wait)
+    result["virustotal"] = virustotal_result if virustotal_result else None
+    return result
+
+
+def identify_stream(
+    source: Union[BinaryIO, Iterable[bytes]],
+    filename: str = "-",
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    hash_algorithms: Optional[Iterable[str]] = None,
+    entropy_blocks: bool = False,
+    max_bytes: Optional[int] = None,
+    vt_max_wait: Optional[float] = None,
+    rules: Optional[RuleSet] = None,
+) -> Dict:
+    """
+    Identify content from a binary file object (pipe, socket, stdin; need not be seekable)
+    or an iterable of byte chunks, in one pass and without a temp file. Header, hashes,
+    entropy and rules are computed incrementally; the `file` command and ZIP/OLE checks
+    use the kept prefix and tail. `filename` is only used for display and the extension
+    check. Raises ValueError if more than `max_bytes` are read. `vt_max_wait` bounds the
+    wait for VirusTotal quota (see check_virustotal).
+    """
+    chunks = iter_chunks(source) if hasattr(source, "read") else source
+    scan = new_stream_analyzer(hash_algorithms, entropy_blocks, rules)
+    try:
+        for chunk in chunks:
+            scan.update(chunk)
+            if max_bytes is not None and scan.bytes_seen > max_bytes:
+                raise ValueError(f"File too large (>{format_file_size(max_bytes)})")
+    except OSError:
+        return {
+            "error": "Could not read file",
+            "filepath": filename,
+        }
+    return finish_stream(scan, filename, use_file_cmd, virustotal_api_key, vt_max_wait)
+
+
+def identify_fileobj(
+    fileobj: BinaryIO,
+    filename: str = "upload",
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    hash_algorithms: Optional[Iterable[str]] = None,
+    entropy_blocks: bool = False,
+    max_bytes: Optional[int] = None,
+    vt_max_wait: Optional[float] = None,
+    rules: Optional[RuleSet] = None,
+) -> Dict:
+    """Identify content read from a binary file object (upload stream); see identify_stream()."""
+    return identify_stream(
+        fileobj,
+        filename=filename,
+        use_file_cmd=use_file_cmd,
+        virustotal_api_key=virustotal_api_key,
+        hash_algorithms=hash_algorithms,
+        entropy_blocks=entropy_blocks,
+        max_bytes=max_bytes,
+        vt_max_wait=vt_max_wait,
+        rules=rules,
+    )
+
+
+def new_stream_analyzer(
+    hash_algorithms: Optional[Iterable[str]] = None,
+    entropy_blocks: bool = False,
+    rules: Optional[RuleSet] = None,
+) -> StreamAnalyzer:
+    """
+    StreamAnalyzer set up for content without a path (uploads, archive members):
+    keeps the prefix and tail needed for the `file` command and container checks.
+    Feed it with update(), then call finish_stream().
+    """
+    return StreamAnalyzer(
+        HEADER_SIZE,
+        hash_algorithms=normalize_algorithms(hash_algorithms),
+        keep_entropy_blocks=entropy_blocks,
+        prefix_size=FILE_CMD_PREFIX,
+        tail_size=STREAM_TAIL_SIZE,
+        ranges=get_signature_index().read_plan(),
+        rules=rules,
+    )
+
+
+def finish_stream(
+    scan: StreamAnalyzer,
+    filename: str,
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    vt_max_wait: Optional[float] = None,
+) -> Dict:
+    """Result dict for a fully fed new_stream_analyzer() (same format as identify())."""
+    file_cmd_out = describe_buffer(scan.prefix) if use_file_cmd else None
+    container = None
+    if is_container(scan.header):
+        # No seeking on a stream: ZIP/OLE structures are read from the kept prefix and tail
+        reader = window_reader(scan.prefix, scan.tail, scan.bytes_seen)
+        container = inspect_container(scan.header, reader, scan.bytes_seen)
+    result = _build_result(scan, filename, get_extension(filename), scan.bytes_seen, file_cmd_out, container)
+    if is_executable(scan.header) and scan.bytes_seen <= FILE_CMD_PREFIX:
+        # Small enough to be entirely in the kept prefix
+        result["executable"] = executable_summary(scan.prefix)
+    return _add_virustotal(result, virustotal_api_key, max_wait=vt_max_wait)
+
+
+def identify_bytes(
+    data: bytes,
+    filename: str = "upload",
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    hash_algorithms: Optional[Iterable[str]] = None,
+    entropy_blocks: bool = False,
+    vt_max_wait: Optional[float] = None,
+    rules: Optional[RuleSet] = None,
+) -> Dict:
+    """
+    Identify an in-memory buffer (bytes, bytearray or memoryview) without a temp file or
+    a copy: it is fed to the analyzer in memoryview slices. Same result format as identify().
+    """
+    view = memoryview(data).cast("B")
+    result = identify_stream(
+        (view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE)),
+        filename=filename,
+        use_file_cmd=use_file_cmd,
+        virustotal_api_key=virustotal_api_key,
+        hash_algorithms=hash_algorithms,
+        entropy_blocks=entropy_blocks,
+        vt_max_wait=vt_max_wait,
+        rules=rules,
+    )
+    if "executable" not in result and "error" not in result and is_executable(view[:4]):
+        # Random access is free here: parse the whole buffer
+        result["executable"] = executable_summary(view)
     return result
 
 
+def _print_executable(exe: Dict) -> None:
+    if "error" in exe:
+        print(f"Executable: malformed headers ({exe['error']})")
+        return
+    kind = exe.get("subsystem") or exe.get("type")
+    print(f"Executable: {exe['format']} {exe['machine']}" + (f", {kind}" if kind else ""))
+    entry_section = f" (in {exe['entry_section']})" if exe.get("entry_section") else ""
+    print(f"Entry point: {exe['entry_point']}{entry_section}")
+    sections = exe.get("sections") or []
+    packed = [
+        s["name"] or "?" for s in sections
+        if s.get("entropy") is not None and s["entropy"] > HIGH_ENTROPY_THRESHOLD
+    ]
+    packed_note = f", high entropy: {', '.join(packed)}" if packed else ""
+    print(f"Sections: {len(sections)}{packed_note}")
+    libraries = exe["imports"] if isinstance(exe.get("imports"), dict) else exe.get("needed") or []
+    print(f"Imports: {exe.get('import_count', 0)} from {len(libraries)} libraries")
+    if exe.get("signed"):
+        print("Authenticode signature: present")
+    if exe.get("overlay_size"):
+        print(f"Overlay: {exe['overlay_size']} bytes at 0x{exe['overlay_offset']:X}")
+    for problem in exe.get("problems") or []:
+        print(f"Executable: {problem}")
+
+
 def print_report(data: Dict) -> None:
     """Print a human-readable report to stdout."""
     if "error" in data:
@@ -340,6 +634,8 @@ def print_report(data: Dict) -> None:
     print("File Type Identifier")
     print("-" * 40)
     print(f"File: {data['filepath']}")
+    if data.get("parent"):
+        print(f"Inside: {data['parent']}")
     print(f"Size: {data.get('file_size_formatted', '—')}")
     print(f"Raw hex: {data['raw_hex']}")
     print(f"Detected: {data['detected_type']}")
@@ -348,19 +644,46 @@ def print_report(data: Dict) -> None:
         print(f"file command: {data['file_cmd_output']}")
     if data.get("md5"):
         print(f"MD5: {data['md5']}")
+    if data.get("sha1"):
+        print(f"SHA1: {data['sha1']}")
     if data.get("sha256"):
         print(f"SHA256: {data['sha256']}")
     if data.get("entropy") is not None:
-        entropy_note = " (high — possibly encrypted/obfuscated)" if data['entropy'] > 7.5 else ""
+        entropy_note = " (high — possibly encrypted/obfuscated)" if data['entropy'] > HIGH_ENTROPY_THRESHOLD else ""
         print(f"Entropy: {data['entropy']:.2f}{entropy_note}")
+    profile = data.get("entropy_profile")
+    if profile and profile.get("blocks", 0) > 1:
+        print(
+            f"Block entropy ({profile['block_size'] // 1024} KB blocks): max {profile['max']:.2f}, "
+            f"{profile['high_entropy_ratio'] * 100:.1f}% of blocks > {HIGH_ENTROPY_THRESHOLD}"
+        )
+        regions = profile.get("high_entropy_regions") or []
+        if regions and profile["high_entropy_ratio"] < 1:
+            shown = ", ".join(f"0x{start:X}-0x{end:X}" for start, end in regions[:5])
+            more = f" (+{len(regions) - 5} more)" if len(regions) > 5 else ""
+            print(f"High-entropy regions: {shown}{more}")
     if data.get("virustotal"):
         vt = data["virustotal"]
         if vt.get("detected", 0) > 0:
             print(f"VirusTotal: ⚠️ {vt['detected']}/{vt['total']} engines detected malware")
         elif vt.get("status") == "not_found":
             print("VirusTotal: Not found in database")
+        elif vt.get("status") == "queued":
+            print("VirusTotal: Queued (rate limit reached), try again later")
+        elif vt.get("error"):
+            print(f"VirusTotal: Error: {vt['error']}")
         else:
             print(f"VirusTotal: ✓ 0/{vt.get('total', 0)} — No malware detected")
+    exe = data.get("executable")
+    if exe:
+        _print_executable(exe)
+    for match in data.get("rules") or []:
+        strings = ", ".join(match["strings"])
+        print(f"Rule: [{match['severity']}] {match['rule']} — {match['description']} ({strings})")
+    if "archive_members" in data:
+        print(f"Archive members: {data['archive_members']}")
+    if data.get("archive_error"):
+        print(f"Archive: {data['archive_error']}")
     if data.get("mismatch") and data.get("message"):
         print(f"\n{data['message']}")
     print()
@@ -1,6 +1,7 @@
 """
 Magic numbers database for file type identification.
 Each entry: (offset, hex_signature, description, typical_extensions)
+Offsets may lie anywhere in the file; the signature index derives the byte ranges to read.
 """
 
 MAGIC_DATABASE = [
@@ -59,6 +60,24 @@ MAGIC_DATABASE = [
     (0, "7B5C727466", "RTF document", [".rtf"]),
     (0, "255044462D312E", "PDF document (version 1)", [".pdf"]),
     (0, "504B030414000600", "Office Open XML (docx/xlsx/pptx)", [".docx", ".xlsx", ".pptx"]),
+
+    # Signatures beyond the first bytes (read through the index read plan)
+    (2, "2D6C68", "LZH archive", [".lzh", ".lha"]),
+    (4, "66747970", "ISO base media file (ftyp box)", [".mp4", ".m4v", ".m4a", ".mov", ".3gp", ".heic", ".avif"]),
+    (4, "6674797069736F6D", "MP4 video (isom)", [".mp4", ".m4v"]),
+    (4, "667479706D703432", "MP4 video (mp42)", [".mp4", ".m4v"]),
+    (4, "667479704D344120", "MPEG-4 audio (M4A)", [".m4a"]),
+    (4, "6674797071742020", "QuickTime movie", [".mov"]),
+    (4, "6674797068656963", "HEIC image", [".heic"]),
+    (4, "6674797061766966", "AVIF image", [".avif"]),
+    (4, "6674797033677034", "3GPP video", [".3gp"]),
+    (128, "4449434D", "DICOM medical image", [".dcm"]),
+    (257, "7573746172", "TAR archive", [".tar"]),
+    (257, "7573746172003030", "TAR archive (POSIX ustar)", [".tar"]),
+    (257, "7573746172202000", "TAR archive (GNU)", [".tar"]),
+    (32769, "4344303031", "ISO 9660 disk image", [".iso"]),
+    (34817, "4344303031", "ISO 9660 disk image", [".iso"]),
+    (36865, "4344303031", "ISO 9660 disk image", [".iso"]),
 ]
 
 
@@ -21,9 +21,181 @@ except ImportError:
 
 # Use absolute imports when run as script, relative when imported as package
 try:
-    from .identifier import identify, print_report
+    from .identifier import identify, identify_stream, print_report
+    from .archives import MAX_DEPTH, identify_recursive, identify_recursive_stream
+    from .cache import open_cache
+    from .hashing import normalize_algorithms
+    from .rules import load_rules
+    from .export import EXPORT_FORMATS
 except ImportError:
-    from identifier import identify, print_report
+    from identifier import identify, identify_stream, print_report
+    from archives import MAX_DEPTH, identify_recursive, identify_recursive_stream
+    from cache import open_cache
+    from hashing import normalize_algorithms
+    from rules import load_rules
+    from export import EXPORT_FORMATS
+
+
+def _progress_printer(min_size: int = 256 * 1024 * 1024):
+    """Progress callback that draws a percentage on stderr for large files."""
+    def progress(done: int, total: int) -> None:
+        if total < min_size:
+            return
+        end = "\n" if done >= total else ""
+        print(f"\rHashing: {done * 100 // total}% ({done // (1024 * 1024)} MB)", end=end, file=sys.stderr, flush=True)
+    return progress
+
+
+def run_bulk_mode(args) -> None:
+    """Stream one record per file for --recursive / --file-list, then print a summary."""
+    try:
+        from .bulk import iter_directory, iter_file_list, run_bulk
+        from .export import open_exporter, open_output
+    except ImportError:
+        from bulk import iter_directory, iter_file_list, run_bulk
+        from export import open_exporter, open_output
+
+    if args.recursive:
+        if not Path(args.recursive).is_dir():
+            print(f"Error: Directory not found: {args.recursive}")
+            sys.exit(1)
+        paths = iter_directory(args.recursive)
+    else:
+        paths = iter_file_list(args.file_list)
+
+    try:
+        out = open_output(args.output, args.format)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    try:
+        writer = open_exporter(out, args.format)
+        summary = run_bulk(
+            paths,
+            writer,
+            workers=args.workers,
+            use_file_cmd=not args.no_file_cmd,
+            virustotal_api_key=args.vt_api_key or VIRUSTOTAL_API_KEY,
+            use_cache=not args.no_cache,
+            hash_algorithms=args.hash_algorithms,
+            entropy_blocks=args.entropy_blocks,
+            archive_depth=args.max_depth if args.archives else None,
+            rules_source=args.rules,
+        )
+        writer.close()
+    finally:
+        if out not in (sys.stdout, sys.stdout.buffer):
+            out.close()
+
+    summary.print()
+    if summary.mismatches:
+        sys.exit(1)
+
+
+def run_watch_mode(args) -> None:
+    """Identify files arriving in the --watch directories until interrupted."""
+    import signal
+    import threading
+    try:
+        from .export import NdjsonExporter
+        from .watch import SocketOutput, run_watch
+    except ImportError:
+        from export import NdjsonExporter
+        from watch import SocketOutput, run_watch
+
+    for directory in args.watch:
+        if not Path(directory).is_dir():
+            print(f"Error: Directory not found: {directory}")
+            sys.exit(1)
+
+    if args.socket:
+        out = SocketOutput(args.socket)
+    elif args.output:
+        out = open(args.output, "a", encoding="utf-8")
+    else:
+        out = sys.stdout
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    print(f"Watching {', '.join(args.watch)} (Ctrl+C to stop)", file=sys.stderr, flush=True)
+    try:
+        summary = run_watch(
+            args.watch,
+            NdjsonExporter(out),
+            workers=args.workers,
+            use_file_cmd=not args.no_file_cmd,
+            virustotal_api_key=args.vt_api_key or VIRUSTOTAL_API_KEY,
+            use_cache=not args.no_cache,
+            hash_algorithms=args.hash_algorithms,
+            entropy_blocks=args.entropy_blocks,
+            archive_depth=args.max_depth if args.archives else None,
+            rules_source=args.rules,
+            polling=args.poll,
+            stop=stop,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    summary.print()
+
+
+def run_dedupe_mode(args) -> None:
+    """Print one NDJSON record per duplicate group (or similarity cluster) under --dedupe."""
+    import json
+    try:
+        from .bulk import iter_directory
+        from .dedupe import DedupeStats, find_duplicates, find_similar
+    except ImportError:
+        from bulk import iter_directory
+        from dedupe import DedupeStats, find_duplicates, find_similar
+
+    if not Path(args.dedupe).is_dir():
+        print(f"Error: Directory not found: {args.dedupe}")
+        sys.exit(1)
+
+    stats = DedupeStats()
+    if args.similar is not None:
+        groups = find_similar(iter_directory(args.dedupe), threshold=args.similar, workers=args.workers)
+    else:
+        groups = find_duplicates(
+            iter_directory(args.dedupe),
+            workers=args.workers,
+            cache=None if args.no_cache else open_cache(),
+            stats=stats,
+        )
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for group in groups:
+            out.write(json.dumps(group, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.similar is not None:
+        print(f"\n{len(groups)} clusters of similar files (threshold {args.similar:g})", file=sys.stderr)
+    else:
+        stats.print()
+
+
+def run_stdin_mode(args, rules) -> None:
+    """Analyse stdin in one pass (pipes need not be seekable; nothing is written to disk)."""
+    options = dict(
+        use_file_cmd=not args.no_file_cmd,
+        virustotal_api_key=args.vt_api_key or VIRUSTOTAL_API_KEY,
+        hash_algorithms=args.hash_algorithms,
+        entropy_blocks=args.entropy_blocks,
+        rules=rules,
+    )
+    name = args.name or "-"
+    if args.archives:
+        results = list(identify_recursive_stream(sys.stdin.buffer, name, max_depth=args.max_depth, **options))
+    else:
+        results = [identify_stream(sys.stdin.buffer, name, **options)]
+    for result in results:
+        print_report(result)
+    if any(result.get("mismatch") for result in results):
+        sys.exit(1)
 
 
 def main():
@@ -33,7 +205,12 @@ def main():
     parser.add_argument(
         "file",
         nargs="?",
-        help="File to analyze",
+        help="File to analyze ('-' reads stdin)",
+    )
+    parser.add_argument(
+        "--name",
+        metavar="NAME",
+        help="File name for stdin input: shown in the report and used for the extension check",
     )
     parser.add_argument(
         "--gui",
@@ -50,8 +227,115 @@ def main():
         action="store_true",
         help="Don't use system 'file' command",
     )
+    parser.add_argument(
+        "--hash",
+        metavar="ALGOS",
+        default=None,
+        help="Comma-separated hash algorithms (default: md5,sha1,sha256; sha256 is always included)",
+    )
+    parser.add_argument(
+        "--entropy-blocks",
+        action="store_true",
+        help="Include every 4 KB block entropy value in the result (default: summary only)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't use or update the on-disk analysis cache",
+    )
+    parser.add_argument(
+        "--rules",
+        metavar="FILE",
+        nargs="?",
+        const="default",
+        default=None,
+        help="Match content rules (built-in set, or a JSON rule file)",
+    )
+    parser.add_argument(
+        "--archives",
+        action="store_true",
+        help="Also identify the members of ZIP/tar/gzip/bzip2/xz archives (streamed, nothing is extracted)",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=MAX_DEPTH,
+        help=f"Nesting depth for --archives (default: {MAX_DEPTH})",
+    )
+    parser.add_argument(
+        "--recursive",
+        metavar="DIR",
+        help="Analyze every file below DIR (bulk mode)",
+    )
+    parser.add_argument(
+        "--file-list",
+        metavar="FILE",
+        help="Analyze paths listed in FILE, one per line ('-' for stdin) (bulk mode)",
+    )
+    parser.add_argument(
+        "--dedupe",
+        metavar="DIR",
+        help="Report groups of identical files below DIR (NDJSON)",
+    )
+    parser.add_argument(
+        "--similar",
+        metavar="THRESHOLD",
+        type=float,
+        nargs="?",
+        const=0.5,
+        default=None,
+        help="With --dedupe: cluster near-duplicates instead (estimated similarity 0-1, default 0.5)",
+    )
+    parser.add_argument(
+        "--watch",
+        metavar="DIR",
+        action="append",
+        help="Daemon mode: identify files as they are written or moved into DIR (repeatable); NDJSON records",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="Send --watch records to a unix stream socket instead of stdout/--output",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Poll --watch directories instead of using inotify",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for bulk, watch and dedupe mode (default: CPU count)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=EXPORT_FORMATS,
+        default="ndjson",
+        help="Record format for bulk mode (default: ndjson; parquet needs pyarrow)",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Write bulk/dedupe records to FILE instead of stdout (watch mode appends)",
+    )
 
     args = parser.parse_args()
+    hash_algorithms = args.hash.split(",") if args.hash else None
+    try:
+        hash_algorithms = normalize_algorithms(hash_algorithms)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    args.hash_algorithms = hash_algorithms
+
+    rules = None
+    if args.rules:
+        try:
+            rules = load_rules(args.rules)  # validate (and compile) before any work starts
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not load rules: {e}")
+            sys.exit(1)
 
     if args.gui:
         try:
@@ -61,20 +345,59 @@ def main():
         gui_main()
         return
 
+    if args.dedupe:
+        run_dedupe_mode(args)
+        return
+
+    if args.watch:
+        run_watch_mode(args)
+        return
+
+    if args.recursive or args.file_list:
+        run_bulk_mode(args)
+        return
+
     if not args.file:
         parser.print_help()
         sys.exit(1)
 
+    if args.file == "-":
+        run_stdin_mode(args, rules)
+        return
+
     filepath = Path(args.file)
     if not filepath.exists():
         print(f"Error: File not found: {filepath}")
         sys.exit(1)
 
     api_key = args.vt_api_key or VIRUSTOTAL_API_KEY
+    if args.archives:
+        mismatch = False
+        for result in identify_recursive(
+            filepath,
+            use_file_cmd=not args.no_file_cmd,
+            virustotal_api_key=api_key,
+            cache=None if args.no_cache else open_cache(),
+            hash_algorithms=args.hash_algorithms,
+            entropy_blocks=args.entropy_blocks,
+            rules=rules,
+            max_depth=args.max_depth,
+        ):
+            print_report(result)
+            mismatch = mismatch or bool(result.get("mismatch"))
+        if mismatch:
+            sys.exit(1)
+        return
+
     result = identify(
         filepath,
         use_file_cmd=not args.no_file_cmd,
         virustotal_api_key=api_key,
+        cache=None if args.no_cache else open_cache(),
+        hash_algorithms=args.hash_algorithms,
+        progress=_progress_printer() if sys.stderr.isatty() else None,
+        entropy_blocks=args.entropy_blocks,
+        rules=rules,
     )
 
     print_report(result)
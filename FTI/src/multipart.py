@@ -0,0 +1,204 @@
+"""
+Streaming multipart/form-data parser.
+Reads the request body in chunks straight from the socket and exposes each part
+as a file-like object, so uploads can be analysed while they arrive instead of
+being buffered (and copied) in memory first.
+"""
+
+import re
+from typing import Dict, Iterator, Optional
+
+# Socket read size
+READ_SIZE = 1024 * 1024
+
+# Limit on the size of one part's header block
+MAX_HEADER_BYTES = 16 * 1024
+
+_PARAM_RE = re.compile(r';\s*([^=;\s]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+
+class MultipartError(ValueError):
+    """Malformed multipart body."""
+
+
+def parse_options_header(value: str):
+    """Split 'form-data; name="file"; filename="a.exe"' into ('form-data', {...})."""
+    main, _, rest = value.partition(";")
+    params = {}
+    for key, val in _PARAM_RE.findall(";" + rest):
+        val = val.strip()
+        if len(val) >= 2 and val[0] == val[-1] == '"':
+            val = val[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+        params[key.lower()] = val
+    return main.strip().lower(), params
+
+
+def get_boundary(content_type: str) -> Optional[bytes]:
+    """Return the multipart boundary from a Content-Type header, or None."""
+    ctype, params = parse_options_header(content_type or "")
+    if ctype != "multipart/form-data" or not params.get("boundary"):
+        return None
+    return params["boundary"].encode("latin-1")
+
+
+class MultipartPart:
+    """One part of the body. Read it like a file; data streams from the socket."""
+
+    def __init__(self, reader: "MultipartReader", headers: Dict[str, str]):
+        self._reader = reader
+        self.headers = headers
+        _, params = parse_options_header(headers.get("content-disposition", ""))
+        self.name = params.get("name")
+        self.filename = params.get("filename")
+        self.content_type = headers.get("content-type", "")
+        self.bytes_read = 0
+        self._pending = bytearray()
+        self._done = False
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to `size` bytes of this part (all remaining if size < 0)."""
+        if size is None or size < 0:
+            pending, self._pending = bytes(self._pending), bytearray()
+            self.bytes_read += len(pending)
+            return b"".join([pending] + list(self._iter_raw()))
+        while len(self._pending) < size and not self._done:
+            chunk = self._reader._next_body_chunk()
+            if chunk is None:
+                self._done = True
+                break
+            self._pending += chunk
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        self.bytes_read += len(data)
+        return data
+
+    def _iter_raw(self) -> Iterator[bytes]:
+        while not self._done:
+            chunk = self._reader._next_body_chunk()
+            if chunk is None:
+                self._done = True
+                break
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Iterate over body chunks as they arrive."""
+        if self._pending:
+            pending, self._pending = bytes(self._pending), bytearray()
+            self.bytes_read += len(pending)
+            yield pending
+        yield from self._iter_raw()
+
+    def drain(self) -> None:
+        """Discard whatever is left of this part."""
+        self._pending = bytearray()
+        for _ in self._iter_raw():
+            pass
+
+
+class MultipartReader:
+    """
+    Incremental multipart/form-data reader over a socket file.
+    Iterate to get parts; a part's body must be consumed (or is drained automatically)
+    before the next part is returned. At most `max_bytes` of body are accepted.
+    """
+
+    def __init__(self, fp, boundary: bytes, content_length: int, max_bytes: Optional[int] = None):
+        if max_bytes is not None and content_length > max_bytes:
+            raise MultipartError(f"Body too large ({content_length} > {max_bytes} bytes)")
+        self._fp = fp
+        self._remaining = content_length
+        # Treat the stream as if it began with CRLF so every delimiter looks the same
+        self._delim = b"\r\n--" + boundary
+        self._buf = bytearray(b"\r\n")
+        self._in_body = False
+        self._finished = False
+        self._current: Optional[MultipartPart] = None
+
+    def _fill(self) -> bool:
+        """Read more from the socket into the buffer. Returns False at end of body."""
+        if self._remaining <= 0:
+            return False
+        data = self._fp.read(min(READ_SIZE, self._remaining))
+        if not data:
+            raise MultipartError("Connection closed before end of multipart body")
+        self._remaining -= len(data)
+        self._buf += data
+        return True
+
+    def _next_body_chunk(self) -> Optional[bytes]:
+        """Next piece of the current part's body, or None at its end."""
+        if not self._in_body:
+            return None
+        while True:
+            idx = self._buf.find(self._delim)
+            if idx >= 0:
+                # Body ends here; the buffer is left starting with the delimiter
+                chunk = bytes(self._buf[:idx])
+                del self._buf[:idx]
+                self._in_body = False
+                return chunk or None
+            # Hand out what can't be part of a delimiter split across reads
+            safe = len(self._buf) - (len(self._delim) - 1)
+            if safe > 0 and len(self._buf) >= READ_SIZE:
+                chunk = bytes(self._buf[:safe])
+                del self._buf[:safe]
+                return chunk
+            if not self._fill():
+                raise MultipartError("Missing closing boundary")
+
+    def _read_headers(self) -> Optional[Dict[str, str]]:
+        """Consume a delimiter and the part headers that follow; None at the closing delimiter."""
+        while len(self._buf) < len(self._delim) + 2:
+            if not self._fill():
+                raise MultipartError("Truncated multipart body")
+        idx = self._buf.find(self._delim)
+        while idx < 0:
+            # Preamble before the first boundary
+            del self._buf[: max(0, len(self._buf) - len(self._delim))]
+            if not self._fill():
+                raise MultipartError("No multipart boundary found")
+            idx = self._buf.find(self._delim)
+        del self._buf[: idx + len(self._delim)]
+        while len(self._buf) < 2:
+            if not self._fill():
+                raise MultipartError("Truncated multipart body")
+        if self._buf[:2] == b"--":
+            self._finished = True
+            return None
+        while True:
+            end = self._buf.find(b"\r\n\r\n")
+            if end >= 0:
+                break
+            if len(self._buf) > MAX_HEADER_BYTES:
+                raise MultipartError("Multipart part headers too large")
+            if not self._fill():
+                raise MultipartError("Truncated multipart headers")
+        raw = bytes(self._buf[:end]).decode("utf-8", errors="replace")
+        del self._buf[: end + 4]
+        headers = {}
+        for line in raw.split("\r\n"):
+            key, sep, value = line.partition(":")
+            if sep:
+                headers[key.strip().lower()] = value.strip()
+        return headers
+
+    def __iter__(self) -> Iterator[MultipartPart]:
+        while not self._finished:
+            if self._current is not None:
+                self._current.drain()
+            headers = self._read_headers()
+            if headers is None:
+                break
+            self._in_body = True
+            self._current = MultipartPart(self, headers)
+            yield self._current
+
+    def discard_rest(self) -> None:
+        """Read and drop the rest of the request body (keeps the connection usable)."""
+        while self._remaining > 0:
+            data = self._fp.read(min(READ_SIZE, self._remaining))
+            if not data:
+                break
+            self._remaining -= len(data)
+        self._buf.clear()
@@ -0,0 +1,243 @@
+"""
+Single-pass read pipeline for file analysis.
+One sequential read feeds the header buffer, the hashes and the entropy histogram,
+so identify() opens and reads each file only once.
+"""
+
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Use absolute imports when run as script, relative when imported as package
+try:
+    from .hashing import MultiHasher, ProgressCallback
+    from .entropy import BLOCK_SIZE, EntropyAccumulator
+except ImportError:
+    from hashing import MultiHasher, ProgressCallback
+    from entropy import BLOCK_SIZE, EntropyAccumulator
+
+# Read size for the streaming pass (large reads keep syscalls and NFS round trips low)
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Leading bytes kept for content-based `file`/libmagic checks on streams (no path to pass)
+FILE_CMD_PREFIX = 256 * 1024
+
+
+class StreamAnalyzer:
+    """
+    Incremental analyzer fed with consecutive chunks of file content.
+    Collects the header, the full-content hashes and the entropy histogram/profile in a single pass.
+    """
+
+    def __init__(
+        self,
+        header_size: int,
+        hash_algorithms: Optional[Iterable[str]] = None,
+        hash_timeout: Optional[float] = None,
+        entropy_block_size: int = BLOCK_SIZE,
+        keep_entropy_blocks: bool = False,
+        prefix_size: int = 0,
+        tail_size: int = 0,
+        ranges: Optional[Iterable[Tuple[int, int]]] = None,
+        rules=None,
+    ):
+        self.header_size = header_size
+        self.hash_timeout = hash_timeout
+        self.bytes_seen = 0
+        self.hash_status: Optional[str] = None  # None or "(timeout)"
+        self._prefix = bytearray()
+        self._prefix_size = max(header_size, prefix_size)
+        self._tail = bytearray()
+        self._tail_size = tail_size
+        # Read plan: (start, length) ranges captured as the data streams past
+        ranges = list(ranges or ())
+        self._ranges = {start: bytearray() for start, _ in ranges}
+        self._pending_ranges = sorted((start, start + length) for start, length in ranges if length > 0)
+        self._hasher = MultiHasher(hash_algorithms)
+        self._entropy = EntropyAccumulator(entropy_block_size, keep_blocks=keep_entropy_blocks)
+        # Content rules (rules.RuleSet) see every byte, like the hashes
+        self._rules = rules.scanner() if rules is not None else None
+        # Result of scan_file()'s `inspect` hook, if it ran
+        self.inspection: Any = None
+        self._start = time.time()
+
+    @property
+    def needs_more(self) -> bool:
+        """True while some consumer still wants data."""
+        return (
+            self.hash_status is None
+            or len(self._prefix) < self._prefix_size
+            or bool(self._pending_ranges)
+            or self._rules is not None
+        )
+
+    def update(self, chunk) -> None:
+        """Feed the next chunk (bytes, bytearray or memoryview)."""
+        n = len(chunk)
+        if not n:
+            return
+        if len(self._prefix) < self._prefix_size:
+            self._prefix += chunk[: self._prefix_size - len(self._prefix)]
+        if self._tail_size:
+            if n >= self._tail_size:
+                self._tail = bytearray(chunk[n - self._tail_size:])
+            else:
+                self._tail += chunk
+                del self._tail[: max(0, len(self._tail) - self._tail_size)]
+
+        if self._pending_ranges:
+            self._capture_ranges(chunk)
+
+        self._entropy.update(chunk)
+        if self._rules is not None:
+            self._rules.update(chunk)
+        if self.hash_status is None:
+            self._hasher.update(chunk)
+            if self.hash_timeout is not None and time.time() - self._start > self.hash_timeout:
+                self.hash_status = "(timeout)"
+
+        self.bytes_seen += n
+
+    def _capture_ranges(self, chunk) -> None:
+        """Copy the parts of `chunk` that fall inside planned ranges."""
+        pos = self.bytes_seen
+        end = pos + len(chunk)
+        still = []
+        for start, stop in self._pending_ranges:
+            if start < end and stop > pos:
+                lo = max(start, pos)
+                hi = min(stop, end)
+                self._ranges[start] += chunk[lo - pos:hi - pos]
+            if stop > end:
+                still.append((start, stop))
+        self._pending_ranges = still
+
+    @property
+    def ranges(self) -> Dict[int, bytes]:
+        """Captured read-plan ranges: {start offset: bytes} (shorter or missing past EOF)."""
+        return {start: bytes(data) for start, data in self._ranges.items() if data}
+
+    def rule_matches(self) -> Optional[List[Dict]]:
+        """Matching content rules, or None when no rules were given."""
+        return self._rules.matches() if self._rules is not None else None
+
+    def skip_hashes(self, reason: str) -> None:
+        """Mark hashes as not computed (e.g. '(timeout)')."""
+        self.hash_status = reason
+
+    @property
+    def header(self) -> bytes:
+        return bytes(self._prefix[: self.header_size])
+
+    @property
+    def prefix(self) -> bytes:
+        """Leading bytes kept (max of header_size and prefix_size)."""
+        return bytes(self._prefix)
+
+    @property
+    def tail(self) -> bytes:
+        """Last tail_size bytes seen (for trailer-based formats such as ZIP)."""
+        return bytes(self._tail)
+
+    def hexdigests(self) -> Dict[str, str]:
+        """Return {algorithm: hexdigest}, or the status marker if hashing was skipped."""
+        if self.hash_status is not None:
+            return {name: self.hash_status for name in self._hasher.algorithms}
+        return self._hasher.hexdigests()
+
+    def entropy(self) -> Optional[float]:
+        """Shannon entropy of everything fed so far."""
+        return self._entropy.entropy()
+
+    def entropy_profile(self) -> Dict:
+        """Per-block entropy summary (see EntropyAccumulator.profile)."""
+        return self._entropy.profile()
+
+
+def iter_chunks(fileobj, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Yield successive chunks from a binary file object until EOF.
+    Uses readinto() into one reused buffer when available; each yielded view is only
+    valid until the next iteration.
+    """
+    if hasattr(fileobj, "readinto"):
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while True:
+            n = fileobj.readinto(buf)
+            if not n:
+                break
+            yield view[:n]
+    else:
+        while True:
+            data = fileobj.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+
+def scan_file(
+    filepath: Union[str, Path],
+    header_size: int,
+    chunk_size: int = CHUNK_SIZE,
+    hash_algorithms: Optional[Iterable[str]] = None,
+    progress: Optional[ProgressCallback] = None,
+    keep_entropy_blocks: bool = False,
+    ranges: Optional[Iterable[Tuple[int, int]]] = None,
+    rules=None,
+    inspect_if: Optional[Callable[[bytes], bool]] = None,
+    inspect: Optional[Callable[[memoryview], Any]] = None,
+) -> Tuple[StreamAnalyzer, os.stat_result]:
+    """
+    Read `filepath` once, completely, and return (analyzer, stat).
+    Raises OSError if the file can't be read. `progress(bytes_done, total)` is called per chunk.
+    `ranges` is a signature read plan whose bytes are captured on the way (see SignatureIndex.read_plan).
+    `rules` (a rules.RuleSet) is matched against the content in the same pass.
+    If `inspect_if(header)` holds after the first chunk, the rest is read through an mmap
+    of the file and `inspect(view)` runs on that same mapping (analyzer.inspection), so
+    structure parsers (executables) need no second open.
+    """
+    with open(filepath, "rb", buffering=0) as f:
+        st = os.fstat(f.fileno())
+        analyzer = StreamAnalyzer(
+            header_size,
+            hash_algorithms=hash_algorithms,
+            keep_entropy_blocks=keep_entropy_blocks,
+            ranges=ranges,
+            rules=rules,
+        )
+
+        for chunk in iter_chunks(f, chunk_size):
+            analyzer.update(chunk)
+            if progress:
+                progress(analyzer.bytes_seen, st.st_size)
+            if not analyzer.needs_more:
+                break
+            if inspect is not None and analyzer.bytes_seen == len(chunk) and inspect_if(analyzer.header):
+                if _scan_mapped(f, analyzer, chunk_size, progress, st.st_size, inspect):
+                    break
+    return analyzer, st
+
+
+def _scan_mapped(f, analyzer: StreamAnalyzer, chunk_size: int, progress: Optional[ProgressCallback],
+                 total: int, inspect: Callable[[memoryview], Any]) -> bool:
+    """Feed the rest of `f` from an mmap, then run `inspect` on it; False if it can't be mapped."""
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return False
+    with mm:
+        view = memoryview(mm)
+        try:
+            for pos in range(analyzer.bytes_seen, len(view), chunk_size):
+                if not analyzer.needs_more:
+                    break
+                analyzer.update(view[pos:pos + chunk_size])
+                if progress:
+                    progress(analyzer.bytes_seen, total)
+            analyzer.inspection = inspect(view)
+        finally:
+            view.release()
+    return True
@@ -0,0 +1,565 @@
+"""
+Content rules: flag embedded strings (download cradles, macro markers, URLs, ...).
+All rule strings are compiled into one Aho-Corasick automaton, so a file is searched
+for every string at once, chunk by chunk, in the same read pass that feeds the
+hashes and entropy. Each rule has a small YARA-like condition evaluated per file.
+The pure-Python automaton's tables are cached on disk as JSON keyed by the rule
+source, so bulk workers and later runs skip compilation (pyahocorasick compiles in C
+and is not cached).
+
+Rule format (DEFAULT_RULES or a JSON file with a list of rules):
+
+    {
+        "name": "powershell_download_cradle",
+        "description": "PowerShell download cradle",
+        "severity": "high",                      # info / low / medium / high
+        "nocase": true,                          # default for text strings
+        "strings": {
+            "$iex": "IEX",
+            "$dl": "DownloadString",
+            "$mz": {"hex": "4D 5A 90 00"},
+            "$Url": {"text": "http://", "nocase": false}
+        },
+        "condition": "$iex and ($dl or 2 of them)"
+    }
+
+Conditions: $id, #id <op> N (match count), any of them, all of them, N of them,
+and / or / not, parentheses.
+
+Uses pyahocorasick (pip install pyahocorasick) when installed, otherwise a pure-Python
+automaton with the same results.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import ahocorasick
+except ImportError:  # optional dependency
+    ahocorasick = None
+
+# Compiled automaton tables are cached here (one JSON file per rule source)
+DEFAULT_RULES_CACHE_DIR = Path(
+    os.getenv("FTI_RULES_CACHE", Path(__file__).resolve().parent.parent / ".fti_rules_cache")
+)
+
+# Bump when the compiled format changes
+RULES_FORMAT_VERSION = 2
+
+SEVERITIES = ("info", "low", "medium", "high")
+
+DEFAULT_RULES = [
+    {
+        "name": "powershell_download_cradle",
+        "description": "PowerShell download cradle (download and execute)",
+        "severity": "high",
+        "nocase": True,
+        "strings": {
+            "$iex": "IEX",
+            "$invoke_expression": "Invoke-Expression",
+            "$download_string": "DownloadString",
+            "$download_file": "DownloadFile",
+            "$download_data": "DownloadData",
+            "$webclient": "Net.WebClient",
+            "$iwr": "Invoke-WebRequest",
+            "$irm": "Invoke-RestMethod",
+            "$bits": "Start-BitsTransfer",
+        },
+        "condition": "($iex or $invoke_expression) and ($download_string or $download_file or $download_data "
+                     "or $webclient or $iwr or $irm or $bits)",
+    },
+    {
+        "name": "powershell_obfuscated_launch",
+        "description": "PowerShell launched hidden / with an encoded command",
+        "severity": "medium",
+        "nocase": True,
+        "strings": {
+            "$powershell": "powershell",
+            "$encoded": "-EncodedCommand",
+            "$enc": " -enc ",
+            "$hidden": "-WindowStyle Hidden",
+            "$w_hidden": " -w hidden",
+            "$nop": " -nop ",
+            "$bypass": "-ExecutionPolicy Bypass",
+            "$from_base64": "FromBase64String",
+        },
+        "condition": "$powershell and 2 of them",
+    },
+    {
+        "name": "office_macro_autoexec",
+        "description": "VBA macro with an auto-run entry point",
+        "severity": "medium",
+        "nocase": True,
+        "strings": {
+            "$vba_attribute": "Attribute VB_",
+            "$vba_project": "VBAProject",
+            "$auto_open": "AutoOpen",
+            "$document_open": "Document_Open",
+            "$workbook_open": "Workbook_Open",
+            "$auto_exec": "AutoExec",
+            "$auto_close": "AutoClose",
+        },
+        "condition": "($vba_attribute or $vba_project) and ($auto_open or $document_open or $workbook_open "
+                     "or $auto_exec or $auto_close)",
+    },
+    {
+        "name": "script_shell_execution",
+        "description": "Script host / LOLBin command execution strings",
+        "severity": "medium",
+        "nocase": True,
+        "strings": {
+            "$wscript_shell": "WScript.Shell",
+            "$shell_application": "Shell.Application",
+            "$activex": "ActiveXObject",
+            "$create_object": "CreateObject(",
+            "$mshta": "mshta",
+            "$certutil": "certutil -urlcache",
+            "$regsvr32": "regsvr32 /s /n /u /i:",
+            "$rundll32": "rundll32",
+            "$cmd_c": "cmd.exe /c",
+        },
+        "condition": "2 of them",
+    },
+    {
+        "name": "embedded_executable",
+        "description": "More than one DOS/PE stub (embedded executable)",
+        "severity": "medium",
+        "strings": {
+            "$dos_stub": "This program cannot be run in DOS mode",
+        },
+        "condition": "#dos_stub >= 2",
+    },
+    {
+        "name": "urls",
+        "description": "Contains URLs",
+        "severity": "info",
+        "nocase": True,
+        "strings": {
+            "$http": "http://",
+            "$https": "https://",
+            "$ftp": "ftp://",
+        },
+        "condition": "any of them",
+    },
+]
+
+
+class RuleError(ValueError):
+    """A rule definition or condition is invalid."""
+
+
+# --- Conditions -----------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"\s*(\$\w+|#\w+|\d+|>=|<=|==|!=|>|<|\(|\)|\w+)")
+
+Condition = Callable[[Dict[str, int]], bool]
+
+
+def compile_condition(text: str, string_ids: List[str]) -> Condition:
+    """Compile a condition into a function of {string id: match count}."""
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            raise RuleError(f"Invalid condition near {text[pos:]!r}")
+        tokens.append(m.group(1))
+        pos = m.end()
+    tokens.append("")
+    i = 0
+
+    def peek() -> str:
+        return tokens[i] if i < len(tokens) else ""
+
+    def take(expected: Optional[str] = None) -> str:
+        nonlocal i
+        tok = peek()
+        if not tok:
+            raise RuleError(f"Unexpected end of condition {text!r}")
+        if expected is not None and tok.lower() != expected:
+            raise RuleError(f"Expected {expected!r} in condition {text!r}, got {tok or 'end'!r}")
+        i += 1
+        return tok
+
+    def string_id(name: str) -> str:
+        sid = "$" + name[1:]
+        if sid not in string_ids:
+            raise RuleError(f"Unknown string {name} in condition {text!r}")
+        return sid
+
+    def parse_or() -> Condition:
+        left = parse_and()
+        while peek().lower() == "or":
+            take()
+            right = parse_and()
+            left = (lambda a, b: lambda c: a(c) or b(c))(left, right)
+        return left
+
+    def parse_and() -> Condition:
+        left = parse_not()
+        while peek().lower() == "and":
+            take()
+            right = parse_not()
+            left = (lambda a, b: lambda c: a(c) and b(c))(left, right)
+        return left
+
+    def parse_not() -> Condition:
+        if peek().lower() == "not":
+            take()
+            inner = parse_not()
+            return lambda c: not inner(c)
+        return parse_atom()
+
+    def parse_atom() -> Condition:
+        tok = take()
+        low = tok.lower()
+        if tok == "(":
+            inner = parse_or()
+            take(")")
+            return inner
+        if tok.startswith("$"):
+            sid = string_id(tok)
+            return lambda c: c.get(sid, 0) > 0
+        if tok.startswith("#"):
+            sid = string_id(tok)
+            op = take()
+            limit = take()
+            if not limit.isdigit():
+                raise RuleError(f"Expected a number after {tok} {op} in condition {text!r}")
+            n = int(limit)
+            ops = {
+                ">=": lambda v: v >= n, "<=": lambda v: v <= n, "==": lambda v: v == n,
+                "!=": lambda v: v != n, ">": lambda v: v > n, "<": lambda v: v < n,
+            }
+            if op not in ops:
+                raise RuleError(f"Unknown operator {op!r} in condition {text!r}")
+            check = ops[op]
+            return lambda c: check(c.get(sid, 0))
+        if low in ("any", "all") or tok.isdigit():
+            take("of")
+            take("them")
+            need = 1 if low == "any" else len(string_ids) if low == "all" else int(tok)
+            return lambda c: sum(1 for sid in string_ids if c.get(sid, 0) > 0) >= need
+        raise RuleError(f"Unexpected {tok or 'end'!r} in condition {text!r}")
+
+    condition = parse_or()
+    if peek():
+        raise RuleError(f"Unexpected {peek()!r} in condition {text!r}")
+    return condition
+
+
+# --- Automaton ------------------------------------------------------------------
+
+class _PyAutomaton:
+    """Pure-Python Aho-Corasick automaton compiled to a dense DFA (one 256-entry row per state)."""
+
+    def __init__(self, patterns: List[bytes]):
+        goto: List[Dict[int, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for pid, pattern in enumerate(patterns):
+            state = 0
+            for b in pattern:
+                nxt = goto[state].get(b)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][b] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(pid)
+
+        fail = [0] * len(goto)
+        delta = [[0] * 256 for _ in goto]
+        for b, nxt in goto[0].items():
+            delta[0][b] = nxt
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            row = delta[state]
+            fallback = delta[fail[state]]
+            for b in range(256):
+                nxt = goto[state].get(b)
+                if nxt is None:
+                    row[b] = fallback[b]
+                else:
+                    row[b] = nxt
+                    fail[nxt] = fallback[b] if state else 0
+                    outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+                    queue.append(nxt)
+
+        self._set_tables(delta, [tuple(o) for o in outputs])
+
+    def _set_tables(self, delta: List[List[int]], outputs: List[Tuple[int, ...]]) -> None:
+        self.delta = delta
+        self.outputs = outputs
+        # Bytes that leave the root state: the only ones that can start a pattern
+        starts = [b for b in range(256) if delta[0][b]]
+        self.first_bytes = re.compile(b"[" + b"".join(re.escape(bytes([b])) for b in starts) + b"]") if starts else None
+
+    def to_json(self) -> Dict:
+        return {"delta": self.delta, "outputs": [list(o) for o in self.outputs]}
+
+    @classmethod
+    def from_json(cls, data: Dict, n_patterns: int) -> "_PyAutomaton":
+        """Rebuild from to_json() output; raises ValueError if the tables are malformed."""
+        delta = data["delta"]
+        outputs = data["outputs"]
+        n_states = len(delta)
+        if not n_states or len(outputs) != n_states:
+            raise ValueError("state count mismatch")
+        for row in delta:
+            if len(row) != 256 or not all(type(s) is int and 0 <= s < n_states for s in row):
+                raise ValueError("bad transition row")
+        for out in outputs:
+            if not all(type(pid) is int and 0 <= pid < n_patterns for pid in out):
+                raise ValueError("bad output list")
+        automaton = cls.__new__(cls)
+        automaton._set_tables(delta, [tuple(o) for o in outputs])
+        return automaton
+
+
+class _Matcher:
+    """Incremental search of one automaton over consecutive chunks."""
+
+    def __init__(self, automaton, lengths: List[int], counts: List[int], first: List[int]):
+        self.automaton = automaton
+        self.lengths = lengths
+        self.counts = counts
+        self.first = first
+        self.offset = 0  # bytes fed so far
+        self.state = 0
+        self.carry = ""
+        self.max_len = max(lengths) if lengths else 0
+
+    def _hit(self, pid: int, end: int) -> None:
+        if not self.counts[pid]:
+            self.first[pid] = end - self.lengths[pid] + 1
+        self.counts[pid] += 1
+
+    def update(self, data: bytes) -> None:
+        if isinstance(self.automaton, _PyAutomaton):
+            self._update_py(data)
+        else:
+            self._update_ahocorasick(data)
+        self.offset += len(data)
+
+    def _update_py(self, data: bytes) -> None:
+        delta = self.automaton.delta
+        outputs = self.automaton.outputs
+        first_bytes = self.automaton.first_bytes
+        state = self.state
+        base = self.offset
+        i = 0
+        n = len(data)
+        while i < n:
+            if state == 0:
+                # Skip ahead to the next byte that can start a pattern
+                m = first_bytes.search(data, i) if first_bytes is not None else None
+                if m is None:
+                    break
+                i = m.start()
+            state = delta[state][data[i]]
+            if outputs[state]:
+                for pid in outputs[state]:
+                    self._hit(pid, base + i)
+            i += 1
+        self.state = state
+
+    def _update_ahocorasick(self, data: bytes) -> None:
+        # pyahocorasick has no resumable state: re-scan the last max_len-1 bytes with the new chunk
+        text = self.carry + data.decode("latin-1")
+        skip = len(self.carry)
+        base = self.offset - skip
+        for end, pid in self.automaton.iter(text):
+            if end >= skip:
+                self._hit(pid, base + end)
+        keep = self.max_len - 1
+        self.carry = text[-keep:] if keep > 0 else ""
+
+
+class RuleSet:
+    """Compiled rules. Create with load_rules(); call scanner() per file."""
+
+    def __init__(self, rules: List[Dict], cache_dir: Optional[Union[str, Path]] = DEFAULT_RULES_CACHE_DIR):
+        self.rules = _validate(rules)
+        source = json.dumps(
+            [[r["name"], r["severity"], r["condition"], [[sid, v["bytes"].hex(), v["nocase"]] for sid, v in r["strings"].items()]]
+             for r in self.rules]
+        ).encode("utf-8")
+        backend = "ahocorasick" if ahocorasick is not None else "python"
+        self.fingerprint = hashlib.sha256(source + f":{RULES_FORMAT_VERSION}:{backend}".encode()).hexdigest()
+
+        # One pattern list per case mode; nocase patterns are matched against lower-cased data
+        self._patterns: Dict[bool, List[bytes]] = {False: [], True: []}
+        self._targets: Dict[bool, List[List[Tuple[int, str]]]] = {False: [], True: []}
+        index: Dict[Tuple[bool, bytes], int] = {}
+        for r, rule in enumerate(self.rules):
+            for sid, spec in rule["strings"].items():
+                key = (spec["nocase"], spec["bytes"])
+                pid = index.get(key)
+                if pid is None:
+                    pid = index[key] = len(self._patterns[spec["nocase"]])
+                    self._patterns[spec["nocase"]].append(spec["bytes"])
+                    self._targets[spec["nocase"]].append([])
+                self._targets[spec["nocase"]][pid].append((r, sid))
+        self._conditions = [compile_condition(rule["condition"], list(rule["strings"])) for rule in self.rules]
+        self._automata = self._load_or_compile(cache_dir)
+
+    def _load_or_compile(self, cache_dir) -> Dict[bool, object]:
+        if ahocorasick is not None or not cache_dir:
+            return {nocase: _compile(patterns) for nocase, patterns in self._patterns.items() if patterns}
+
+        # Plain JSON tables, validated on load: a tampered cache file can at worst be rejected
+        cache_path = Path(cache_dir) / f"{self.fingerprint}.json"
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                tables = json.load(f)
+            return {
+                nocase: _PyAutomaton.from_json(tables[str(nocase).lower()], len(patterns))
+                for nocase, patterns in self._patterns.items() if patterns
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        automata = {nocase: _PyAutomaton(patterns) for nocase, patterns in self._patterns.items() if patterns}
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({str(nocase).lower(): a.to_json() for nocase, a in automata.items()}, f, separators=(",", ":"))
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+        return automata
+
+    def scanner(self) -> "RuleScanner":
+        return RuleScanner(self)
+
+
+def _compile(patterns: List[bytes]):
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for pid, pattern in enumerate(patterns):
+            automaton.add_word(pattern.decode("latin-1"), pid)
+        automaton.make_automaton()
+        return automaton
+    return _PyAutomaton(patterns)
+
+
+class RuleScanner:
+    """Per-file rule state: feed chunks with update(), then read matches()."""
+
+    def __init__(self, ruleset: RuleSet):
+        self.ruleset = ruleset
+        self._matchers: Dict[bool, _Matcher] = {}
+        for nocase, automaton in ruleset._automata.items():
+            patterns = ruleset._patterns[nocase]
+            self._matchers[nocase] = _Matcher(
+                automaton, [len(p) for p in patterns], [0] * len(patterns), [0] * len(patterns)
+            )
+
+    def update(self, chunk) -> None:
+        data = bytes(chunk)
+        for nocase, matcher in self._matchers.items():
+            matcher.update(data.lower() if nocase else data)
+
+    def matches(self) -> List[Dict]:
+        """Rules whose condition holds: name, description, severity and per-string count / first offset."""
+        rules = self.ruleset.rules
+        counts: List[Dict[str, int]] = [{} for _ in rules]
+        offsets: List[Dict[str, int]] = [{} for _ in rules]
+        for nocase, matcher in self._matchers.items():
+            for pid, targets in enumerate(self.ruleset._targets[nocase]):
+                if matcher.counts[pid]:
+                    for r, sid in targets:
+                        counts[r][sid] = matcher.counts[pid]
+                        offsets[r][sid] = matcher.first[pid]
+
+        found = []
+        for r, rule in enumerate(rules):
+            if self.ruleset._conditions[r](counts[r]):
+                found.append({
+                    "rule": rule["name"],
+                    "description": rule["description"],
+                    "severity": rule["severity"],
+                    "strings": {sid: {"count": counts[r][sid], "offset": offsets[r][sid]} for sid in sorted(counts[r])},
+                })
+        return found
+
+
+def _validate(rules: List[Dict]) -> List[Dict]:
+    """Normalise rule dicts (strings to bytes specs); raises RuleError on bad definitions."""
+    if not isinstance(rules, list):
+        raise RuleError("Rules must be a list")
+    normalised = []
+    names = set()
+    for rule in rules:
+        name = rule.get("name") if isinstance(rule, dict) else None
+        if not name or not isinstance(rule.get("strings"), dict) or not rule["strings"]:
+            raise RuleError(f"Rule {name or rule!r} needs a name and at least one string")
+        if name in names:
+            raise RuleError(f"Duplicate rule name {name!r}")
+        names.add(name)
+        severity = rule.get("severity", "medium")
+        if severity not in SEVERITIES:
+            raise RuleError(f"Rule {name!r}: severity must be one of {', '.join(SEVERITIES)}")
+        default_nocase = bool(rule.get("nocase", False))
+        strings = {}
+        for sid, spec in rule["strings"].items():
+            if not re.fullmatch(r"\$\w+", sid):
+                raise RuleError(f"Rule {name!r}: string ids look like $name, got {sid!r}")
+            if isinstance(spec, str):
+                spec = {"text": spec}
+            if "hex" in spec:
+                try:
+                    data = bytes.fromhex(spec["hex"])
+                except ValueError:
+                    raise RuleError(f"Rule {name!r}: invalid hex string for {sid}")
+                nocase = False
+            else:
+                data = str(spec.get("text", "")).encode("utf-8")
+                nocase = bool(spec.get("nocase", default_nocase))
+            if not data:
+                raise RuleError(f"Rule {name!r}: empty string {sid}")
+            strings[sid] = {"bytes": data.lower() if nocase else data, "nocase": nocase}
+        normalised.append({
+            "name": name,
+            "description": rule.get("description", name),
+            "severity": severity,
+            "strings": strings,
+            "condition": rule.get("condition", "any of them"),
+        })
+    for rule in normalised:
+        compile_condition(rule["condition"], list(rule["strings"]))  # validate early
+    return normalised
+
+
+_rulesets: Dict[str, RuleSet] = {}
+_rulesets_lock = threading.Lock()
+
+
+def load_rules(source: Optional[Union[str, Path]] = None) -> RuleSet:
+    """
+    Process-wide RuleSet for a JSON rule file (None or "default": the built-in rules).
+    Raises RuleError / OSError for invalid or unreadable files.
+    """
+    key = str(source) if source and str(source) != "default" else "default"
+    with _rulesets_lock:
+        ruleset = _rulesets.get(key)
+        if ruleset is None:
+            if key == "default":
+                rules = DEFAULT_RULES
+            else:
+                with open(key, "r", encoding="utf-8") as f:
+                    try:
+                        rules = json.load(f)
+                    except json.JSONDecodeError as e:
+                        raise RuleError(f"{key}: {e}")
+            ruleset = _rulesets[key] = RuleSet(rules)
+        return ruleset
@@ -0,0 +1,185 @@
+"""
+Compiled magic signature index.
+Decodes hex signatures to bytes once and buckets them by offset and leading bytes,
+so matching a header costs O(header offsets), not O(number of signatures).
+The index also derives a read plan: the few byte ranges any signature can look at
+(e.g. 0-265 for headers and TAR, 32769+ for ISO-9660), so deep-offset types are
+detected from a handful of bytes instead of a large prefix.
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Signature entry as stored in the index: (signature bytes, description, extensions)
+IndexEntry = Tuple[bytes, str, List[str]]
+
+# (start, length) byte range
+ByteRange = Tuple[int, int]
+
+# Ranges closer than this are merged into one read (a page costs about the same as a few bytes)
+RANGE_MERGE_GAP = 4096
+
+
+class SignatureIndex:
+    """
+    Byte-level signature matcher built from (offset, hex_signature, description, extensions) rows.
+
+    Signatures are grouped per offset and keyed on their first two bytes (as an int,
+    so lookups don't allocate). Each bucket is sorted longest-first, which makes
+    `match()` return the most specific signature first.
+    """
+
+    def __init__(self, signatures: Iterable[tuple]):
+        # offset -> (first two bytes as int) -> entries, longest first
+        self._buckets: Dict[int, Dict[int, List[IndexEntry]]] = {}
+        # offset -> first byte -> entries for 1-byte signatures
+        self._short: Dict[int, Dict[int, List[IndexEntry]]] = {}
+        self.size = 0
+        self.max_end = 0
+
+        for offset, hex_sig, description, extensions in signatures:
+            sig = bytes.fromhex(hex_sig)
+            if not sig:
+                continue
+            entry = (sig, description, extensions)
+            if len(sig) == 1:
+                self._short.setdefault(offset, {}).setdefault(sig[0], []).append(entry)
+            else:
+                key = (sig[0] << 8) | sig[1]
+                self._buckets.setdefault(offset, {}).setdefault(key, []).append(entry)
+            self.size += 1
+            self.max_end = max(self.max_end, offset + len(sig))
+
+        for table in (self._buckets, self._short):
+            for by_key in table.values():
+                for entries in by_key.values():
+                    # Stable sort keeps database order for equal lengths
+                    entries.sort(key=lambda e: len(e[0]), reverse=True)
+
+        self.offsets = sorted(set(self._buckets) | set(self._short))
+        self.ranges = self._build_ranges()
+
+    def _build_ranges(self, merge_gap: int = RANGE_MERGE_GAP) -> List[ByteRange]:
+        """Minimal sorted list of (start, length) ranges covering every signature."""
+        spans = []
+        for offset in self.offsets:
+            longest = 0
+            for table in (self._buckets, self._short):
+                for entries in table.get(offset, {}).values():
+                    longest = max(longest, len(entries[0][0]))
+            spans.append((offset, offset + longest))
+        merged: List[List[int]] = []
+        for start, end in spans:
+            if merged and start - merged[-1][1] <= merge_gap:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(start, end - start) for start, end in merged]
+
+    def read_plan(self, file_size: Optional[int] = None, min_first: int = 0) -> List[ByteRange]:
+        """
+        Ranges to read for one file: the index ranges clipped to `file_size`, with the
+        first range extended to at least `min_first` bytes (e.g. the displayed header).
+        """
+        plan = []
+        for start, length in self.ranges:
+            if start == 0:
+                length = max(length, min_first)
+            if file_size is not None:
+                if start >= file_size:
+                    break
+                length = min(length, file_size - start)
+            plan.append((start, length))
+        if min_first and (not plan or plan[0][0] != 0):
+            plan.insert(0, (0, min_first if file_size is None else min(min_first, file_size)))
+        return plan
+
+    def match(self, header: bytes) -> List[Tuple[str, List[str]]]:
+        """
+        Return all (description, extensions) whose signature matches `header`,
+        longest signature first.
+        """
+        if not header:
+            return []
+        found: List[Tuple[int, str, List[str]]] = []
+        self._match_in(header, 0, self.offsets, found)
+        if len(found) > 1:
+            found.sort(key=lambda m: m[0], reverse=True)
+        return [(desc, exts) for _, desc, exts in found]
+
+    def match_ranges(self, ranges: Dict[int, bytes]) -> List[Tuple[str, List[str]]]:
+        """
+        Like match(), but over sparse data: {start offset: bytes read there}
+        (e.g. the result of read_ranges()). Longest signature first.
+        """
+        found: List[Tuple[int, str, List[str]]] = []
+        for start in sorted(ranges):
+            data = ranges[start]
+            end = start + len(data)
+            offsets = [o for o in self.offsets if start <= o < end]
+            if offsets:
+                self._match_in(data, start, offsets, found)
+        if len(found) > 1:
+            found.sort(key=lambda m: m[0], reverse=True)
+        return [(desc, exts) for _, desc, exts in found]
+
+    def _match_in(self, data: bytes, base: int, offsets: List[int], found: list) -> None:
+        """Append (length, description, extensions) for signatures at `offsets` found in data (data[0] is at `base`)."""
+        data_len = len(data)
+        for offset in offsets:
+            pos = offset - base
+            if pos >= data_len:
+                break
+            first = data[pos]
+            short = self._short.get(offset)
+            if short:
+                for sig, desc, exts in short.get(first, ()):
+                    found.append((1, desc, exts))
+            if pos + 1 >= data_len:
+                continue
+            buckets = self._buckets.get(offset)
+            if not buckets:
+                continue
+            for sig, desc, exts in buckets.get((first << 8) | data[pos + 1], ()):
+                if data.startswith(sig, pos):
+                    found.append((len(sig), desc, exts))
+
+
+def read_ranges(fd: int, plan: Iterable[ByteRange]) -> Dict[int, bytes]:
+    """Read each (start, length) of `plan` from an open file descriptor with positioned reads."""
+    out = {}
+    for start, length in plan:
+        if hasattr(os, "pread"):
+            data = os.pread(fd, length, start)
+        else:
+            os.lseek(fd, start, os.SEEK_SET)
+            data = os.read(fd, length)
+        if data:
+            out[start] = data
+    return out
+
+
+_default_index: Optional[SignatureIndex] = None
+_default_source: Optional[tuple] = None
+
+
+def get_signature_index(signatures: Optional[List[tuple]] = None) -> SignatureIndex:
+    """
+    Return a compiled index for `signatures` (default: the magic database).
+    The default index is compiled once and rebuilt only if the database list changes.
+    """
+    global _default_index, _default_source
+    if signatures is not None:
+        return SignatureIndex(signatures)
+
+    try:
+        from .magic_db import get_all_signatures
+    except ImportError:
+        from magic_db import get_all_signatures
+
+    db = get_all_signatures()
+    source = (id(db), len(db))
+    if _default_index is None or _default_source != source:
+        _default_index = SignatureIndex(db)
+        _default_source = source
+    return _default_index
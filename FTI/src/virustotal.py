@@ -0,0 +1,313 @@
+"""
+VirusTotal lookup layer.
+One pooled HTTP session per API key, a token-bucket rate limiter sized for the
+free tier (4 requests/minute), a persistent SQLite verdict cache with TTL, and a
+background queue that works through large numbers of hashes as quota allows
+without blocking the scan.
+
+Point FTI_VT_URL at another endpoint (e.g. tests/fake_virustotal.py) for testing.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+# API base URL
+VT_BASE_URL = os.getenv("FTI_VT_URL", "https://www.virustotal.com/api/v3")
+
+# Requests per minute (free tier: 4)
+VT_RATE_PER_MINUTE = float(os.getenv("FTI_VT_RATE", "4"))
+
+# Per-request timeout in seconds
+VT_TIMEOUT = 10
+
+# Cache lifetime of a verdict; "not found" is kept shorter since new uploads appear
+VERDICT_TTL = 7 * 86400
+NOT_FOUND_TTL = 86400
+
+# Default verdict cache location (next to the analysis cache)
+DEFAULT_VERDICT_CACHE_PATH = Path(
+    os.getenv("FTI_VT_CACHE_PATH", Path(__file__).resolve().parent.parent / ".fti_vt_cache.sqlite")
+)
+
+# Back-off after HTTP 429 (quota exceeded) before the next request
+QUOTA_BACKOFF = 60
+
+
+def is_sha256(value: Optional[str]) -> bool:
+    """True for a 64-character hex digest (not an error marker like "(timeout)")."""
+    if not value or len(value) != 64:
+        return False
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return True
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per `per` seconds, at most `burst` saved up."""
+
+    def __init__(self, rate: float, per: float = 60.0, burst: Optional[float] = None):
+        self.rate = rate / per
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take one token, waiting up to `timeout` seconds (None: wait as long as needed)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else 1.0
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def drain(self, seconds: float = 0.0) -> None:
+        """Empty the bucket and hold it empty for `seconds` (after the server says quota is used up)."""
+        with self._lock:
+            self._tokens = -seconds * self.rate
+            self._updated = time.monotonic()
+
+
+class VerdictCache:
+    """SQLite cache of VirusTotal verdicts by SHA256 (thread-safe, per-process connection)."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_VERDICT_CACHE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "sha256 TEXT PRIMARY KEY, verdict TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        """Return the cached verdict if it has not expired, else None."""
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT verdict FROM verdicts WHERE sha256=? AND expires_at > ?", (sha256, time.time())
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, sha256: str, verdict: Dict, ttl: float) -> None:
+        with self._lock:
+            try:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO verdicts (sha256, verdict, expires_at) VALUES (?, ?, ?)",
+                    (sha256, json.dumps(verdict), time.time() + ttl),
+                )
+            except sqlite3.Error:
+                pass
+
+    def purge(self) -> int:
+        """Delete expired verdicts. Returns rows removed."""
+        with self._lock:
+            try:
+                return self._connect().execute("DELETE FROM verdicts WHERE expires_at <= ?", (time.time(),)).rowcount
+            except sqlite3.Error:
+                return 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+def parse_file_report(status_code: int, data: Optional[Dict]) -> Dict:
+    """Turn a /files/{hash} response into FTI's virustotal result dict."""
+    if status_code == 200:
+        data = data or {}
+        stats = data.get("data", {}).get("attributes", {}).get("last_analysis_stats", {})
+        permalink = data.get("data", {}).get("links", {}).get("self", "")
+        return {
+            "detected": stats.get("malicious", 0),
+            "total": stats.get("malicious", 0) + stats.get("undetected", 0),
+            "permalink": permalink.replace("/api/v3/files/", "/gui/file/") if permalink else None
+        }
+    if status_code == 404:
+        return {"status": "not_found"}
+    return {"error": f"API error: {status_code}"}
+
+
+class VirusTotalClient:
+    """
+    Rate-limited, cached VirusTotal file lookups for one API key.
+    lookup() answers synchronously (from cache, or waiting for quota); submit() queues
+    the hash for a background thread and returns a Future that resolves as quota allows.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = VT_BASE_URL,
+        rate_per_minute: float = VT_RATE_PER_MINUTE,
+        cache: Optional[VerdictCache] = None,
+        timeout: float = VT_TIMEOUT,
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = cache
+        self.bucket = TokenBucket(rate_per_minute)
+        self._session = requests.Session()
+        self._session.headers["x-apikey"] = api_key
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def cached(self, sha256: str) -> Optional[Dict]:
+        """Cached verdict for `sha256`, or None (never touches the network)."""
+        return self.cache.get(sha256.lower()) if self.cache is not None else None
+
+    def lookup(self, sha256: str, max_wait: Optional[float] = None) -> Dict:
+        """
+        Verdict for `sha256`. Waits for quota up to `max_wait` seconds (None: as long as needed);
+        if it doesn't come in time the hash is queued in the background and
+        {"status": "queued"} is returned, so a later lookup finds it in the cache.
+        """
+        sha256 = sha256.lower()
+        verdict = self.cached(sha256)
+        if verdict is not None:
+            return verdict
+        if not self.bucket.acquire(timeout=max_wait):
+            self.submit(sha256)
+            return {"status": "queued"}
+        return self._fetch(sha256)
+
+    def _fetch(self, sha256: str) -> Dict:
+        """One API request (a token must already be taken); caches definitive answers."""
+        try:
+            response = self._session.get(f"{self.base_url}/files/{sha256}", timeout=self.timeout)
+        except Exception as e:
+            return {"error": str(e)}
+        if response.status_code == 429:
+            self.bucket.drain(QUOTA_BACKOFF)
+        try:
+            data = response.json() if response.status_code == 200 else None
+        except ValueError:
+            return {"error": "Invalid API response"}
+        verdict = parse_file_report(response.status_code, data)
+        if self.cache is not None and "error" not in verdict:
+            ttl = NOT_FOUND_TTL if verdict.get("status") == "not_found" else VERDICT_TTL
+            self.cache.put(sha256, verdict, ttl)
+        return verdict
+
+    def submit(self, sha256: str, callback: Optional[Callable[[str, Dict], None]] = None) -> Future:
+        """
+        Queue `sha256` for background lookup. Returns a Future with the verdict; cache hits
+        resolve immediately and a hash already queued shares the same Future.
+        `callback(sha256, verdict)` runs when the verdict is known.
+        """
+        sha256 = sha256.lower()
+        with self._inflight_lock:
+            fut = self._inflight.get(sha256)
+            if fut is None:
+                fut = Future()
+                verdict = self.cached(sha256)
+                if verdict is not None:
+                    fut.set_result(verdict)
+                else:
+                    self._inflight[sha256] = fut
+                    self._queue.put(sha256)
+                    self._ensure_worker()
+        if callback is not None:
+            fut.add_done_callback(lambda f: callback(sha256, f.result()))
+        return fut
+
+    def pending(self) -> int:
+        """Number of hashes still waiting for a background lookup."""
+        with self._inflight_lock:
+            return len(self._inflight)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="fti-vt", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            sha256 = self._queue.get()
+            if sha256 is None:
+                break
+            verdict = self.cached(sha256)
+            if verdict is None:
+                self.bucket.acquire()
+                verdict = self._fetch(sha256)
+                if verdict.get("error") == "API error: 429":
+                    # Quota exhausted: the bucket is drained, try this hash again
+                    self._queue.put(sha256)
+                    continue
+            with self._inflight_lock:
+                fut = self._inflight.pop(sha256, None)
+            if fut is not None:
+                fut.set_result(verdict)
+
+    def close(self) -> None:
+        """Stop the background thread (queued hashes are dropped) and close the session."""
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+        self._session.close()
+
+
+_clients: Dict[str, VirusTotalClient] = {}
+_clients_pid: Optional[int] = None
+_clients_lock = threading.Lock()
+_verdict_cache: Optional[VerdictCache] = None
+
+
+def get_client(api_key: str) -> VirusTotalClient:
+    """Process-wide client for `api_key` (shared rate limit, session and verdict cache)."""
+    global _clients_pid, _verdict_cache
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(api_key)
+        if client is None:
+            if _verdict_cache is None:
+                _verdict_cache = VerdictCache()
+                _verdict_cache.purge()
+            client = VirusTotalClient(api_key, cache=_verdict_cache)
+            _clients[api_key] = client
+        return client
@@ -0,0 +1,390 @@
+"""
+Watch-folder daemon: identify files as they arrive.
+Directories are watched with inotify (close-after-write and moved-in files) through
+ctypes, or polled where inotify is unavailable. Bursts of events for the same path
+are coalesced, ready paths are fanned out over a process pool in small batches, and
+one NDJSON record per file is appended to a log or sent to a local unix socket.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+# Use absolute imports when run as script, relative when imported as package
+try:
+    from .bulk import BATCH_SIZE, BulkSummary, ResultEmitter, analyze_batch, batch_results
+    from .export import Exporter
+    from .virustotal import get_client
+except ImportError:
+    from bulk import BATCH_SIZE, BulkSummary, ResultEmitter, analyze_batch, batch_results
+    from export import Exporter
+    from virustotal import get_client
+
+# A path is analysed once it has had no new events for this long (seconds)
+SETTLE_SECONDS = 0.5
+
+# Polling fallback: seconds between directory scans
+POLL_INTERVAL = 2.0
+
+# Partial downloads / editor temp files that are renamed when complete
+IGNORE_SUFFIXES = (".part", ".partial", ".tmp", ".crdownload", ".download", ".swp", "~")
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _ignored(name: str) -> bool:
+    return name.startswith(".") or name.endswith(IGNORE_SUFFIXES)
+
+
+def _walk_files(directory: str, recursive: bool, newer_than_ns: int = 0) -> Iterable[str]:
+    """Regular files in `directory` (and below), optionally only those modified after `newer_than_ns`."""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and not _ignored(entry.name):
+                            if not newer_than_ns or entry.stat(follow_symlinks=False).st_mtime_ns >= newer_than_ns:
+                                yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+class Coalescer:
+    """Collects event paths and releases each once it has been quiet for `settle` seconds."""
+
+    def __init__(self, settle: float = SETTLE_SECONDS):
+        self.settle = settle
+        self._due: Dict[str, float] = {}
+
+    def add(self, path: str, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        # Re-insert so the dict stays ordered by deadline
+        self._due.pop(path, None)
+        self._due[path] = now + self.settle
+
+    def pop_ready(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        ready = []
+        for path, due in self._due.items():
+            if due > now or (limit is not None and len(ready) >= limit):
+                break
+            ready.append(path)
+        for path in ready:
+            del self._due[path]
+        return ready
+
+    def next_due(self) -> Optional[float]:
+        """Seconds until the next path is ready (None when nothing is waiting)."""
+        for due in self._due.values():
+            return max(0.0, due - time.monotonic())
+        return None
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+
+class InotifyWatcher:
+    """inotify-based watcher (Linux). Raises OSError if inotify is unavailable."""
+
+    def __init__(self, directories: Iterable[Union[str, Path]], recursive: bool = True):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1: {os.strerror(err)}")
+        self.fd = fd
+        self.recursive = recursive
+        self._dirs: Dict[int, str] = {}
+        self._last_event_ns = time.time_ns()
+        for directory in directories:
+            self._add_tree(str(directory))
+
+    def _add_watch(self, directory: str) -> bool:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            print(f"Warning: cannot watch {directory}: {os.strerror(err)}", file=sys.stderr)
+            return False
+        self._dirs[wd] = directory
+        return True
+
+    def _add_tree(self, directory: str) -> None:
+        if not self._add_watch(directory) or not self.recursive:
+            return
+        for root, dirs, _ in os.walk(directory):
+            for d in dirs:
+                self._add_watch(os.path.join(root, d))
+
+    def read(self, timeout: Optional[float]) -> List[str]:
+        """Wait up to `timeout` seconds for events; return the file paths they name."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        paths = []
+        while True:
+            try:
+                buf = os.read(self.fd, 256 * 1024)
+            except BlockingIOError:
+                break
+            if not buf:
+                break
+            paths.extend(self._parse(buf))
+        return paths
+
+    def _parse(self, buf: bytes) -> List[str]:
+        paths = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                paths.extend(self._rescan())
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF) and not name:
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land in a new directory before its watch exists
+                    self._add_tree(path)
+                    paths.extend(_walk_files(path, True))
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and not _ignored(name):
+                paths.append(path)
+        self._last_event_ns = time.time_ns()
+        return paths
+
+    def _rescan(self) -> List[str]:
+        """Event queue overflowed: pick up files changed since the last good read."""
+        print("Warning: inotify queue overflow, rescanning watched directories", file=sys.stderr)
+        since = self._last_event_ns - 1_000_000_000
+        paths = []
+        for directory in list(self._dirs.values()):
+            paths.extend(_walk_files(directory, False, since))
+        return paths
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """Portable fallback: rescans the directories and reports new or changed files."""
+
+    def __init__(self, directories: Iterable[Union[str, Path]], recursive: bool = True, interval: float = POLL_INTERVAL):
+        self.directories = [str(d) for d in directories]
+        self.recursive = recursive
+        self.interval = interval
+        self._seen = self._snapshot()
+        self._next_scan = time.monotonic() + interval
+
+    def _snapshot(self) -> Dict[str, tuple]:
+        state = {}
+        for directory in self.directories:
+            for path in _walk_files(directory, self.recursive):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_size, st.st_mtime_ns)
+        return state
+
+    def read(self, timeout: Optional[float]) -> List[str]:
+        wait = self._next_scan - time.monotonic()
+        if timeout is not None:
+            wait = min(wait, timeout)
+        if wait > 0:
+            time.sleep(wait)
+        if time.monotonic() < self._next_scan:
+            return []
+        current = self._snapshot()
+        changed = [path for path, sig in current.items() if self._seen.get(path) != sig]
+        self._seen = current
+        self._next_scan = time.monotonic() + self.interval
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(directories: Iterable[Union[str, Path]], recursive: bool = True, polling: bool = False):
+    """InotifyWatcher where available, else PollingWatcher."""
+    directories = list(directories)
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directories, recursive)
+        except (OSError, AttributeError) as e:
+            print(f"Warning: inotify unavailable ({e}), polling every {POLL_INTERVAL:g}s", file=sys.stderr)
+    return PollingWatcher(directories, recursive)
+
+
+class SocketOutput:
+    """
+    Text sink that sends NDJSON to a unix stream socket (e.g. a SIEM forwarder).
+    Writes are buffered until flush(); if the listener is gone the batch is dropped
+    with a warning and the connection is retried on the next flush.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        self._sock: Optional[socket.socket] = None
+        self._buffer: List[str] = []
+
+    def write(self, text: str) -> int:
+        self._buffer.append(text)
+        return len(text)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        data = "".join(self._buffer).encode("utf-8")
+        self._buffer = []
+        for _ in range(2):
+            try:
+                if self._sock is None:
+                    self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    self._sock.connect(self.path)
+                self._sock.sendall(data)
+                return
+            except OSError as e:
+                self.close()
+                error = e
+        print(f"Warning: dropped records, socket {self.path}: {error}", file=sys.stderr)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+def run_watch(
+    directories: Iterable[Union[str, Path]],
+    writer: Exporter,
+    workers: Optional[int] = None,
+    use_file_cmd: bool = True,
+    virustotal_api_key: Optional[str] = None,
+    use_cache: bool = True,
+    hash_algorithms: Optional[tuple] = None,
+    entropy_blocks: bool = False,
+    archive_depth: Optional[int] = None,
+    rules_source: Optional[str] = None,
+    recursive: bool = True,
+    polling: bool = False,
+    settle: float = SETTLE_SECONDS,
+    stop: Optional[threading.Event] = None,
+) -> BulkSummary:
+    """
+    Identify every file that is closed after writing or moved into `directories` until
+    `stop` is set (or KeyboardInterrupt), writing one record per file to `writer`.
+    Paths ready at the same time are split into batches over the worker pool, so a
+    single arrival is handled at once and bursts are amortised. VirusTotal verdicts are
+    looked up in this process, as in bulk mode, except that a file arriving while
+    VT_MAX_WAITING records await a verdict is written without one (the loop never
+    blocks on quota).
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 4
+    stop = stop or threading.Event()
+    emitter = ResultEmitter(writer, get_client(virustotal_api_key) if virustotal_api_key else None, block=False)
+    coalescer = Coalescer(settle)
+    watcher = open_watcher(directories, recursive, polling)
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending: Dict = {}  # future -> its batch of paths
+
+    def submit(batch: List[str]):
+        return pool.submit(
+            analyze_batch, batch, use_file_cmd, None, use_cache,
+            hash_algorithms, entropy_blocks, archive_depth, rules_source,
+        )
+
+    try:
+        while not stop.is_set():
+            if pending or emitter.waiting:
+                timeout = 0.05
+            else:
+                due = coalescer.next_due()
+                timeout = 1.0 if due is None else min(due, 1.0)
+            for path in watcher.read(timeout):
+                coalescer.add(path)
+
+            free = max_pending - len(pending)
+            if free > 0:
+                ready = coalescer.pop_ready(limit=free * BATCH_SIZE)
+                if ready:
+                    # Spread over the workers, but never more than `free` batches
+                    size = max(1, min(BATCH_SIZE, -(-len(ready) // workers)), -(-len(ready) // free))
+                    for i in range(0, len(ready), size):
+                        batch = ready[i:i + size]
+                        try:
+                            fut = submit(batch)
+                        except BrokenProcessPool:
+                            # A worker died (its batches fail in batch_results): carry on with a new pool
+                            pool.shutdown(wait=False)
+                            pool = ProcessPoolExecutor(max_workers=workers)
+                            fut = submit(batch)
+                        pending[fut] = batch
+
+            done = [fut for fut in pending if fut.done()]
+            if done or emitter.waiting:
+                for fut in done:
+                    emitter.emit(batch_results(fut, pending.pop(fut)))
+                emitter.write_ready()
+                writer.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        pool.shutdown(wait=True)
+        for fut, batch in pending.items():
+            emitter.emit(batch_results(fut, batch))
+        emitter.write_queued()
+        writer.flush()
+    return emitter.summary
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Local fake of the VirusTotal v3 /files/{hash} endpoint for tests and demos.
+
+Known hashes return last_analysis_stats, unknown hashes 404, and requests above the
+configured quota get HTTP 429 like the real API. Point FTI at it with:
+
+    python3 tests/fake_virustotal.py --port 8900 --rate 4 &
+    FTI_VT_URL=http://127.0.0.1:8900/api/v3 python3 main.py --vt-api-key test <file>
+
+In Python:
+
+    with FakeVirusTotal(known={sha256: (3, 60)}) as vt:
+        client = VirusTotalClient("test", base_url=vt.url)
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+class FakeVirusTotal:
+    """
+    Threaded fake API server. `known` maps sha256 -> (malicious, undetected);
+    `rate_per_minute` enables 429 responses; `api_key` (if set) must match x-apikey.
+    `requests` counts every request received.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        known: Optional[Dict[str, Tuple[int, int]]] = None,
+        rate_per_minute: Optional[float] = None,
+        api_key: Optional[str] = None,
+        latency: float = 0.0,
+    ):
+        self.known = {k.lower(): v for k, v in (known or {}).items()}
+        self.rate_per_minute = rate_per_minute
+        self.api_key = api_key
+        self.latency = latency
+        self.requests = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v3"
+
+    def _over_quota(self) -> bool:
+        if not self.rate_per_minute:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.rate_per_minute:
+                return True
+            self._recent.append(now)
+            return False
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, status: int, payload: Dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if fake.api_key and self.headers.get("x-apikey") != fake.api_key:
+                    self._json(401, {"error": {"code": "WrongCredentialsError"}})
+                    return
+                prefix = "/api/v3/files/"
+                if not self.path.startswith(prefix):
+                    self._json(404, {"error": {"code": "NotFoundError"}})
+                    return
+                if fake._over_quota():
+                    self._json(429, {"error": {"code": "QuotaExceededError"}})
+                    return
+                sha256 = self.path[len(prefix):].lower()
+                stats = fake.known.get(sha256)
+                if stats is None:
+                    self._json(404, {"error": {"code": "NotFoundError"}})
+                    return
+                malicious, undetected = stats
+                self._json(200, {
+                    "data": {
+                        "id": sha256,
+                        "type": "file",
+                        "links": {"self": f"https://www.virustotal.com/api/v3/files/{sha256}"},
+                        "attributes": {
+                            "last_analysis_stats": {"malicious": malicious, "undetected": undetected},
+                        },
+                    }
+                })
+
+        return Handler
+
+    def start(self) -> "FakeVirusTotal":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeVirusTotal":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake VirusTotal /files endpoint")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--rate", type=float, default=None, help="Requests per minute before HTTP 429")
+    parser.add_argument("--known", metavar="FILE", help='JSON file {"<sha256>": [malicious, undetected], ...}')
+    args = parser.parse_args()
+
+    known = {}
+    if args.known:
+        with open(args.known, "r", encoding="utf-8") as f:
+            known = {k: tuple(v) for k, v in json.load(f).items()}
+    fake = FakeVirusTotal(port=args.port, known=known, rate_per_minute=args.rate)
+    print(f"Fake VirusTotal on {fake.url}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Tests for src.archives."""
+
+import gzip
+import io
+import tarfile
+import zipfile
+
+from src.archives import identify_recursive
+from src.identifier import identify
+
+
+def test_many_small_bomb_members_hit_the_total_ratio(tmp_path):
+    # Each member stays below the per-member ratio floor; together they do not
+    path = tmp_path / "bomb.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(8):
+            zf.writestr(f"zeros{i}.bin", bytes(4 * 1024 * 1024))
+
+    results = list(identify_recursive(path, use_file_cmd=False))
+    top = results[-1]
+    assert "in total" in top["archive_error"]
+    assert top["archive_members"] < 8
+
+
+def test_streamed_archive_is_hashed_while_expanded(tmp_path):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tf:
+        data = b"hello world\n" * 100
+        info = tarfile.TarInfo("a.txt")
+        info.size = len(data)
+        tf.addfile(info, io.BytesIO(data))
+    path = tmp_path / "a.tar.gz"
+    path.write_bytes(gzip.compress(buf.getvalue()))
+
+    results = list(identify_recursive(path, use_file_cmd=False))
+    top = results[-1]
+    assert [r["filepath"] for r in results[:-1]] == [f"{path}!a.tar!a.txt", f"{path}!a.tar"]
+    assert top["archive_members"] == 2
+    plain = identify(path, use_file_cmd=False)
+    assert {k: top[k] for k in plain} == plain
@@ -0,0 +1,35 @@
+"""Tests for src.bulk."""
+
+import io
+import json
+import os
+
+from src import bulk
+from src.export import NdjsonExporter
+
+_analyze_batch = bulk.analyze_batch
+
+
+def _crash_on_boom(paths, *args):
+    """analyze_batch() that kills its worker process for a file named *.boom."""
+    if any(p.endswith(".boom") for p in paths):
+        os._exit(1)
+    return _analyze_batch(paths, *args)
+
+
+def test_crashed_worker_is_recorded_and_scan_continues(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk, "analyze_batch", _crash_on_boom)
+    paths = []
+    for name in ("a.txt", "b.boom", "c.txt", "d.txt"):
+        (tmp_path / name).write_bytes(b"hello")
+        paths.append(str(tmp_path / name))
+    out = io.StringIO()
+
+    summary = bulk.run_bulk(paths, NdjsonExporter(out), workers=2, use_file_cmd=False,
+                            batch_size=1, use_cache=False)
+
+    records = {os.path.basename(r["filepath"]): r for r in map(json.loads, out.getvalue().splitlines())}
+    assert sorted(records) == ["a.txt", "b.boom", "c.txt", "d.txt"]
+    assert "error" in records["b.boom"]
+    assert summary.total == 4
+    assert summary.errors >= 1
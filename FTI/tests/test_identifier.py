@@ -0,0 +1,40 @@
+"""Tests for src.identifier."""
+
+import sys
+
+import pytest
+
+from src import identifier
+from src.cache import AnalysisCache
+from src.executables import inspect_executable
+from src.identifier import identify
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def test_renamed_file_recomputes_path_fields_on_cache_hit(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+    original = tmp_path / "a.png"
+    original.write_bytes(PNG)
+
+    first = identify(original, use_file_cmd=False, cache=cache)
+    assert first["file_extension"] == ".png"
+    assert first["mismatch"] is False
+
+    renamed = original.rename(tmp_path / "a.txt")
+    second = identify(renamed, use_file_cmd=False, cache=cache)
+    assert second["filepath"] == str(renamed)
+    assert second["file_extension"] == ".txt"
+    assert second["mismatch"] is True
+    assert second["message"] is not None
+    assert second["sha256"] == first["sha256"]
+    assert list(second) == list(first)
+
+
+def test_executable_is_parsed_from_the_scan_pass(monkeypatch):
+    expected = inspect_executable(sys.executable)
+    if expected is None:
+        pytest.skip("interpreter is not a PE/ELF file")
+    monkeypatch.setattr(identifier, "inspect_executable", lambda path: pytest.fail("file re-opened"))
+    result = identify(sys.executable, use_file_cmd=False)
+    assert result["executable"] == expected
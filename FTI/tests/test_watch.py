@@ -0,0 +1,50 @@
+"""Tests for src.watch."""
+
+import io
+import json
+import os
+import threading
+import time
+
+from src import bulk, watch
+from src.export import NdjsonExporter
+
+
+def _crash_on_boom(paths, *args):
+    """analyze_batch() that kills its worker process for a file named *.boom."""
+    if any(p.endswith(".boom") for p in paths):
+        os._exit(1)
+    return bulk.analyze_batch(paths, *args)
+
+
+def _records(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_crashed_worker_is_recorded_and_watch_continues(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch, "analyze_batch", _crash_on_boom)
+    out = io.StringIO()
+    stop = threading.Event()
+    summary = {}
+    thread = threading.Thread(target=lambda: summary.update(result=watch.run_watch(
+        [tmp_path], NdjsonExporter(out), workers=2, use_file_cmd=False, use_cache=False,
+        polling=True, settle=0.1, stop=stop,
+    )))
+    thread.start()
+    try:
+        time.sleep(1.5)
+        (tmp_path / "a.boom").write_bytes(b"x")
+        deadline = time.time() + 20
+        while time.time() < deadline and not any(r["filepath"].endswith("a.boom") for r in _records(out)):
+            time.sleep(0.1)
+        (tmp_path / "b.txt").write_bytes(b"hello")
+        while time.time() < deadline and not any(r["filepath"].endswith("b.txt") for r in _records(out)):
+            time.sleep(0.1)
+    finally:
+        stop.set()
+        thread.join(30)
+
+    records = {os.path.basename(r["filepath"]): r for r in _records(out)}
+    assert "error" in records["a.boom"]
+    assert "error" not in records["b.txt"]
+    assert summary["result"].errors == 1